@@ -10,6 +10,7 @@ from django.db.models import Q
 from django.db.transaction import atomic
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.functional import cached_property
 from django.utils.text import get_text_list
 
 from contest.abstract import CRUDEntry
@@ -354,19 +355,31 @@ class Account(models.Model):
     def date_joined(self):
         return self.user.date_joined
 
+    def get_statistics(self, course_id=None):
+        """ counts of the student kept by StudentStatistics, of all courses or of the course """
+        StudentStatistics = apps.get_model('contests', 'StudentStatistics')
+        statistics = StudentStatistics.objects.filter(user_id=self.user_id)
+        if course_id:
+            statistics = statistics.filter(course=course_id)
+        return statistics.get_summary()
+
+    @cached_property
+    def statistics(self):
+        return self.get_statistics()
+
+    def count_submissions(self):
+        return self.statistics['submissions']
+
     def count_solved_problems(self):
-        Problem = apps.get_model('contests', 'Problem')
-        return Problem.objects.filter(submission__owner=self.user, submission__status='OK').count()
+        return self.statistics['solved_problems']
 
     def count_completed_assignments(self):
-        return self.user.assignment_set.filter(score__gt=2).count()
+        return self.statistics['completed_assignments']
 
     def get_accuracy(self, course_id=None):
-        submissions = self.user.submission_set.all()
         if course_id:
-            submissions = submissions.filter(problem__contest__course=course_id)
-        accuracy = 100 * submissions.filter(status='OK').count() / (submissions.count() or 1)
-        return round(accuracy)
+            return self.get_statistics(course_id)['accuracy']
+        return self.statistics['accuracy']
 
     def get_absolute_url(self):
         return reverse('accounts:account-detail', kwargs={'pk': self.pk})
@@ -1,9 +1,13 @@
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
+from django.utils import timezone
 
-from accounts.models import Account, Faculty, Announcement, Notification
+from accounts.models import Account, Comment, Faculty, Announcement, Notification
+from accounts.views import get_account_chart_data
+from contests.models import Assignment, Contest, Course, Problem, Submission
 
 
 class AccountViewsTest(TestCase):
@@ -310,3 +314,58 @@ class AnnouncementViewsTest(TestCase):
         self.client.login(username=self.admin, password=self.admin)
         resp = self.client.get(reverse('accounts:announcement-list'))
         self.assertEqual(resp.status_code, 200)
+
+
+class AccountChartTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        faculty = Faculty.objects.create(name="Test Fac")
+        admin = User.objects.create_superuser('admin', 'admin@localhost', 'admin')
+        Account.objects.create(user=admin, faculty=faculty)
+        cls.student = User.objects.create_user('student', 'student@localhost', 'student')
+        Account.students.create(user=cls.student, faculty=faculty, admission_year=timezone.localdate().year - 1)
+        cls.course = Course.objects.create(owner=admin, faculty=faculty, title_official="Test Course", level=1)
+        contest = Contest.objects.create(owner=admin, course=cls.course, title="Test Contest")
+        cls.problems = [Problem.objects.create(owner=admin, contest=contest, title="Test Problem %s" % i, number=i)
+                        for i in range(3)]
+        Assignment.objects.create(owner=admin, user=cls.student, problem=cls.problems[1], score=3)
+        today = timezone.localdate()
+        cls.current_month = (today.year, today.month)
+        cls.previous_month = cls.get_previous_month(cls.current_month)
+        cls.first_month = cls.get_previous_month(cls.previous_month)
+        for month, problem, status in ((cls.first_month, 0, 'WA'), (cls.first_month, 1, 'WA'),
+                                       (cls.first_month, 2, 'OK'), (cls.previous_month, 0, 'OK'),
+                                       (cls.previous_month, 0, 'WA'), (cls.current_month, 2, 'OK')):
+            cls.create_submission(month, cls.problems[problem], status)
+        comment = Comment.objects.create(author=cls.student, object=cls.course, text="Test Comment")
+        Comment.objects.filter(id=comment.id).update(date_created=cls.get_date(cls.previous_month))
+
+    def setUp(self):
+        cache.clear()
+
+    @staticmethod
+    def get_previous_month(month):
+        return (month[0] - 1, 12) if month[1] == 1 else (month[0], month[1] - 1)
+
+    @staticmethod
+    def get_date(month):
+        return timezone.make_aware(timezone.datetime(*month, 2))
+
+    @classmethod
+    def create_submission(cls, month, problem, status):
+        submission = Submission.objects.create(owner=cls.student, problem=problem, status=status)
+        Submission.objects.filter(id=submission.id).update(date_created=cls.get_date(month))
+
+    def test_chart(self):
+        rows = get_account_chart_data(self.student, 0)
+        self.assertEqual((rows[0][0], rows[-1][0]), (self.student.account.admission_year, self.current_month[0]))
+        self.assertEqual([row[2:] for row in rows[-3:]], [(3, 2, 0), (2, 1, 1), (1, 0, 0)])
+        self.assertEqual(sum(row[2] for row in rows), 6)
+
+    def test_closed_months_are_cached(self):
+        rows = get_account_chart_data(self.student, 0)
+        Submission.objects.filter(date_created__lt=self.get_date(self.previous_month)).delete()
+        with self.assertNumQueries(3):
+            self.assertEqual(get_account_chart_data(self.student, 0), rows)
+        self.create_submission(self.current_month, self.problems[0], 'OK')
+        self.assertEqual(get_account_chart_data(self.student, 0)[-1][2:], (2, 0, 0))
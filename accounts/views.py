@@ -1,8 +1,14 @@
+from collections import defaultdict
+
 from django.apps import apps
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
 from django.contrib.auth.models import Group
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
 from django.forms import modelformset_factory
 from django.http import HttpResponseRedirect
 from django.shortcuts import get_object_or_404
@@ -62,48 +68,69 @@ def get_study_year_choices(account):
     return years
 
 
-def get_account_chart_data(user, year):
-    Assignment = apps.get_model('contests', 'Assignment')
+def get_chart_months(account, year):
+    """ (year, month) pairs of the chart: months of the academic year or all months since admission if year is 0 """
     academic_year_start_month = 9
     today = timezone.localdate()
     all_time = not year
     if all_time:
-        year = user.account.admission_year
+        year = account.admission_year
     day = datetime(year, academic_year_start_month, 1)
-    submissions = user.submission_set.filter(date_created__year=day.year, date_created__month=day.month)
-    problem_ids = submissions.values_list('problem', flat=True).distinct().order_by()
-    problems_count = 0
-    counted_problem_ids = []
-    for problem_id in problem_ids:
-        if problem_id not in counted_problem_ids and (submissions.filter(problem_id=problem_id, status='OK').exists() or Assignment.objects.filter(user=user, problem_id=problem_id, score__gte=3).exists()):
-            problems_count += 1
-            counted_problem_ids.append(problem_id)
-    result = [(
-        day.year,
-        date(day, 'F'),
-        submissions.count(),
-        problems_count,
-        Comment.objects.filter(author=user, date_created__year=day.year, date_created__month=day.month).count(),
-    )]
+    months = [(day.year, day.month)]
     while (not all_time and (day.year != today.year and day.month != academic_year_start_month - 1 or day.year == today.year and day.month != today.month)) or (all_time and day < datetime(today.year, today.month, 1)):
         day = datetime(*nextmonth(year=day.year, month=day.month), 1)
-        submissions = user.submission_set.filter(date_created__year=day.year, date_created__month=day.month)
-        problem_ids = submissions.values_list('problem', flat=True).distinct().order_by()
+        months.append((day.year, day.month))
+    return months
+
+
+def get_monthly_activity(user, months, counted_problem_ids):
+    """ chart rows of consecutive months: submissions, problems solved for the first time and comments. a problem is
+        solved in a month with a submission to it if one of them is OK or the assignment of the problem is passed,
+        problems of counted_problem_ids are not counted again and newly counted ones are added there """
+    if not months:
+        return []
+    Assignment = apps.get_model('contests', 'Assignment')
+    start = timezone.make_aware(datetime(*months[0], 1))
+    end = timezone.make_aware(datetime(*nextmonth(*months[-1]), 1))
+    submissions = (user.submission_set.filter(date_created__gte=start, date_created__lt=end)
+                   .annotate(month=TruncMonth('date_created')).values('month', 'problem_id').order_by()
+                   .annotate(count=Count('id'), ok_count=Count('id', filter=Q(status='OK'))))
+    comments = (Comment.objects.filter(author=user, date_created__gte=start, date_created__lt=end)
+                .annotate(month=TruncMonth('date_created')).values('month').order_by().annotate(count=Count('id')))
+    passed_problem_ids = set(Assignment.objects.filter(user=user, score__gte=3).values_list('problem_id', flat=True))
+    submission_counts, month_problems = defaultdict(int), defaultdict(list)
+    for row in submissions:
+        month = (row['month'].year, row['month'].month)
+        submission_counts[month] += row['count']
+        month_problems[month].append((row['problem_id'], row['ok_count']))
+    comment_counts = {(row['month'].year, row['month'].month): row['count'] for row in comments}
+    result = []
+    for month in months:
         problems_count = 0
-        for problem_id in problem_ids:
-            if problem_id not in counted_problem_ids and (submissions.filter(problem_id=problem_id, status='OK').exists() or Assignment.objects.filter(user=user, problem_id=problem_id, score__gte=3).exists()):
+        for problem_id, ok_count in month_problems[month]:
+            if problem_id not in counted_problem_ids and (ok_count or problem_id in passed_problem_ids):
                 problems_count += 1
-                counted_problem_ids.append(problem_id)
-        result.append((
-            day.year,
-            date(day, 'F'),
-            submissions.count(),
-            problems_count,
-            Comment.objects.filter(author=user, date_created__year=day.year, date_created__month=day.month).count(),
-        ))
+                counted_problem_ids.add(problem_id)
+        result.append((month[0], date(datetime(*month, 1), 'F'), submission_counts[month], problems_count,
+                       comment_counts.get(month, 0)))
     return result
 
 
+def get_account_chart_data(user, year):
+    """ rows of closed months are computed once per ACCOUNT_CHART_CACHE_TIMEOUT, the current month every time """
+    months = get_chart_months(user.account, year)
+    today = timezone.localdate()
+    closed_months = [month for month in months if month < (today.year, today.month)]
+    key = 'account-chart:{}:{}:{}-{}'.format(user.id, year, *closed_months[-1] if closed_months else (0, 0))
+    snapshot = cache.get(key)
+    if snapshot is None:
+        counted_problem_ids = set()
+        snapshot = (get_monthly_activity(user, closed_months, counted_problem_ids), counted_problem_ids)
+        cache.set(key, snapshot, settings.ACCOUNT_CHART_CACHE_TIMEOUT)
+    result, counted_problem_ids = snapshot
+    return result + get_monthly_activity(user, months[len(closed_months):], set(counted_problem_ids))
+
+
 class AccountDetail(LoginRedirectMixin, OwnershipOrMixin, PermissionRequiredMixin, DetailView):
     model = Account
     template_name = 'accounts/account/account_detail.html'
@@ -0,0 +1,28 @@
+"""
+ASGI config for contest project.
+
+It exposes the ASGI callable as a module-level variable named ``application``. Server-sent events streams
+(see contests/streams.py) are served by it directly, other requests are passed to the django application.
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "contest.settings")
+
+django_application = get_asgi_application()
+
+from contests.streams import (COURSE_TABLE_STREAM_PATH, SUBMISSION_PROGRESS_STREAM_PATH,  # noqa: E402 (needs apps)
+                              CourseTableStream, SubmissionProgressStream)
+
+streams = {
+    SUBMISSION_PROGRESS_STREAM_PATH: SubmissionProgressStream(),
+    COURSE_TABLE_STREAM_PATH: CourseTableStream(),
+}
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] in streams:
+        return await streams[scope['path']](scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -0,0 +1,135 @@
+"""
+zygote of contest/sandbox.py: a small interpreter started once with nothing but the standard library loaded, which
+forks and executes programs on request. a run costs a fork of it and setting limits up instead of spawning a process
+from a large judge process, and resource usage of the program is not inflated by memory of the judge.
+
+the server listens on a unix seqpacket socket, every message is a JSON object:
+    {"args": [...], "cwd": ..., "limits": [[resource, value], ...], "isolate": bool} with stdout and stderr passed
+    as file descriptors -> {"pid": ...}
+    {"wait": pid} -> {"returncode": ..., "time": ..., "memory": ...}
+run as: python -I -S forkserver.py <address> <parent pid>
+"""
+import array
+import json
+import os
+import resource
+import signal
+import socket
+import sys
+import threading
+
+MESSAGE_SIZE = 64 * 1024
+
+
+def spawn(request, stdout, stderr):
+    """ runs in the forked child: applies limits and isolation and replaces itself with the program """
+    try:
+        os.setsid()  # kills of the group reach children of the program
+        os.chdir(request['cwd'])
+        stdin = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(stdin, 0)
+        os.dup2(stdout, 1)
+        os.dup2(stderr, 2)
+        for signum in (signal.SIGPIPE, signal.SIGXFSZ):  # ignored by python, programs expect the defaults
+            signal.signal(signum, signal.SIG_DFL)
+        for limit, value in request['limits']:
+            resource.setrlimit(limit, (value, value))
+        if request['isolate'] and hasattr(os, 'unshare'):
+            try:
+                os.unshare(os.CLONE_NEWNET)  # no network, needs privileges or user namespaces
+            except OSError:
+                pass
+        os.execvp(request['args'][0], request['args'])
+    except BaseException as e:
+        os.write(2, "{}: {}\n".format(request['args'][0], e).encode(errors='replace'))
+    finally:
+        os._exit(127)
+
+
+def get_returncode(status):
+    """ like subprocess: the exit code, or the negated number of the signal which killed the program """
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def wait(pid):
+    _, status, rusage = os.wait4(pid, 0)
+    return {
+        'returncode': get_returncode(status),
+        'time': rusage.ru_utime + rusage.ru_stime,
+        'memory': rusage.ru_maxrss * 1024,
+    }
+
+
+def handle(request, fds, pids):
+    if 'wait' in request:
+        pids.discard(request['wait'])
+        return wait(request['wait'])
+    try:
+        pid = os.fork()
+        if pid == 0:
+            spawn(request, *fds)
+    finally:
+        for fd in fds:
+            os.close(fd)
+    pids.add(pid)
+    return {'pid': pid}
+
+
+def receive(connection, maxfds):
+    """ receives a message with file descriptors passed as SCM_RIGHTS ancillary data """
+    fds = array.array('i')
+    data, ancdata, _, _ = connection.recvmsg(MESSAGE_SIZE, socket.CMSG_LEN(maxfds * fds.itemsize))
+    for level, kind, cmsg_data in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(cmsg_data[:len(cmsg_data) - len(cmsg_data) % fds.itemsize])
+    return data, list(fds)
+
+
+def serve_connection(connection):
+    pids = set()
+    with connection:
+        while True:
+            try:
+                data, fds = receive(connection, 2)
+            except OSError:
+                break
+            if not data:
+                break
+            try:
+                response = handle(json.loads(data), fds, pids)
+            except Exception as e:
+                response = {'error': str(e)}
+            try:
+                connection.send(json.dumps(response).encode())
+            except OSError:
+                break
+    for pid in pids:  # left by a client gone without waiting for them
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except OSError:
+            pass
+        os.waitpid(pid, 0)
+
+
+def serve(address, parent):
+    """ serves while the process which started the server is alive """
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+    listener.bind(address)
+    listener.listen()
+    listener.settimeout(1.0)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)  # closes the pipe the starting process reads to know the server listens
+    os.close(devnull)
+    while os.getppid() == parent:
+        try:
+            connection, _ = listener.accept()
+        except socket.timeout:
+            continue
+        connection.setblocking(True)
+        threading.Thread(target=serve_connection, args=(connection,), daemon=True).start()
+
+
+if __name__ == '__main__':
+    serve(sys.argv[1], int(sys.argv[2]))
@@ -0,0 +1,347 @@
+import array
+import atexit
+import json
+import math
+import os
+import resource
+import selectors
+import shlex
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+from contest.utils import Status  # tools.utility.Status has no OL
+
+
+class OutputBuffer:
+    """ keeps the first head and the last tail bytes written to it in fixed-size buffers and counts all of them,
+        so memory it takes does not depend on the amount of output """
+
+    def __init__(self, head, tail):
+        self.head_size = head
+        self.tail_size = tail
+        self.head = bytearray()
+        self.tail = bytearray(tail)  # ring buffer, the oldest byte is at tail_end once it is full
+        self.tail_end = 0
+        self.tail_length = 0
+        self.size = 0
+
+    def write(self, data):
+        with memoryview(data) as view:
+            self.size += len(view)
+            room = self.head_size - len(self.head)
+            if room > 0:
+                self.head += view[:room]
+                view = view[room:]
+            if len(view) == 0 or self.tail_size == 0:
+                return
+            if len(view) >= self.tail_size:
+                self.tail[:] = view[len(view) - self.tail_size:]
+                self.tail_end, self.tail_length = 0, self.tail_size
+                return
+            end = self.tail_end + len(view)
+            if end <= self.tail_size:
+                self.tail[self.tail_end:end] = view
+            else:
+                split = self.tail_size - self.tail_end
+                self.tail[self.tail_end:] = view[:split]
+                self.tail[:end - self.tail_size] = view[split:]
+            self.tail_end = end % self.tail_size
+            self.tail_length = min(self.tail_size, self.tail_length + len(view))
+
+    @property
+    def skipped(self):
+        return self.size - len(self.head) - self.tail_length
+
+    def get_tail(self):
+        if self.tail_length < self.tail_size:
+            return bytes(self.tail[:self.tail_length])
+        return bytes(self.tail[self.tail_end:] + self.tail[:self.tail_end])
+
+    def getvalue(self):
+        if self.skipped == 0:
+            return bytes(self.head) + self.get_tail()
+        marker = "\n... пропущено байт: {} ...\n".format(self.skipped).encode()
+        return bytes(self.head) + marker + self.get_tail()
+
+    def decode(self):
+        return self.getvalue().decode(errors='replace')
+
+
+def capture(process, head, tail, limit=None, timeout=None):
+    """ like process.communicate(), but keeps only head and tail of stdout and stderr. the process is killed once
+        it outputs more than limit bytes (OL) or runs longer than timeout seconds (TL). returns the state and output
+        buffers of stdout and stderr """
+    if process.stdin is not None:
+        process.stdin.close()
+    state, total, buffers = Status.OK, 0, {}
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    with selectors.DefaultSelector() as selector:
+        for stream in (process.stdout, process.stderr):
+            if stream is not None:
+                buffers[stream] = OutputBuffer(head, tail)
+                selector.register(stream, selectors.EVENT_READ)
+        while selector.get_map() and state == Status.OK:
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                state = Status.TL
+                break
+            for key, _ in selector.select(remaining):
+                data = os.read(key.fd, 64 * 1024)
+                if not data:
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
+                    continue
+                buffers[key.fileobj].write(data)
+                total += len(data)
+                if limit is not None and total > limit:
+                    state = Status.OL
+                    break
+    if state != Status.OK:
+        process.kill()
+    process.wait()
+    for stream in buffers:
+        stream.close()
+    return state, buffers.get(process.stdout), buffers.get(process.stderr)
+
+
+"""================================================== Fork Server ==================================================="""
+
+
+SIGNAL_STATES = {
+    signal.SIGXCPU: Status.TL,
+    signal.SIGXFSZ: Status.OL,
+    signal.SIGSEGV: Status.SF,
+    signal.SIGBUS: Status.SF,
+    signal.SIGFPE: Status.FE,
+}
+
+
+class ForkServer:
+    """ starts contest/forkserver.py once and talks to it. the server listens on a unix socket in a private
+        directory, so processes forked from the judge (e.g. test runners) use it as well """
+
+    def __init__(self):
+        self.directory = tempfile.mkdtemp(prefix='forkserver-')
+        self.address = os.path.join(self.directory, 'server.sock')
+        self.owner = os.getpid()
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'forkserver.py')
+        self.process = subprocess.Popen([sys.executable, '-I', '-S', script, self.address, str(self.owner)],
+                                        stdout=subprocess.PIPE)
+        self.process.stdout.read()  # closed once the server listens
+        self.process.stdout.close()
+        atexit.register(self.close)
+
+    def is_alive(self):
+        if os.getpid() == self.owner:
+            return self.process.poll() is None
+        try:
+            os.kill(self.process.pid, 0)
+            return True
+        except OSError:
+            return False
+
+    def connect(self):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        try:
+            connection.connect(self.address)
+        except OSError:
+            connection.close()
+            raise
+        return connection
+
+    def close(self):
+        if os.getpid() == self.owner and self.process.poll() is None:
+            self.process.terminate()
+            self.process.wait()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def get_fork_server():
+    global _server
+    with _server_lock:
+        if _server is None or not _server.is_alive():
+            _server = ForkServer()
+        return _server
+
+
+def request(connection, message, fds=()):
+    ancdata = [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array('i', fds))] if fds else []
+    connection.sendmsg([json.dumps(message).encode()], ancdata)
+    data = connection.recv(64 * 1024)
+    if not data:
+        raise ConnectionResetError("fork server closed the connection")
+    response = json.loads(data)
+    if 'error' in response:
+        raise OSError(response['error'])
+    return response
+
+
+class ForkedProcess:
+    """ the part of subprocess.Popen capture needs, for a program forked by the fork server """
+
+    def __init__(self, connection, pid, stdout, stderr):
+        self.connection = connection
+        self.pid = pid
+        self.stdin = None
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = None
+        self.usage = None
+
+    def kill(self):
+        try:
+            os.killpg(self.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    def wait(self):
+        if self.returncode is None:
+            self.usage = request(self.connection, {'wait': self.pid})
+            self.returncode = self.usage['returncode']
+        return self.returncode
+
+
+class ForkServerSandbox:
+    """ sandbox running compilers and programs through the fork server with limits of cpu time, memory, size of
+        written files and output. the workdir is used in place, reset makes sandboxes reusable by SandboxPool and
+        removes everything created in the previous workdir while the sandbox was bound to it """
+
+    enforces_memory_limit = True
+
+    def __init__(self, workdir):
+        self.bind(workdir)
+        self.connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def bind(self, workdir):
+        self.workdir = workdir
+        try:
+            self.initial_names = set(os.listdir(workdir))
+        except OSError:
+            self.initial_names = set()
+
+    def clean(self):
+        """ removes files of the runs: created inputs and outputs, fetched files and whatever programs left """
+        try:
+            names = set(os.listdir(self.workdir)) - self.initial_names
+        except OSError:
+            return
+        for name in names:
+            path = self.path(name)
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+    def reset(self, workdir):
+        self.clean()
+        self.bind(workdir)
+
+    def path(self, name):
+        return os.path.join(self.workdir, name)
+
+    def create(self, name, content):
+        path = self.path(name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def read(self, path):
+        try:
+            with open(path) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def fetch(self, files):
+        workdir = os.path.realpath(self.workdir)
+        return [file if os.path.dirname(os.path.realpath(file)) == workdir else shutil.copy(file, workdir)
+                for file in files]
+
+    def spawn(self, args, limits):
+        message = {'args': args, 'cwd': self.workdir, 'limits': limits,
+                   'isolate': settings.JUDGE_SANDBOX_ISOLATE_NETWORK}
+        stdout_r, stdout_w = os.pipe()
+        stderr_r, stderr_w = os.pipe()
+        try:
+            for attempt in range(2):  # the server may have gone since the connection was made
+                try:
+                    if self.connection is None:
+                        self.connection = get_fork_server().connect()
+                    pid = request(self.connection, message, [stdout_w, stderr_w])['pid']
+                    break
+                except (ConnectionError, FileNotFoundError):
+                    self.__exit__(None, None, None)
+                    if attempt > 0:
+                        raise
+        except BaseException:
+            os.close(stdout_r)
+            os.close(stderr_r)
+            raise
+        finally:
+            os.close(stdout_w)
+            os.close(stderr_w)
+        return ForkedProcess(self.connection, pid, open(stdout_r, 'rb', buffering=0), open(stderr_r, 'rb', buffering=0))
+
+    def run(self, args, timeout, limits):
+        """ returns the state, the process after it has finished and its stdout and stderr """
+        process = self.spawn(args, limits)
+        state, stdout, stderr = capture(process, settings.JUDGE_OUTPUT_HEAD_SIZE, settings.JUDGE_OUTPUT_TAIL_SIZE,
+                                        limit=settings.JUDGE_OUTPUT_LIMIT, timeout=timeout)
+        if state == Status.OK and process.returncode < 0:
+            state = SIGNAL_STATES.get(-process.returncode, Status.RE)
+        if state == Status.OK and timeout is not None and process.usage['time'] > timeout:
+            state = Status.TL
+        return state, process, stdout.decode(), stderr.decode()
+
+    def compile(self, sources, executable, language, args, timeout, stats):
+        command = list(settings.JUDGE_SANDBOX_COMPILERS[language]) + list(args) + list(sources) + ['-o', executable]
+        stats['compilation_command'] = shlex.join(command)
+        state, process, stats['compilation_stdout'], stats['compilation_stderr'] = \
+            self.run(command, timeout, [(resource.RLIMIT_CORE, 0)])
+        stats['compilation_time'] = process.usage['time']
+        if state == Status.TL:
+            return Status.CL
+        if state != Status.OK or process.returncode != 0:
+            return Status.CE
+        return Status.OK
+
+    def execute(self, executable, args, timeout, stats, memory_limit=None):
+        """ memory_limit is in bytes and is checked against the peak resident memory of the program, its address
+            space is limited to at least JUDGE_SANDBOX_MEMORY_LIMIT as it also counts mappings never touched """
+        command = [os.path.abspath(executable)] + list(args)
+        stats['execution_command'] = shlex.join(command)
+        address_space = max(memory_limit or 0, settings.JUDGE_SANDBOX_MEMORY_LIMIT)
+        limits = [(resource.RLIMIT_CORE, 0), (resource.RLIMIT_FSIZE, settings.JUDGE_OUTPUT_LIMIT),
+                  (resource.RLIMIT_AS, address_space)]
+        if timeout is not None:
+            limits.append((resource.RLIMIT_CPU, math.ceil(timeout) + 1))
+        state, process, stats['execution_stdout'], stats['execution_stderr'] = self.run(command, timeout, limits)
+        stats['execution_time'] = process.usage['time']
+        stats['execution_memory'] = process.usage['memory']
+        stats['execution_returncode'] = process.returncode
+        if state not in (Status.TL, Status.OL) and memory_limit is not None and process.usage['memory'] >= memory_limit:
+            state = Status.ML
+        return state
@@ -1,11 +1,12 @@
 class TaskProgress {
-    constructor(progress_url, execution_list_url, poll_interval, max_retries) {
+    constructor(progress_url, execution_list_url, poll_interval, max_retries, stream_url = '') {
         this.progress_bar_element = document.getElementById('progress-bar');
         this.progress_bar_message_element = document.getElementById('progress-bar-message');
         this.execution_list_element = document.getElementById('execution_list');
         this.btn_submission_evaluate_element = document.getElementById('btn_submission_evaluate');
         this.btn_submission_evaluate_text = this.btn_submission_evaluate_element.innerText;
         this.progress_url = progress_url;
+        this.stream_url = stream_url;
         this.task_id = '';
         this.execution_list_url = execution_list_url;
         this.poll_interval = poll_interval;
@@ -109,14 +110,7 @@ class TaskProgress {
                     this.delayPoll(this.poll_interval);
                 }
             } else {
-                response = await fetch(this.execution_list_url, {cache: "no-store"});
-                if (response.ok) {
-                    this.execution_list_element.innerHTML = await response.text();
-                } else {
-                    let err = new Error('fetch(executions): http status ' + response.status);
-                    console.log(err);
-                    this.retryPoll("Произошла ошибка при получении результатов проведенной проверки", true);
-                }
+                await this.loadExecutions();
             }
         } else {
             let err = new Error('fetch(progress): http status ' + response.status);
@@ -125,9 +119,40 @@ class TaskProgress {
         }
     }
 
+    async loadExecutions() {
+        let response = await fetch(this.execution_list_url, {cache: "no-store"});
+        if (response.ok) {
+            this.execution_list_element.innerHTML = await response.text();
+        } else {
+            let err = new Error('fetch(executions): http status ' + response.status);
+            console.log(err);
+            this.retryPoll("Произошла ошибка при получении результатов проведенной проверки", true);
+        }
+    }
+
+    stream() {
+        let source = new EventSource(this.stream_url + encodeURIComponent(this.task_id));
+        source.addEventListener('progress', event => {
+            if (this.updateProgress(JSON.parse(event.data))) {
+                source.close();
+                this.loadExecutions();
+            }
+        });
+        source.onerror = () => {
+            // the stream is unavailable or has timed out, poll instead
+            source.close();
+            if (this.task_id !== '') {
+                this.poll();
+            }
+        };
+    }
+
     startPolling(task_id) {
         this.task_id = task_id;
         this.clearProgressBar();
+        if (this.stream_url && window.EventSource) {
+            return this.stream();
+        }
         return this.poll();
     }
 }
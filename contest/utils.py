@@ -1,4 +1,9 @@
 import enum
+import itertools
+import mmap
+import os
+import re
+from contextlib import contextmanager
 
 from django.conf import settings
 from django.views.generic import TemplateView
@@ -24,18 +29,46 @@ class Status(enum.Enum):
 
     UN = 0   # Undefined
 
+    OL = 15  # Output Limit Exceeded
+
     def __str__(self):
         return self.name
 
 
-def diff(output, correct, precision=None, check_format=False):
-    if check_format and len(output.splitlines()) != len(correct.splitlines()):
-        return True  # number of lines differ
-    out_tokens, cor_tokens = output.split(), correct.split()
-    if len(out_tokens) != len(cor_tokens):
-        return True  # number of tokens differ
+BYTES_TOKEN = re.compile(rb'[^\t\n\x0b\x0c\r\x1c-\x1f ]+')  # str.split() separators in ASCII
+BYTES_LINE_BREAK = re.compile(rb'\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e]|\xc2\x85|\xe2\x80[\xa8\xa9]')  # str.splitlines() ones in UTF-8
+STR_TOKEN = re.compile(r'\S+')
+STR_LINE_BREAK = re.compile(r'\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')
+
+
+def iter_tokens(data):
+    """ lazily yields the tokens str.split() would give for str or UTF-8 bytes-like data (e.g. mmap) """
+    if isinstance(data, str):
+        for match in STR_TOKEN.finditer(data):
+            yield match.group()
+    else:
+        for match in BYTES_TOKEN.finditer(data):
+            token = match.group()
+            if token.isascii():
+                yield token
+            else:
+                yield from token.decode().split()  # may contain unicode whitespace
+
+
+def count_lines(data):
+    """ len(data.splitlines()) for str or UTF-8 bytes-like data without splitting it """
+    pattern = STR_LINE_BREAK if isinstance(data, str) else BYTES_LINE_BREAK
+    count, end = 0, 0
+    for match in pattern.finditer(data):
+        count, end = count + 1, match.end()
+    return count + (end < len(data))
+
+
+def diff_tokens(out_tokens, cor_tokens, precision=None, check_format=False):
     _precision = precision or 1e-5
-    for out_token, cor_token in zip(out_tokens, cor_tokens):
+    for out_token, cor_token in itertools.zip_longest(out_tokens, cor_tokens):
+        if out_token is None or cor_token is None:
+            return True  # number of tokens differ
         if out_token != cor_token:
             if precision is None:
                 try:
@@ -55,8 +88,43 @@ def diff(output, correct, precision=None, check_format=False):
     return False
 
 
+def diff(output, correct, precision=None, check_format=False):
+    if check_format and len(output.splitlines()) != len(correct.splitlines()):
+        return True  # number of lines differ
+    out_tokens, cor_tokens = output.split(), correct.split()
+    if len(out_tokens) != len(cor_tokens):
+        return True  # number of tokens differ
+    return diff_tokens(out_tokens, cor_tokens, precision, check_format)
+
+
+def diff_stream(output, correct, precision=None, check_format=False):
+    """ same as diff, but tokenizes output and correct (str, bytes or mmap, both of the same kind) incrementally
+        and stops at the first mismatch. raises UnicodeDecodeError on invalid UTF-8 """
+    if diff_tokens(iter_tokens(output), iter_tokens(correct), precision, check_format):
+        return True
+    return check_format and count_lines(output) != count_lines(correct)
+
+
+@contextmanager
+def map_file(path):
+    """ memory-maps file for reading, yields None if it does not exist """
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        yield None
+        return
+    with f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
 def get_sandbox_class(based_on=''):
-    return object
+    """ sandboxes shipped with the project, other ones come with tools.sandbox """
+    from contest.sandbox import ForkServerSandbox
+    return {'subprocess': ForkServerSandbox, 'forkserver': ForkServerSandbox}.get(based_on, object)
 
 
 def under_development(view):
@@ -44,6 +44,7 @@ submission_status_emojis = {
     'NA': emojize(":yellow_circle:"),
     'TL': emojize(":red_circle:"),
     'ML': emojize(":red_circle:"),
+    'OL': emojize(":red_circle:"),
     'CL': emojize(":red_circle:"),
     'FE': emojize(":red_circle:"),
     'SF': emojize(":red_circle:"),
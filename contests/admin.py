@@ -3,7 +3,7 @@ from django.contrib.contenttypes.admin import GenericStackedInline
 
 from contests.forms import CourseForm
 from contests.models import (Assignment, Attachment, Contest, Course, Credit, Execution, FNTest, IOTest, Option,
-                             Problem, Submission, SubmissionPattern, UTTest)
+                             Problem, Rejudge, Submission, SubmissionPattern, TimingSpan, UTTest)
 
 
 class AttachmentInline(GenericStackedInline):
@@ -236,6 +236,7 @@ class ExecutionAdmin(admin.ModelAdmin):
                 'test_output_correct',
                 'test_summary',
                 'exception',
+                'output_refs',
             )
         }),
         ('Даты', {
@@ -245,4 +246,20 @@ class ExecutionAdmin(admin.ModelAdmin):
     readonly_fields = ('submission', 'date_created')
 
 
+@admin.register(Rejudge)
+class RejudgeAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'status', 'processed', 'total', 'date_created')
+    list_filter = ('status',)
+    search_fields = ('problem__title',)
+    readonly_fields = ('date_updated', 'date_created')
+
+
+@admin.register(TimingSpan)
+class TimingSpanAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'name', 'count', 'duration', 'date_created')
+    list_filter = ('name',)
+    search_fields = ('problem__title',)
+    readonly_fields = ('submission', 'problem', 'date_created')
+
+
 admin.site.register(Option)
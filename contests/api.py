@@ -1,4 +1,7 @@
+import uuid
+
 from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Q
 from django.http import JsonResponse
 from rest_framework.authentication import BasicAuthentication, SessionAuthentication
 from rest_framework.exceptions import ValidationError
@@ -9,10 +12,13 @@ from rest_framework.views import APIView
 
 from accounts.models import Notification
 from contests.forms import SubmissionFilesForm, SubmissionVerbalForm
-from contests.models import Assignment, Problem, Submission
+from contests.models import Assignment, CourseLeader, Problem, Rejudge, Submission
+from contests.observers import get_tasks_progress
 from contests.results import TaskProgress
+from contests.routing import enqueue, get_submission_kind
 from contests.tasks import evaluate_submission
-from contests.templatetags.contests import colorize
+from contests.templatetags.contests import (colorize, get_submission_score, get_submission_status,
+                                            get_submission_status_display, get_submission_style)
 
 
 class DjangoPermission(BasePermission):
@@ -110,7 +116,9 @@ class SubmissionEvaluateAPI(APIView):
         if not hasattr(self, 'object'):
             self.object = self.get_object()
         if self.object.problem.type == 'Program' and self.object.problem.is_testable:
-            task = evaluate_submission.delay(self.object.pk, request.user.id, **self.storage)
+            kind = get_submission_kind(self.object, request.user)
+            task = enqueue(evaluate_submission, kind, self.object.course.id, args=(self.object.pk, request.user.id),
+                           kwargs=self.storage)
             self.object.task_id = task.id
             self.object.save()
             return JsonResponse({'status': "OK", 'task_id': task.id})
@@ -140,6 +148,50 @@ class SubmissionProgressAPI(APIView):
         return JsonResponse(progress.get_info())
 
 
+class SubmissionStatusAPI(APIView):
+    """ statuses of many submissions in a single request: ?id=<submission_id>&...&task=<task_id>&...
+        submissions the user may not view are left out """
+    authentication_classes = [SessionAuthentication, BasicAuthentication]
+    permission_classes = [IsAuthenticated]
+    max_submissions = 200
+
+    def get_queryset(self):
+        try:
+            ids = [int(submission_id) for submission_id in self.request.GET.getlist('id')]
+            task_ids = [str(uuid.UUID(task_id)) for task_id in self.request.GET.getlist('task')]
+        except ValueError:
+            raise ValidationError("Параметры id и task должны быть идентификаторами посылок и задач")
+        if len(ids) + len(task_ids) > self.max_submissions:
+            raise ValidationError("Можно запросить не более %s посылок" % self.max_submissions)
+        queryset = (Submission.objects.filter(Q(id__in=ids) | Q(task_id__in=task_ids))
+                    .select_related('assignment', 'main_submission__assignment'))
+        user = self.request.user
+        if not user.has_perm('contests.view_submission'):
+            led_course_ids = CourseLeader.objects.filter(leader=user).values('course_id')
+            queryset = queryset.filter(Q(owner=user) | Q(problem__contest__course_id__in=led_course_ids))
+        return queryset
+
+    def get(self, request, *args, **kwargs):
+        submissions = list(self.get_queryset())
+        progresses = get_tasks_progress([submission.task_id for submission in submissions if submission.task_id])
+        statuses = []
+        for submission in submissions:
+            status, progress = get_submission_status(submission, request), 100
+            if submission.task_id:
+                progress = progresses.get(submission.task_id, {}).get('progress', 0)
+            statuses.append({
+                'id': submission.id,
+                'task_id': submission.task_id,
+                'status': status,
+                'status_display': get_submission_status_display(submission, request),
+                'score': get_submission_score(submission, request),
+                'class': get_submission_style(submission, request),
+                'progress': progress,
+                'complete': submission.task_id is None,
+            })
+        return JsonResponse({'submissions': statuses})
+
+
 class SubmissionUpdateSerializer(ModelSerializer):
     ALLOWED_STATUSES = ('OK', 'PS', 'TF', 'WA', 'NA', 'EV', 'UN')
 
@@ -218,3 +270,33 @@ class SubmissionUpdateAPI(UpdateAPIView):
 
     def post(self, request, *args, **kwargs):
         return self.update(request, *args, **kwargs)
+
+
+class RejudgeProgressAPI(APIView):
+    permission_classes = [IsAuthenticated, DjangoPermission | IsObjectOwner | IsCourseLeader]
+    permission_required = 'contests.view_rejudge'
+
+    def has_ownership(self):
+        if not hasattr(self, 'object'):
+            self.object = self.get_object()
+        return self.object.course.owner_id == self.request.user.id
+
+    def has_leadership(self):
+        if not hasattr(self, 'object'):
+            self.object = self.get_object()
+        return self.object.course.leaders.filter(id=self.request.user.id).exists()
+
+    def get_object(self):
+        return Rejudge.objects.get(pk=self.kwargs.get('pk'))
+
+    def get(self, request, *args, **kwargs):
+        rejudge = self.get_object()
+        return JsonResponse({
+            'status': rejudge.status,
+            'status_display': rejudge.get_status_display(),
+            'processed': rejudge.processed,
+            'total': rejudge.total,
+            'progress': rejudge.get_progress(),
+            'complete': rejudge.is_finished,
+            'failed': rejudge.is_failed,
+        })
@@ -0,0 +1,99 @@
+import os
+import re
+import tempfile
+from contextlib import ExitStack
+
+from contests.compilation import cached_compile, get_compile_cache
+from contests.sandboxes import acquire_sandbox
+
+try:
+    from tools.utility import Status
+except ImportError:
+    from contest.utils import Status
+
+SOURCE_EXTENSIONS = {'.c', '.cc', '.cpp', '.cxx'}
+INCLUDE_PATTERN = re.compile(rb'^[ \t]*#[ \t]*include[ \t]*["<]([^">\n]+)[">]', re.MULTILINE)
+
+
+def get_includable_files(source, files):
+    """ files of the sandbox besides the translation unit which it may include: every file which is not a translation
+        unit itself (e.g. headers of the submission) and translation units named by an #include of those """
+    others = [file for file in files if file != source]
+    headers = [file for file in others if os.path.splitext(file)[1] not in SOURCE_EXTENSIONS]
+    names = set()
+    for path in [source] + headers:
+        with open(path, 'rb') as f:
+            names.update(os.path.basename(name).decode(errors='replace') for name in INCLUDE_PATTERN.findall(f.read()))
+    return headers + [file for file in others if file not in headers and os.path.basename(file) in names]
+
+
+class Build:
+    def __init__(self, state, executable, workdir, stats):
+        self.state = state
+        self.executable = executable
+        self.workdir = workdir
+        self.stats = stats
+
+    @property
+    def is_ok(self):
+        return self.state == Status.OK
+
+
+class BuildSet:
+    """ compiles each distinct (sources, language, compile args) combination of a submission once and shares the
+        resulting executable between all tests using it. each build has a workdir of its own, executables live in
+        sandboxes kept open until exit. """
+
+    def __init__(self, submission, observer, sandbox_type='subprocess'):
+        self.submission = submission
+        self.observer = observer
+        self.sandbox_type = sandbox_type
+        self.builds = dict()
+        self.stack = ExitStack()
+        self._sources = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stack.close()
+
+    @property
+    def sources(self):
+        if self._sources is None:
+            self._sources = self.submission.files
+        return self._sources
+
+    def get(self, test):
+        if not hasattr(test, 'get_build_key'):
+            return None
+        key = test.get_build_key(self.sources)
+        if key not in self.builds:
+            self.builds[key] = self.compile(test)
+        return self.builds[key]
+
+    def compile(self, test):
+        with self.observer.span('sandbox'):
+            workdir = self.stack.enter_context(tempfile.TemporaryDirectory(prefix='build-'))
+            sandbox = self.stack.enter_context(acquire_sandbox(self.sandbox_type, workdir))
+        language, args, timeout = test.problem.language, test.get_compile_args(), test.problem.time_limit
+        self.observer.set_progress('Компилируем', 5, 100)
+        with self.observer.span('compile'):
+            sources = sandbox.fetch(self.sources)
+            if test.build_files:
+                build_files = sandbox.fetch(test.build_files)
+                sources += [self.compile_object(sandbox, source, sources + build_files, language, args, timeout)
+                            for source in build_files]
+            state, executable, stats = cached_compile(sandbox, sources, 'exe', language, args, timeout)
+        return Build(state, executable, workdir, stats)
+
+    @staticmethod
+    def compile_object(sandbox, source, files, language, args, timeout):
+        """ with the compile cache enabled, translation units of test files are compiled on their own so that their
+            objects are shared by all submissions with the same files the unit may include (see get_includable_files).
+            other files (e.g. headers) and units failing to compile on their own are left to the final compilation """
+        if get_compile_cache() is None or os.path.splitext(source)[1] not in SOURCE_EXTENSIONS:
+            return source
+        state, obj, _ = cached_compile(sandbox, [source], os.path.basename(source) + '.o', language, args + ['-c'],
+                                       timeout, dependencies=get_includable_files(source, files))
+        return obj if state == Status.OK else source
@@ -0,0 +1,116 @@
+import itertools
+import warnings
+
+import numpy as np
+from django.core.exceptions import ValidationError
+
+from contest.utils import diff_stream, iter_tokens
+
+CHUNK_SIZE = 1024 * 1024
+CHECKERS = dict()  # checker(output, correct, **args) gets bytes-like outputs and returns True if they differ
+
+
+def checker(name, verbose_name, **arg_types):
+    """ arg_types map the names of the args the checker takes to the functions parsing their values """
+    def register(func):
+        func.verbose_name = verbose_name
+        func.arg_types = arg_types
+        CHECKERS[name] = func
+        return func
+    return register
+
+
+def get_checker(name):
+    return CHECKERS[name]
+
+
+def get_checker_choices():
+    return tuple((name, func.verbose_name) for name, func in CHECKERS.items())
+
+
+def parse_checker_args(checker_args):
+    args = dict()
+    for arg in checker_args.split():
+        name, sep, value = arg.partition('=')
+        if not name or not sep:
+            raise ValueError(arg)
+        args[name] = value
+    return args
+
+
+def validate_checker_args(checker_args):
+    try:
+        parse_checker_args(checker_args)
+    except ValueError as e:
+        raise ValidationError("Параметр %(arg)s должен иметь вид имя=значение", params={'arg': str(e)})
+
+
+def validate_checker(name, checker_args):
+    """ checks that the checker takes the args and their values can be parsed, so that they fail on saving, not when
+        the submissions are checked """
+    validate_checker_args(checker_args)
+    func = get_checker(name)
+    for arg, value in parse_checker_args(checker_args).items():
+        if arg not in func.arg_types:
+            raise ValidationError("Способ проверки «%(checker)s» не имеет параметра %(arg)s",
+                                  params={'checker': func.verbose_name, 'arg': arg})
+        try:
+            func.arg_types[arg](value)
+        except ValueError:
+            raise ValidationError("Недопустимое значение параметра %(arg)s: %(value)s",
+                                  params={'arg': arg, 'value': value})
+
+
+def parse_flag(value):
+    if value not in ('0', '1'):
+        raise ValueError(value)
+    return value == '1'
+
+
+@checker('default', "Токены и числа", precision=float, check_format=parse_flag)
+def default(output, correct, precision=None, check_format='0'):
+    precision = None if precision is None else float(precision)
+    return diff_stream(output, correct, precision=precision, check_format=check_format == '1')
+
+
+@checker('exact', "Точное совпадение")
+def exact(output, correct):
+    if len(output) != len(correct):
+        return True
+    for i in range(0, len(output), CHUNK_SIZE):
+        if output[i:i + CHUNK_SIZE] != correct[i:i + CHUNK_SIZE]:
+            return True
+    return False
+
+
+@checker('tokens', "Совпадение токенов")
+def tokens(output, correct):
+    return any(out_token != cor_token
+               for out_token, cor_token in itertools.zip_longest(iter_tokens(output), iter_tokens(correct)))
+
+
+def parse_numbers(data):
+    """ parses whitespace separated numbers straight from the buffer. if numpy cannot read all of it (e.g. 1_000,
+        which float() accepts), tokens are converted one by one, raising ValueError for ones which are not numbers """
+    data = bytes(data)
+    if not data or data.isspace():
+        return np.empty(0)  # numpy reads -1 from whitespace only
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', DeprecationWarning)  # older numpy returns what it has read with a warning
+        try:
+            return np.fromstring(data, sep=' ')
+        except (ValueError, DeprecationWarning):
+            pass
+    return np.array(data.split(), dtype=bytes).astype(np.float64)
+
+
+@checker('float', "Числа с допуском", atol=float, rtol=float)
+def floats(output, correct, atol='1e-5', rtol='0'):
+    """ parses whole outputs into arrays and compares them at once: |out - cor| <= atol + rtol * |cor| """
+    try:
+        out_numbers, cor_numbers = parse_numbers(output), parse_numbers(correct)
+    except ValueError:
+        return True  # not a number
+    if out_numbers.shape != cor_numbers.shape:
+        return True  # number of numbers differ
+    return not np.allclose(out_numbers, cor_numbers, rtol=float(rtol), atol=float(atol), equal_nan=True)
@@ -0,0 +1,147 @@
+import fcntl
+import hashlib
+import json
+import math
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+
+try:
+    from tools.utility import Status
+except ImportError:
+    from contest.utils import Status
+
+
+class CompileCache:
+    """ content-addressed store of compilation results shared by all worker processes of a host. an entry is a
+        directory named by the key holding the compiled file and the compilation stats, it is written aside and
+        renamed into place, so readers never see partial entries. the total size of entries is tracked in a file,
+        least recently used entries are evicted once it outgrows the size of the cache; eviction holds an exclusive
+        lock, readers hold a shared one """
+
+    CACHEABLE_STATES = {Status.OK, Status.CE}
+
+    def __init__(self, root, size):
+        self.root = root
+        self.size = size
+
+    @staticmethod
+    def make_key(sources, name, language, args, dependencies=()):
+        """ dependencies are files which the sources may include, they are not compiled on their own """
+        digest = hashlib.sha256()
+        for part in (name, language, *args):
+            digest.update(part.encode() + b'\0')
+        for prefix, files in ((b'', sources), (b'\1', sorted(dependencies, key=os.path.basename))):
+            for file in files:
+                digest.update(prefix + os.path.basename(file).encode() + b'\0')
+                with open(file, 'rb') as f:
+                    content = f.read()
+                digest.update(str(len(content)).encode() + b'\0' + content)
+        return digest.hexdigest()
+
+    def get_entry(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    @contextmanager
+    def lock(self, operation):
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, '.lock'), 'a') as f:
+            fcntl.flock(f, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def load(self, key, name, sandbox):
+        entry = self.get_entry(key)
+        if not os.path.isdir(entry):
+            return None
+        with self.lock(fcntl.LOCK_SH):
+            try:
+                with open(os.path.join(entry, 'stats.json')) as f:
+                    data = json.load(f)
+                state, output = Status[data['state']], sandbox.path(name)
+                if state == Status.OK:
+                    output, = sandbox.fetch([os.path.join(entry, name)])
+                os.utime(entry)
+            except Exception:
+                return None  # evicted or broken entry, compile again
+        return state, output, data['stats']
+
+    def store(self, key, name, state, output, stats):
+        entry = self.get_entry(key)
+        if state not in self.CACHEABLE_STATES or os.path.isdir(entry):
+            return
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix='.tmp-', dir=self.root)
+        try:
+            if state == Status.OK:
+                shutil.copy2(output, os.path.join(tmp, name))
+            with open(os.path.join(tmp, 'stats.json'), 'w') as f:
+                json.dump({'state': state.name, 'stats': stats}, f, default=str)
+            size = sum(f.stat().st_size for f in os.scandir(tmp))
+            os.rename(tmp, entry)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)  # stored by another worker in the meantime
+            return
+        if self.add_size(size) > self.size:
+            self.evict()
+
+    def get_size_file(self):
+        return os.path.join(self.root, '.size')
+
+    def add_size(self, size):
+        """ returns the tracked size of the cache after adding size to it, infinity if it is not tracked yet """
+        with self.lock(fcntl.LOCK_EX):
+            try:
+                with open(self.get_size_file()) as f:
+                    total = int(f.read()) + size
+            except (OSError, ValueError):
+                return math.inf  # left for eviction to count
+            with open(self.get_size_file(), 'w') as f:
+                f.write(str(total))
+        return total
+
+    def evict(self):
+        """ scans all entries, evicts least recently used ones and writes the size of the rest to the size file """
+        with self.lock(fcntl.LOCK_EX):
+            entries, total = [], 0
+            for prefix in os.scandir(self.root):
+                if not prefix.is_dir() or prefix.name.startswith('.'):
+                    continue
+                for entry in os.scandir(prefix.path):
+                    size = sum(f.stat().st_size for f in os.scandir(entry.path))
+                    entries.append((entry.stat().st_mtime, size, entry.path))
+                    total += size
+            for _, size, path in sorted(entries):
+                if total <= self.size:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+            with open(self.get_size_file(), 'w') as f:
+                f.write(str(total))
+
+
+def get_compile_cache():
+    if not settings.JUDGE_COMPILE_CACHE_DIR:
+        return None
+    return CompileCache(settings.JUDGE_COMPILE_CACHE_DIR, settings.JUDGE_COMPILE_CACHE_SIZE)
+
+
+def cached_compile(sandbox, sources, name, language, args, timeout, dependencies=()):
+    """ compiles sources into sandbox.path(name) or fetches the same compilation from the cache,
+        returns state, path of the compiled file and compilation stats """
+    cache, stats = get_compile_cache(), {}
+    key = cache.make_key(sources, name, language, args, dependencies) if cache is not None else None
+    if key is not None:
+        result = cache.load(key, name, sandbox)
+        if result is not None:
+            return result
+    output = sandbox.path(name)
+    state = sandbox.compile(sources, output, language=language, args=args, timeout=timeout, stats=stats)
+    if key is not None:
+        cache.store(key, name, state, output, stats)
+    return state, output, stats
@@ -0,0 +1,115 @@
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.db import connections
+
+from contests.observers import TimingObserver
+
+try:
+    from tools.utility import Status
+except ImportError:
+    from contest.utils import Status
+
+_executor = None
+
+
+def _init_worker():
+    # database connections are inherited from the forking process and must not be shared with it
+    for connection in connections.all():
+        connection.connection = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.JUDGE_WORKERS, initializer=_init_worker,
+                                        mp_context=multiprocessing.get_context('fork'))
+    return _executor
+
+
+def reset_executor(futures=()):
+    """ drops the pool, the futures are cancelled first so that tests which have not started are not run """
+    global _executor
+    for future in futures:
+        if future is not None:
+            future.cancel()
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+    _executor = None
+
+
+def run_test(test, submission, observer, problem, builds, user=None, sandbox_type='subprocess'):
+    stats = {}
+    try:
+        build = builds.get(test)
+        state, stats = test.run(submission, observer, problem, user=user, sandbox_type=sandbox_type, build=build)
+    except Exception as e:
+        state, stats['exception'] = Status.EX, str(e)
+    return state, stats
+
+
+def run_built_test(test, build, sandbox_type):
+    """ executed in a pool worker: gets a ready build, does not touch the database and reports no progress.
+        timings of stages are passed back in stats['spans'] """
+    stats, observer = {}, TimingObserver()
+    try:
+        state, stats = test.run(None, observer, None, sandbox_type=sandbox_type, build=build)
+    except Exception as e:
+        state, stats['exception'] = Status.EX, str(e)
+    stats['spans'] = observer.pop_spans()
+    return state, stats
+
+
+def wait_for(future, pending=()):
+    try:
+        return future.result()
+    except Exception as e:
+        if isinstance(e, BrokenProcessPool):
+            reset_executor(pending)
+        return Status.EX, {'exception': str(e)}
+
+
+def run_sequentially(tests, submission, observer, problem, builds, user=None, sandbox_type='subprocess'):
+    for test in tests:
+        yield run_test(test, submission, observer, problem, builds, user=user, sandbox_type=sandbox_type)
+
+
+def submit_test(test, builds, sandbox_type):
+    """ the future of a test run in the pool, None for tests to be run in the calling process """
+    try:
+        build = builds.get(test)
+        if build is not None and build.is_ok:
+            test.prepare()
+    except Exception:
+        build = None
+    if build is not None and build.is_ok:
+        return get_executor().submit(run_built_test, test, build, sandbox_type)
+    return None
+
+
+def run_in_parallel(tests, submission, observer, problem, builds, user=None, sandbox_type='subprocess'):
+    """ compiles in the calling process and runs built tests in the pool. results are yielded in the order of tests,
+        at most two tests per worker are submitted ahead, so closing the generator leaves the rest unsubmitted and
+        cancels the submitted ones which have not started yet. tests without a build (FN-tests) and tests with a failed
+        build are run in the calling process """
+    tests, window, window_size = list(tests), deque(), 2 * max(settings.JUDGE_WORKERS, 1)
+    try:
+        for i, test in enumerate(tests, 1):
+            for ahead in tests[i - 1 + len(window):i - 1 + window_size]:
+                window.append((ahead, submit_test(ahead, builds, sandbox_type)))
+            test, future = window.popleft()
+            if future is None:
+                result = run_test(test, submission, observer, problem, builds, user=user, sandbox_type=sandbox_type)
+            else:
+                result = wait_for(future, [future for _, future in window])
+                for name, duration in result[1].pop('spans', []):
+                    observer.add_span(name, duration)
+            observer.set_progress('Проверяем', i, len(tests))
+            yield result
+    finally:
+        for _, future in window:
+            if future is not None:
+                future.cancel()
@@ -13,8 +13,9 @@ from django.utils import timezone
 
 from accounts.models import Account
 from contest.widgets import BootstrapSelect, BootstrapSelectMultiple, OptionCheckboxSelect, OptionRadioSelect
-from contests.models import (Assignment, Attachment, Attendance, Contest, Course, CourseLeader, Credit, FNTest, Option,
-                             Problem, Submission, SubmissionPattern, SubProblem, UTTest)
+from contests.checkers import validate_checker
+from contests.models import (Assignment, Attachment, Attendance, Contest, Course, CourseLeader, Credit, FNTest, IOTest,
+                             Option, Problem, Submission, SubmissionPattern, SubProblem, UTTest)
 
 
 class UserChoiceField(forms.ModelChoiceField):
@@ -444,13 +445,22 @@ class ProblemMoveForm(forms.ModelForm):
 class ProblemProgramForm(ProblemForm):
     class Meta(ProblemForm.Meta):
         fields = ProblemForm.Meta.fields + ['language', 'compile_args', 'launch_args', 'time_limit', 'memory_limit',
-                                            'is_testable']
+                                            'checker', 'checker_args', 'is_testable']
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['time_limit'].append_text = "секунд"
         self.fields['memory_limit'].append_text = "КБайт"
 
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('checker') and 'checker_args' in cleaned_data:
+            try:
+                validate_checker(cleaned_data['checker'], cleaned_data['checker_args'])
+            except ValidationError as e:
+                self.add_error('checker_args', e)
+        return cleaned_data
+
 
 class ProblemCommonForm(ProblemForm):
     pass
@@ -573,6 +583,29 @@ class SubmissionPatternForm(forms.ModelForm):
         self.fields['problems'].initial = (problem,)
 
 
+"""===================================================== IOTest ====================================================="""
+
+
+class IOTestForm(forms.ModelForm):
+    class Meta:
+        model = IOTest
+        fields = ['title', 'compile_args', 'compile_args_override', 'launch_args', 'launch_args_override', 'input',
+                  'output', 'checker', 'checker_args']
+
+    def __init__(self, *args, problem=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.problem = problem
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if 'checker' in cleaned_data and cleaned_data.get('checker_args'):
+            try:  # args of the test without a checker of its own are passed to the checker of the problem
+                validate_checker(cleaned_data['checker'] or self.problem.checker, cleaned_data['checker_args'])
+            except ValidationError as e:
+                self.add_error('checker_args', e)
+        return cleaned_data
+
+
 """===================================================== UTTest ====================================================="""
 
 
@@ -0,0 +1,133 @@
+"""
+gradebook of a course: assignments of students to problems grouped by student and contest, which the course table and
+the credit page render. a gradebook is built once per course and list of students and kept in the gradebook cache as
+arrays of ids and scores. a change of an assignment or credit of the course, or of a submission which changes the
+latest submission of an assignment, replaces the version of gradebooks of the course, so stale ones are never read.
+while a course table is open, changes of the course are also recorded by CourseTableChange for contests/streams.py
+"""
+import hashlib
+import uuid
+from collections import namedtuple
+
+import numpy as np
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+GradebookEntry = namedtuple('GradebookEntry', ['id', 'number', 'score', 'remark', 'has_new_submission'])
+
+
+def get_version_key(course_id):
+    return 'gradebook:{}:version'.format(course_id)
+
+
+def get_version(course_id):
+    key = get_version_key(course_id)
+    version = caches['gradebook'].get(key)
+    if version is None:
+        caches['gradebook'].add(key, uuid.uuid4().hex, None)
+        version = caches['gradebook'].get(key)
+    return version
+
+
+def set_versions(course_ids):
+    caches['gradebook'].set_many({get_version_key(course_id): uuid.uuid4().hex for course_id in course_ids}, None)
+
+
+def invalidate_gradebook(*course_ids):
+    """ replaces versions of gradebooks of the courses now and once the transaction is committed: until then readers
+        see the previous state of the database and could cache it under the new version """
+    course_ids = {course_id for course_id in course_ids if course_id is not None}
+    if course_ids:
+        set_versions(course_ids)
+        transaction.on_commit(lambda: set_versions(course_ids))
+
+
+def get_watch_key(course_id):
+    return 'gradebook:{}:watched'.format(course_id)
+
+
+def watch_course_table(course_id):
+    """ marks the table of the course as open for COURSE_TABLE_WATCH_TIMEOUT seconds """
+    caches['gradebook'].set(get_watch_key(course_id), True, settings.COURSE_TABLE_WATCH_TIMEOUT)
+
+
+def get_watched_course_ids(course_ids):
+    keys = {get_watch_key(course_id): course_id for course_id in course_ids}
+    return {keys[key] for key in caches['gradebook'].get_many(keys)}
+
+
+class Gradebook:
+    """ assignments of a course as parallel arrays ordered by student, contest, date of creation and problem number,
+        rows are positions of students in the list the gradebook is built for """
+
+    def __init__(self, ids, rows, contest_ids, numbers, scores, remarks, new_submission_flags, rows_num):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.rows = np.asarray(rows, dtype=np.int32)
+        self.contest_ids = np.asarray(contest_ids, dtype=np.int64)
+        self.numbers = np.asarray(numbers, dtype=np.int32)
+        self.scores = np.asarray(scores, dtype=np.int8)
+        self.remarks = tuple(remarks)
+        self.new_submission_flags = np.asarray(new_submission_flags, dtype=bool)
+        self.rows_num = rows_num
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, course, user_ids):
+        Assignment = apps.get_model('contests', 'Assignment')
+        positions = {user_id: i for i, user_id in enumerate(user_ids)}
+        values = list(Assignment.objects.filter(user_id__in=user_ids, problem__contest__course=course)
+                      .order_by('problem__contest', 'date_created', 'problem__number')
+                      .values_list('id', 'user_id', 'problem__contest_id', 'problem__number', 'score', 'remark',
+                                   'latest_submission_status', 'latest_submission_date_created', 'date_updated'))
+        values.sort(key=lambda value: positions[value[1]])  # stable, keeps the order within a student
+        return cls(ids=[value[0] for value in values],
+                   rows=[positions[value[1]] for value in values],
+                   contest_ids=[value[2] for value in values],
+                   numbers=[value[3] for value in values],
+                   scores=[value[4] for value in values],
+                   remarks=[value[5] for value in values],
+                   new_submission_flags=[status == 'UN' and date_created > date_updated
+                                         for *_, status, date_created, date_updated in values],
+                   rows_num=len(user_ids))
+
+    def get_entry(self, i):
+        return GradebookEntry(int(self.ids[i]), int(self.numbers[i]), int(self.scores[i]), self.remarks[i],
+                              bool(self.new_submission_flags[i]))
+
+    def get_table(self, contests):
+        """ entries of every student by contest """
+        columns = {contest.id: j for j, contest in enumerate(contests)}
+        table = [[[] for _ in columns] for _ in range(self.rows_num)]
+        for i in range(len(self)):
+            j = columns.get(int(self.contest_ids[i]))
+            if j is not None:
+                table[self.rows[i]][j].append(self.get_entry(i))
+        return table
+
+    def get_averages(self, contests):
+        """ average score of assignments of every contest, 0 for contests without assignments """
+        averages = []
+        for contest in contests:
+            scores = self.scores[self.contest_ids == contest.id]
+            averages.append(float(scores.mean()) if len(scores) else 0)
+        return averages
+
+    def progress(self):
+        accomplished = int(np.isin(self.scores, (4, 5)).sum())
+        return accomplished * 100 // (len(self) or 1)
+
+
+def get_gradebook(course, user_ids):
+    """ gradebook of the students of the course, rows follow the order of user_ids """
+    user_ids = [int(user_id) for user_id in user_ids]
+    digest = hashlib.blake2b(','.join(map(str, user_ids)).encode(), digest_size=16).hexdigest()
+    key = 'gradebook:{}:{}:{}'.format(course.id, get_version(course.id), digest)
+    gradebook = caches['gradebook'].get(key)
+    if gradebook is None:
+        gradebook = Gradebook.build(course, user_ids)
+        caches['gradebook'].set(key, gradebook, settings.GRADEBOOK_CACHE_TIMEOUT)
+    return gradebook
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from contests.models import Assignment, Course
+
+
+class Command(BaseCommand):
+    help = ("Stores the latest submission of the student to the problem of each assignment, which the course table "
+            "reads instead of looking submissions up. With --verify only reports assignments whose stored latest "
+            "submission differs from the actual one.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, help="id of the course, all courses by default")
+        parser.add_argument('--verify', action='store_true', help="report stale assignments without updating them")
+
+    def handle(self, *args, **options):
+        assignments = Assignment.objects.all()
+        if options['course'] is not None:
+            if not Course.all_objects.filter(id=options['course']).exists():
+                raise CommandError("course %s does not exist" % options['course'])
+            assignments = assignments.filter(problem__contest__course_id=options['course'])
+        stale = assignments.with_stale_latest_submission().order_by('id')
+        if options['verify']:
+            count = 0
+            for assignment in stale.values('id', 'latest_submission_id', 'latest_submission_status',
+                                           'actual_latest_submission_id', 'actual_latest_submission_status'):
+                count += 1
+                self.stdout.write("assignment {id}: stored {latest_submission_id} ({latest_submission_status}), "
+                                  "actual {actual_latest_submission_id} ({actual_latest_submission_status})"
+                                  .format(**assignment))
+            if count:
+                raise CommandError("%s stale assignments" % count)
+            self.stdout.write(self.style.SUCCESS("all assignments are up to date"))
+        else:
+            count = Assignment.objects.filter(id__in=list(stale.values_list('id', flat=True))).update_latest_submission()
+            self.stdout.write(self.style.SUCCESS("%s assignments updated" % count))
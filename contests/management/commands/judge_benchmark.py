@@ -0,0 +1,209 @@
+import json
+import os
+import resource
+import shutil
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from accounts.models import Account, Faculty
+from contests.models import Attachment, Contest, Course, IOTest, Problem, Submission, TimingSpan
+from contests.tasks import evaluate_submission
+
+try:
+    from tools.sandbox import get_sandbox_class
+except ImportError:
+    from contest.utils import get_sandbox_class
+
+SOLUTIONS = {
+    'ok': """
+#include <stdio.h>
+int main(int argc, char *argv[]) {
+    FILE *in = fopen(argv[1], "r"), *out = fopen(argv[2], "w");
+    long seed, size, written = 0;
+    fscanf(in, "%ld %ld", &seed, &size);
+    for (long i = 0; written < size; i++)
+        written += fprintf(out, "%ld ", (seed + i) % 1000);
+    return 0;
+}
+""",
+    'wa': """
+#include <stdio.h>
+int main(int argc, char *argv[]) {
+    FILE *in = fopen(argv[1], "r"), *out = fopen(argv[2], "w");
+    long seed, size, written = 0;
+    fscanf(in, "%ld %ld", &seed, &size);
+    for (long i = 0; written < size; i++)
+        written += fprintf(out, "%ld ", (seed + i + 1) % 1000);
+    return 0;
+}
+""",
+    'tl': """
+int main(void) {
+    volatile unsigned long i = 0;
+    for (;;)
+        i++;
+}
+""",
+    'ce': """
+int main(void) {
+    return undeclared;
+}
+""",
+}
+EXPECTED_STATUSES = {'ok': 'OK', 'wa': 'WA', 'tl': 'TL', 'ce': 'CE'}
+
+
+def generate_output(seed, size):
+    """ the output of the 'ok' solution """
+    numbers, written, i = [], 0, 0
+    while written < size:
+        number = '{} '.format((seed + i) % 1000)
+        numbers.append(number)
+        written, i = written + len(number), i + 1
+    return ''.join(numbers)
+
+
+def get_peak_rss():
+    """ peak resident set size in bytes of this process and of its largest waited-for child (e.g. a pool worker) """
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+    return own, children
+
+
+def summarize(values):
+    values = sorted(values)
+    return {
+        'rounds': len(values),
+        'min': values[0],
+        'max': values[-1],
+        'mean': statistics.mean(values),
+        'stddev': statistics.stdev(values) if len(values) > 1 else 0.0,
+        'median': statistics.median(values),
+    }
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ("Measures judge throughput: generates synthetic problems and submissions (correct, wrong answer, "
+            "time limit and compilation error ones), evaluates them with evaluate_submission and reports throughput, "
+            "latencies of stages and peak memory. Everything created is removed afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--problems', type=int, default=2, help="number of problems")
+        parser.add_argument('--tests', type=int, default=10, help="number of tests of each problem")
+        parser.add_argument('--output-size', type=int, default=1024, help="bytes of output of each test")
+        parser.add_argument('--submissions', type=int, default=5, help="submissions of each kind for each problem")
+        parser.add_argument('--kinds', default='ok,wa,tl,ce', help="kinds of submissions: ok, wa, tl, ce")
+        parser.add_argument('--language', default='C', choices=[language for language, _ in Problem.LANGUAGE_CHOICES])
+        parser.add_argument('--time-limit', type=int, default=1, help="time limit of tests in seconds")
+        parser.add_argument('--sandbox', default='subprocess', help="sandbox type")
+        parser.add_argument('--json', dest='json_path', help="also write the report to this file")
+
+    def handle(self, *args, **options):
+        kinds = [kind.strip() for kind in options['kinds'].split(',') if kind.strip()]
+        unknown_kinds = set(kinds) - set(SOLUTIONS)
+        if unknown_kinds:
+            raise CommandError("unknown kinds of submissions: %s" % ', '.join(sorted(unknown_kinds)))
+        if get_sandbox_class(options['sandbox']) is object:
+            raise CommandError("sandbox '%s' is not available" % options['sandbox'])
+        workdir = os.path.join(settings.MEDIA_ROOT, 'judge_benchmark', str(os.getpid()))
+        try:
+            with transaction.atomic():
+                report = self.run(workdir, kinds, options)
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        self.print_report(report)
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(report, f, indent=4, ensure_ascii=False)
+
+    def run(self, workdir, kinds, options):
+        user = User.objects.create_superuser('judge_benchmark_%s' % os.getpid(), '', None)
+        faculty = Faculty.objects.create(name="Judge Benchmark")
+        Account.objects.create(user=user, faculty=faculty)
+        course = Course.objects.create(owner=user, faculty=faculty, title_official="Judge Benchmark", level=1)
+        contest = Contest.objects.create(owner=user, course=course, title="Judge Benchmark")
+        submissions = []
+        for i in range(options['problems']):
+            problem = Problem.objects.create(owner=user, contest=contest, title="Benchmark %s" % i, type='Program',
+                                             language=options['language'], time_limit=options['time_limit'])
+            for j in range(options['tests']):
+                seed = i * options['tests'] + j
+                IOTest.objects.create(owner=user, problem=problem, title="Test %s" % j,
+                                      input='{} {}'.format(seed, options['output_size']),
+                                      output=generate_output(seed, options['output_size']))
+            for kind in kinds:
+                for _ in range(options['submissions']):
+                    submissions.append((kind, self.create_submission(workdir, user, problem, kind, options)))
+        self.stdout.write("Evaluating %s submissions..." % len(submissions))
+        latencies, mismatches = {kind: [] for kind in kinds}, []
+        start = time.perf_counter()
+        for kind, submission in submissions:
+            submission_start = time.perf_counter()
+            evaluate_submission.apply(args=(submission.id, user.id),
+                                      kwargs={'sandbox_type': options['sandbox'], 'enqueued_at': time.time()})
+            latencies[kind].append(time.perf_counter() - submission_start)
+            submission.refresh_from_db()
+            if submission.status != EXPECTED_STATUSES[kind]:
+                mismatches.append({'submission': submission.id, 'kind': kind, 'status': submission.status})
+        elapsed = time.perf_counter() - start
+        own_rss, children_rss = get_peak_rss()
+        return {
+            'options': {name: options[name] for name in ('problems', 'tests', 'output_size', 'submissions',
+                                                         'language', 'time_limit', 'sandbox')},
+            'judge_workers': settings.JUDGE_WORKERS,
+            'kinds': kinds,
+            'submissions': len(submissions),
+            'elapsed': elapsed,
+            'throughput': len(submissions) * 60 / elapsed if elapsed > 0 else 0.0,
+            'latencies': {kind: summarize(values) for kind, values in latencies.items() if values},
+            'stages': TimingSpan.objects.get_summary(submission__in=[submission for _, submission in submissions]),
+            'peak_rss': own_rss,
+            'peak_children_rss': children_rss,
+            'mismatches': mismatches,
+        }
+
+    @staticmethod
+    def create_submission(workdir, user, problem, kind, options):
+        submission = Submission.objects.create(owner=user, problem=problem)
+        directory = os.path.join(workdir, str(submission.id))
+        os.makedirs(directory)
+        path = os.path.join(directory, 'main.c' if options['language'] == 'C' else 'main.cpp')
+        with open(path, 'w') as f:  # unique sources, so that neither memoization nor the compile cache kick in
+            f.write('/* {} */\n{}'.format(submission.id, SOLUTIONS[kind]))
+        Attachment.objects.create(owner=user, object=submission, file=os.path.relpath(path, settings.MEDIA_ROOT))
+        return submission
+
+    def print_report(self, report):
+        self.stdout.write("")
+        self.stdout.write("{submissions} submissions in {elapsed:.2f} s, "
+                          "JUDGE_WORKERS={judge_workers}".format(**report))
+        self.stdout.write(self.style.SUCCESS("throughput: {:.1f} submissions/min".format(report['throughput'])))
+        self.stdout.write("peak RSS: {:.1f} MiB (judge), {:.1f} MiB (largest child)".format(
+            report['peak_rss'] / 2 ** 20, report['peak_children_rss'] / 2 ** 20))
+        self.stdout.write("")
+        header = "{:<24}{:>8}{:>11}{:>11}{:>11}{:>11}{:>11}"
+        row = "{:<24}{:>8}{:>11.4f}{:>11.4f}{:>11.4f}{:>11.4f}{:>11.4f}"
+        self.stdout.write(header.format("latency (s)", "rounds", "min", "max", "mean", "stddev", "median"))
+        for kind, summary in report['latencies'].items():
+            self.stdout.write(row.format(kind, summary['rounds'], summary['min'], summary['max'], summary['mean'],
+                                         summary['stddev'], summary['median']))
+        self.stdout.write("")
+        self.stdout.write(header.format("stage (s)", "count", "mean", "p50", "p90", "p99", "max"))
+        for stage in report['stages']:
+            self.stdout.write(row.format(stage['name'], stage['count'], stage['mean'], stage['p50'], stage['p90'],
+                                         stage['p99'], stage['max']))
+        for mismatch in report['mismatches']:
+            self.stdout.write(self.style.WARNING("submission {submission} of kind {kind} "
+                                                 "got {status}".format(**mismatch)))
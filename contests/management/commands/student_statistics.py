@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from contests.models import Course, StudentStatistics
+
+
+class Command(BaseCommand):
+    help = ("Rebuilds statistics of students (submissions, OK submissions, solved problems and completed assignments "
+            "per course) from submissions and assignments, e.g. after migrating or editing the database by hand.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append', dest='course_ids',
+                            help="id of a course to rebuild, may be repeated, all courses by default")
+
+    def handle(self, *args, **options):
+        course_ids = options['course_ids']
+        if course_ids is not None:
+            existing_ids = Course.all_objects.filter(id__in=course_ids).values_list('id', flat=True)
+            missing_ids = set(course_ids) - set(existing_ids)
+            if missing_ids:
+                raise CommandError("courses do not exist: %s" % ', '.join(map(str, sorted(missing_ids))))
+        count = StudentStatistics.objects.rebuild(course_ids)
+        self.stdout.write(self.style.SUCCESS("%s statistics rebuilt" % count))
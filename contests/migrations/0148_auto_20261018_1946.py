@@ -0,0 +1,34 @@
+# Generated by Django 3.2.19 on 2026-10-18 19:46
+
+import contests.checkers
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contests', '0147_auto_20230531_1952'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='iotest',
+            name='checker',
+            field=models.CharField(blank=True, choices=[('default', 'Токены и числа'), ('exact', 'Точное совпадение'), ('tokens', 'Совпадение токенов'), ('float', 'Числа с допуском')], help_text='Если не указан, берется из задачи', max_length=16, verbose_name='Способ проверки вывода'),
+        ),
+        migrations.AddField(
+            model_name='iotest',
+            name='checker_args',
+            field=models.CharField(blank=True, max_length=255, validators=[contests.checkers.validate_checker_args], verbose_name='Параметры проверки вывода'),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='checker',
+            field=models.CharField(choices=[('default', 'Токены и числа'), ('exact', 'Точное совпадение'), ('tokens', 'Совпадение токенов'), ('float', 'Числа с допуском')], default='default', max_length=16, verbose_name='Способ проверки вывода'),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='checker_args',
+            field=models.CharField(blank=True, help_text='Например: atol=1e-6 rtol=1e-9', max_length=255, validators=[contests.checkers.validate_checker_args], verbose_name='Параметры проверки вывода'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.2.19 on 2026-10-18 19:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('contests', '0148_auto_20261018_1946'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Rejudge',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_created', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('date_updated', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+                ('status', models.CharField(choices=[('Q', 'В очереди'), ('R', 'Выполняется'), ('D', 'Завершена'), ('F', 'Прервана')], default='Q', max_length=1, verbose_name='Статус')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Всего посылок')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='Проверено посылок')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Владелец')),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contests.problem', verbose_name='Задача')),
+            ],
+            options={
+                'verbose_name': 'Перепроверка',
+                'verbose_name_plural': 'Перепроверки',
+                'ordering': ('date_created',),
+                'abstract': False,
+            },
+        ),
+    ]
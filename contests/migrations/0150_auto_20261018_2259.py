@@ -0,0 +1,27 @@
+# Generated by Django 3.2.19 on 2026-10-18 19:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contests', '0149_auto_20261018_2010'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='fingerprint',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Отпечаток файлов'),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='tests_fingerprint',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Отпечаток тестов'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['problem', 'fingerprint'], name='contests_su_problem_1215b3_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.19 on 2026-10-18 20:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contests', '0150_auto_20261018_2259'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='execution',
+            name='output_refs',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Ссылки на полные выводы'),
+        ),
+    ]
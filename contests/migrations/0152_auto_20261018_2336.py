@@ -0,0 +1,18 @@
+# Generated by Django 3.2.19 on 2026-10-18 20:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contests', '0151_auto_20261018_2314'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='submission',
+            name='status',
+            field=models.CharField(choices=[('OK', 'Задача решена'), ('PS', 'Задача решена частично'), ('TF', 'Тест провален'), ('TR', 'Требуется проверка'), ('WA', 'Неверный ответ'), ('NA', 'Ответ отсутствует'), ('TL', 'Превышено ограничение по времени'), ('ML', 'Превышено ограничение по памяти'), ('OL', 'Превышено ограничение вывода'), ('CL', 'Превышено ограничение по времени компиляции'), ('FE', 'Ошибка операции с плавающей точкой'), ('SF', 'Ошибка при работе с памятью'), ('RE', 'Ошибка выполнения'), ('CE', 'Ошибка компиляции'), ('UE', 'Ошибка кодировки'), ('PE', 'Ошибка комплектации'), ('EX', 'Неизвестная ошибка'), ('EV', 'Посылка проверяется'), ('UN', 'Посылка не проверена')], default='UN', max_length=2, verbose_name='Статус'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.2.19 on 2026-10-18 20:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contests', '0152_auto_20261018_2336'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimingSpan',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(choices=[('queue', 'Ожидание в очереди'), ('evaluate', 'Проверка целиком'), ('inspect', 'Проверка комплектации'), ('sandbox', 'Подготовка песочницы'), ('compile', 'Компиляция'), ('execute', 'Выполнение'), ('check', 'Проверка вывода'), ('save', 'Сохранение результатов')], max_length=16, verbose_name='Этап')),
+                ('count', models.PositiveIntegerField(default=1, verbose_name='Количество')),
+                ('duration', models.FloatField(verbose_name='Длительность')),
+                ('date_created', models.DateTimeField(verbose_name='Дата создания')),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contests.problem', verbose_name='Задача')),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contests.submission', verbose_name='Посылка')),
+            ],
+            options={
+                'verbose_name': 'Этап проверки',
+                'verbose_name_plural': 'Этапы проверки',
+                'ordering': ('date_created',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timingspan',
+            index=models.Index(fields=['problem', 'name', 'date_created'], name='contests_ti_problem_7f4818_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timingspan',
+            index=models.Index(fields=['name', 'date_created'], name='contests_ti_name_497964_idx'),
+        ),
+    ]
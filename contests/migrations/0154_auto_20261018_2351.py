@@ -0,0 +1,34 @@
+# Generated by Django 3.2.19 on 2026-10-18 20:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contests', '0153_auto_20261018_2342'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SourceFingerprint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hash', models.BigIntegerField(verbose_name='Хеш')),
+                ('filename', models.CharField(max_length=255, verbose_name='Файл')),
+                ('line_start', models.PositiveIntegerField(verbose_name='Первая строка')),
+                ('line_end', models.PositiveIntegerField(verbose_name='Последняя строка')),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contests.problem', verbose_name='Задача')),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contests.submission', verbose_name='Посылка')),
+            ],
+            options={
+                'verbose_name': 'Отпечаток исходного кода',
+                'verbose_name_plural': 'Отпечатки исходного кода',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='sourcefingerprint',
+            index=models.Index(fields=['problem', 'hash'], name='contests_so_problem_4dd56c_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.19 on 2026-10-18 20:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contests', '0154_auto_20261018_2351'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilaritySignature',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('signature', models.BinaryField(verbose_name='Сигнатура MinHash')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contests.course', verbose_name='Курс')),
+                ('submission', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='contests.submission', verbose_name='Посылка')),
+            ],
+            options={
+                'verbose_name': 'Сигнатура исходного кода',
+                'verbose_name_plural': 'Сигнатуры исходного кода',
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.19 on 2026-10-18 20:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_latest_submissions(apps, schema_editor):
+    Assignment = apps.get_model('contests', 'Assignment')
+    Submission = apps.get_model('contests', 'Submission')
+    latest_submission = (Submission.objects.filter(owner_id=models.OuterRef('user_id'),
+                                                   problem_id=models.OuterRef('problem_id'))
+                         .order_by('-date_created', '-id')[:1])
+    Assignment.objects.update(latest_submission=models.Subquery(latest_submission.values('id')),
+                              latest_submission_status=models.Subquery(latest_submission.values('status')),
+                              latest_submission_date_created=models.Subquery(latest_submission.values('date_created')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contests', '0155_auto_20261018_2355'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignment',
+            name='latest_submission',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='contests.submission', verbose_name='Последняя посылка'),
+        ),
+        migrations.AddField(
+            model_name='assignment',
+            name='latest_submission_date_created',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Дата последней посылки'),
+        ),
+        migrations.AddField(
+            model_name='assignment',
+            name='latest_submission_status',
+            field=models.CharField(blank=True, max_length=2, null=True, verbose_name='Статус последней посылки'),
+        ),
+        migrations.RunPython(fill_latest_submissions, migrations.RunPython.noop, elidable=True),
+    ]
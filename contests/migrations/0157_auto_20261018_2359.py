@@ -0,0 +1,28 @@
+# Generated by Django 3.2.19 on 2026-10-18 20:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contests', '0156_auto_20261018_2357'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseTableChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_created', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('assignment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contests.assignment', verbose_name='Задание')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contests.course', verbose_name='Курс')),
+            ],
+            options={
+                'verbose_name': 'Изменение таблицы заданий',
+                'verbose_name_plural': 'Изменения таблицы заданий',
+                'ordering': ('id',),
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 3.2.19 on 2026-10-18 21:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_student_statistics(apps, schema_editor):
+    """ StudentStatisticsManager.rebuild() over historical models """
+    Assignment = apps.get_model('contests', 'Assignment')
+    StudentStatistics = apps.get_model('contests', 'StudentStatistics')
+    Submission = apps.get_model('contests', 'Submission')
+    rows = dict()
+    for counts in (Submission.objects.values('owner_id', 'problem__contest__course_id').order_by()
+                   .annotate(submissions=models.Count('id'),
+                             ok_submissions=models.Count('id', filter=models.Q(status='OK')),
+                             solved_problems=models.Count('problem', filter=models.Q(status='OK'), distinct=True))):
+        key = (counts.pop('owner_id'), counts.pop('problem__contest__course_id'))
+        rows[key] = StudentStatistics(user_id=key[0], course_id=key[1], **counts)
+    for user_id, course_id, count in (Assignment.objects.filter(score__gt=2)
+                                      .values_list('user_id', 'problem__contest__course_id')
+                                      .order_by().annotate(count=models.Count('id'))):
+        rows.setdefault((user_id, course_id), StudentStatistics(user_id=user_id, course_id=course_id))
+        rows[(user_id, course_id)].completed_assignments = count
+    StudentStatistics.objects.bulk_create(rows.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('contests', '0157_auto_20261018_2359'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentStatistics',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('submissions', models.PositiveIntegerField(default=0, verbose_name='Посылок')),
+                ('ok_submissions', models.PositiveIntegerField(default=0, verbose_name='Посылок с решением')),
+                ('solved_problems', models.PositiveIntegerField(default=0, verbose_name='Решено задач')),
+                ('completed_assignments', models.PositiveIntegerField(default=0, verbose_name='Выполнено заданий')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contests.course', verbose_name='Курс')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='statistics', to=settings.AUTH_USER_MODEL, verbose_name='Студент')),
+            ],
+            options={
+                'verbose_name': 'Статистика студента',
+                'verbose_name_plural': 'Статистика студентов',
+                'unique_together': {('user', 'course')},
+            },
+        ),
+        migrations.RunPython(build_student_statistics, migrations.RunPython.noop, elidable=True),
+    ]
@@ -1,32 +1,48 @@
+import hashlib
 import importlib
 import io
 import json
 import os
 import random
+import tempfile
 import zipfile
+from contextlib import ExitStack, closing, contextmanager
 
 import docx
+import numpy as np
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.validators import MaxValueValidator, MinValueValidator, validate_comma_separated_integer_list
-from django.db import models
-from django.db.models import Q
+from django.db import models, transaction
+from django.db.models import Count, Max, Q, Sum
 from django.dispatch import receiver
 from django.urls import reverse
 from django.utils import timezone
 
 from accounts.models import Account, Comment, Faculty, Notification
+from contest import utils
 from contest.abstract import CDEntry, CRDEntry, CRUDEntry
 from contest.soft_deletion import SoftDeletionManager, SoftDeletionModel, SoftDeletionQuerySet
-from contest.utils import transliterate
+from contest.utils import map_file, transliterate
+from contests.builds import BuildSet
+from contests.checkers import get_checker, get_checker_choices, parse_checker_args, validate_checker_args
+from contests.executors import run_in_parallel, run_sequentially
+from contests.gradebook import get_watched_course_ids, invalidate_gradebook
+from contests.outputs import get_output_size, get_output_store, pack_outputs, read_output
+from contests.sandboxes import acquire_sandbox
+from contests.similarity import (SignatureIndex, collect_regions, get_fingerprints, get_minhash, is_indexed,
+                                 read_source)
+from contests.testdata import get_test_data_cache
 
 try:
-    from tools.sandbox import get_sandbox_class
-    from tools.utility import Status, diff
+    from tools.utility import Status
 except ImportError:
-    from contest.utils import Status, diff, get_sandbox_class
+    from contest.utils import Status
+
+OUTPUT_LIMIT_STATUS = getattr(Status, 'OL', utils.Status.OL)  # missing from tools.utility.Status, saved by name
 
 """=================================================== Attachment ==================================================="""
 
@@ -126,6 +142,7 @@ class Course(SoftDeletionModel, CRUDEntry):
     def save(self, *args, **kwargs):
         created = self._state.adding
         super().save(*args, **kwargs)
+        invalidate_gradebook(self.id)  # ids of deleted courses may be reused
         if created:
             Filter.objects.get_or_create(user=self.owner, course=self)
 
@@ -276,6 +293,7 @@ class CreditManager(models.Manager):
         for user_id in user_ids:
             new_credit = Credit(owner_id=owner.id, user_id=user_id, course_id=course.id)
             new_credits.append(new_credit)
+        invalidate_gradebook(course.id)
         return self.bulk_create(new_credits)
 
     def create_report(self, course, group_name, students, type, examiners, faculty, discipline, semester, date):
@@ -341,6 +359,12 @@ class Credit(CRUDEntry):
         return f"Зачет {self.user.account.get_short_name()} по курсу: {self.course}"
 
 
+@receiver(models.signals.post_save, sender=Credit)
+@receiver(models.signals.post_delete, sender=Credit)
+def invalidate_credit_gradebook(sender, instance, **kwargs):
+    invalidate_gradebook(instance.course_id)
+
+
 """=================================================== Attendance ==================================================="""
 
 
@@ -479,6 +503,8 @@ class Problem(SoftDeletionModel, CRUDEntry):
 
     DEFAULT_DIFFICULTY = 0
     DEFAULT_LANGUAGE = 'C++'
+    CHECKER_CHOICES = get_checker_choices()
+    DEFAULT_CHECKER = 'default'
     DEFAULT_TIME_LIMIT = 1
     DEFAULT_MEMORY_LIMIT = 64 * 1024
     DEFAULT_NUMBER = 1
@@ -505,6 +531,11 @@ class Problem(SoftDeletionModel, CRUDEntry):
     language = models.CharField(max_length=8, choices=LANGUAGE_CHOICES, default=DEFAULT_LANGUAGE, verbose_name="Язык")
     compile_args = models.CharField(max_length=255, blank=True, verbose_name="Параметры компиляции")
     launch_args = models.CharField(max_length=255, blank=True, verbose_name="Параметры запуска")
+    checker = models.CharField(max_length=16, choices=CHECKER_CHOICES, default=DEFAULT_CHECKER,
+                               verbose_name="Способ проверки вывода")
+    checker_args = models.CharField(max_length=255, blank=True, validators=[validate_checker_args],
+                                    verbose_name="Параметры проверки вывода",
+                                    help_text="Например: atol=1e-6 rtol=1e-9")
     time_limit = models.PositiveSmallIntegerField(default=DEFAULT_TIME_LIMIT, verbose_name="Ограничение по времени")
     memory_limit = models.PositiveIntegerField(default=DEFAULT_MEMORY_LIMIT, verbose_name="Ограничение по памяти")
     is_testable = models.BooleanField(default=True, verbose_name="Проверять автоматически",
@@ -565,20 +596,34 @@ class Problem(SoftDeletionModel, CRUDEntry):
             return None
 
     def get_tests(self):
-        return list(self.iotest_set.all()) + list(self.uttest_set.all()) + list(self.fntest_set.all())
+        """ large columns of tests are loaded on demand, see BasicTest.prepare """
+        return (list(self.iotest_set.defer('input', 'output')) + list(self.uttest_set.all()) +
+                list(self.fntest_set.all()))
 
-    def run_tests(self, submission, observer, user, sandbox_type):
-        state, executions = Status.UN, []
+    def get_tests_fingerprint(self):
+        """ changes whenever the problem or any of its tests is created, updated or deleted """
+        digest = hashlib.sha256(self.date_updated.isoformat().encode())
         for test in self.get_tests():
-            stats = {}
-            try:
-                state, stats = test.run(submission, observer, self, user=user, sandbox_type=sandbox_type)
-            except Exception as e:
-                state, stats['exception'] = Status.EX, str(e)
-            executions.append((test, stats))
-            if state != Status.OK:
-                break
-        Execution.objects.create_set(submission, executions)
+            digest.update('|{}:{}:{}'.format(test._meta.label_lower, test.id, test.date_updated.isoformat()).encode())
+        return digest.hexdigest()
+
+    def get_tests_updated_after(self, date):
+        return [test for test in self.get_tests() if test.date_updated > date]
+
+    def run_tests(self, submission, observer, user, sandbox_type, tests=None):
+        """ runs all tests of the problem or, if tests are given, only them keeping executions of the other tests """
+        state, executions = Status.UN, []
+        keep = [] if tests is None else [test for test in self.get_tests() if test not in tests]
+        tests = self.get_tests() if tests is None else tests
+        run = run_in_parallel if settings.JUDGE_WORKERS > 0 else run_sequentially
+        with BuildSet(submission, observer, sandbox_type) as builds:
+            with closing(run(tests, submission, observer, self, builds, user=user, sandbox_type=sandbox_type)) as runs:
+                for test, (state, stats) in zip(tests, runs):
+                    executions.append((test, stats))
+                    if state != Status.OK:
+                        break
+        with observer.span('save'):
+            Execution.objects.create_set(submission, executions, keep=keep)
         return state
 
     def get_discussion_url(self):
@@ -588,6 +633,13 @@ class Problem(SoftDeletionModel, CRUDEntry):
         return f"{self.number}. {self.title}"
 
 
+@receiver(models.signals.post_save, sender=Problem)
+def invalidate_problem_gradebook(sender, instance, **kwargs):
+    """ numbers of problems are shown in the gradebook """
+    invalidate_gradebook(instance.contest.course_id)
+    CourseTableChange.objects.create_set([(instance.contest.course_id, None)])
+
+
 """===================================================== Option ====================================================="""
 
 
@@ -697,6 +749,42 @@ class BasicTest(CRUDEntry):
         else:
             return self.problem.launch_args.split() + launch_args
 
+    @property
+    def build_files(self):
+        return []
+
+    def get_build_key(self, sources):
+        return tuple(sources) + tuple(self.build_files), self.problem.language, tuple(self.get_compile_args())
+
+    def run(self, submission, observer, _, user=None, sandbox_type='subprocess', build=None):
+        if build is None:
+            with BuildSet(submission, observer, sandbox_type) as builds:
+                return self.run(submission, observer, _, user=user, sandbox_type=sandbox_type, build=builds.get(self))
+        state, stats = build.state, dict(build.stats)
+        if state == Status.OK:
+            with ExitStack() as stack:
+                with observer.span('sandbox'):
+                    workdir = stack.enter_context(tempfile.TemporaryDirectory(prefix='test-'))  # tests run in parallel
+                    sandbox = stack.enter_context(acquire_sandbox(sandbox_type, workdir))
+                    executable, = sandbox.fetch([build.executable])
+                observer.set_progress('Проверяем', 60, 100)
+                state = self.execute(sandbox, executable, stats, observer)
+        return state, stats
+
+    def get_limits(self, sandbox):
+        """ limits passed to sandbox.execute besides the time limit, only sandboxes which declare that they enforce
+            the memory limit of the problem (sandboxes of tools.sandbox do not) get it """
+        if getattr(sandbox, 'enforces_memory_limit', False):
+            return {'memory_limit': self.problem.memory_limit * 1024}
+        return {}
+
+    def prepare(self):
+        """ loads everything execute needs, so that the test can be run without database access """
+        pass
+
+    def execute(self, sandbox, executable, stats, observer):
+        raise NotImplementedError("BasicTest: execute method must be defined!")
+
     def __str__(self):
         return self.title
 
@@ -704,37 +792,81 @@ class BasicTest(CRUDEntry):
 class IOTest(BasicTest):
     input = models.TextField(blank=True, verbose_name="Входные данные")
     output = models.TextField(blank=True, verbose_name="Выходные данные")
+    checker = models.CharField(max_length=16, choices=Problem.CHECKER_CHOICES, blank=True,
+                               verbose_name="Способ проверки вывода", help_text="Если не указан, берется из задачи")
+    checker_args = models.CharField(max_length=255, blank=True, validators=[validate_checker_args],
+                                    verbose_name="Параметры проверки вывода")
 
     class Meta(BasicTest.Meta):
         verbose_name = "IO-тест"
         verbose_name_plural = "IO-тесты"
 
-    def run(self, submission, observer, _, user=None, sandbox_type='subprocess'):
-        sources = submission.files
-        workdir = os.path.dirname(sources[0])
-        state, stats = Status.UN, {}
-        Sandbox = get_sandbox_class(sandbox_type)
-        with Sandbox(workdir) as sandbox:
-            executable = sandbox.path('exe')
-            observer.set_progress('Компилируем', 5, 100)
-            state = sandbox.compile(sources, executable, language=self.problem.language, args=self.get_compile_args(),
-                                    timeout=self.problem.time_limit, stats=stats)
-            if state == Status.OK:
-                input_file = sandbox.create('input.txt', self.input)
-                output_file = sandbox.path('output.txt')
-                observer.set_progress('Проверяем', 60, 100)
-                state = sandbox.execute(executable, args=[input_file, output_file], timeout=self.problem.time_limit,
-                                        stats=stats)
-                if state == Status.OK:
-                    output = sandbox.read(output_file)
-                    if output is None:
-                        state = Status.NA
-                    elif diff(output, self.output):
-                        state = Status.WA
-                        stats['test_output'] = output
-                    else:
-                        stats['test_is_passed'] = True
-        return state, stats
+    def prepare(self):
+        cache = get_test_data_cache()
+        if cache is not None:
+            try:
+                cache.materialize(self, 'input')
+                cache.materialize(self, 'output')
+                return
+            except OSError:
+                pass
+        self.refresh_from_db(fields=['input', 'output'])
+
+    def create_input(self, sandbox):
+        cache = get_test_data_cache()
+        if cache is None:
+            return sandbox.create('input.txt', self.input)
+        return cache.link(self, 'input', sandbox, 'input.txt')
+
+    @contextmanager
+    def map_output(self):
+        cache = get_test_data_cache()
+        try:
+            path = cache.materialize(self, 'output') if cache is not None else None
+        except OSError:
+            path = None
+        if path is None:
+            yield self.output.encode()
+            return
+        with map_file(path) as output:
+            yield output if output is not None else self.output.encode()
+
+    def execute(self, sandbox, executable, stats, observer):
+        input_file = self.create_input(sandbox)
+        output_file = sandbox.path('output.txt')
+        with observer.span('execute'):
+            state = sandbox.execute(executable, args=[input_file, output_file], timeout=self.problem.time_limit,
+                                    stats=stats, **self.get_limits(sandbox))
+        if state == Status.OK and get_output_size(output_file) > settings.JUDGE_OUTPUT_LIMIT:
+            state = OUTPUT_LIMIT_STATUS
+        if state == Status.OK:
+            with observer.span('check'):
+                try:
+                    state = self.check_output(sandbox, output_file)
+                except UnicodeDecodeError:
+                    state = Status.UE
+                if state == Status.WA:
+                    stats['test_output'] = read_output(sandbox, output_file)
+                elif state == Status.OK:
+                    stats['test_is_passed'] = True
+        return state
+
+    def get_checker(self):
+        """ checker settings of the test replace the ones of the problem if any is set """
+        if self.checker or self.checker_args:
+            return self.checker or self.problem.checker, self.checker_args
+        return self.problem.checker, self.problem.checker_args
+
+    def check_output(self, sandbox, output_file):
+        checker, checker_args = self.get_checker()
+        check, args = get_checker(checker), parse_checker_args(checker_args)
+        with map_file(output_file) as output, self.map_output() as correct:
+            if output is None:  # not on the local file system, read it through the sandbox
+                output = sandbox.read(output_file)
+                if output is None:
+                    return Status.NA
+                output = output.encode()
+            return Status.WA if check(output, correct, **args) else Status.OK
 
 
 class UTTest(BasicTest):
@@ -748,28 +880,21 @@ class UTTest(BasicTest):
     def files(self):
         return [attachment.file.path for attachment in self.attachment_set.all()]
 
-    def run(self, submission, observer, _, user=None, sandbox_type='subprocess'):
-        sources = submission.files
-        workdir = os.path.dirname(sources[0])
-        state, stats = Status.UN, {}
-        Sandbox = get_sandbox_class(sandbox_type)
-        with Sandbox(workdir) as sandbox:
-            test_sources = sandbox.fetch(self.files)
-            executable = sandbox.path('exe')
-            observer.set_progress('Компилируем', 5, 100)
-            state = sandbox.compile(sources + test_sources, executable, language=self.problem.language,
-                                    args=self.get_compile_args(), timeout=self.problem.time_limit, stats=stats)
-            if state == Status.OK:
-                observer.set_progress('Проверяем', 60, 100)
-                state = sandbox.execute(executable, args=self.get_launch_args(), timeout=self.problem.time_limit,
-                                        stats=stats)
-                if state == Status.OK:
-                    returncode = stats.get('execution_returncode')
-                    if returncode != 0:
-                        state = Status.TF
-                    else:
-                        stats['test_is_passed'] = True
-        return state, stats
+    @property
+    def build_files(self):
+        return self.files
+
+    def execute(self, sandbox, executable, stats, observer):
+        with observer.span('execute'):
+            state = sandbox.execute(executable, args=self.get_launch_args(), timeout=self.problem.time_limit,
+                                    stats=stats, **self.get_limits(sandbox))
+        if state == Status.OK:
+            returncode = stats.get('execution_returncode')
+            if returncode != 0:
+                state = Status.TF
+            else:
+                stats['test_is_passed'] = True
+        return state
 
 
 class FNTest(CRUDEntry):
@@ -802,10 +927,11 @@ class FNTest(CRUDEntry):
         verbose_name = "FN-тест"
         verbose_name_plural = "FN-тесты"
 
-    def run(self, submission, observer, problem, user=None, sandbox_type='subprocess'):
+    def run(self, submission, observer, problem, user=None, sandbox_type='subprocess', build=None):
         module_name, function_name = self.handler.split('.')
         module = importlib.import_module('tools.problems.' + module_name)
-        return getattr(module, function_name)(submission, observer, problem, self, sandbox_type=sandbox_type)
+        with observer.span('execute'):
+            return getattr(module, function_name)(submission, observer, problem, self, sandbox_type=sandbox_type)
 
     def __str__(self):
         return self.title
@@ -814,19 +940,47 @@ class FNTest(CRUDEntry):
 """=================================================== Assignment ==================================================="""
 
 
+def get_latest_submission_subquery():
+    return (Submission.objects.filter(owner_id=models.OuterRef('user_id'), problem_id=models.OuterRef('problem_id'))
+            .order_by('-date_created', '-id')[:1])
+
+
 class AssignmentQuerySet(models.QuerySet):
-    def for_course_table(self, course, students):
-        latest_submission = (Submission.objects.filter(owner_id=models.OuterRef('user_id'),
-                                                       problem_id=models.OuterRef('problem_id'))
-                             .order_by('-date_created')[:1])
-        return (self.filter(user__in=students.values_list('user'), problem__contest__course=course)
-                .select_related('user', 'problem')
-                .annotate(latest_submission_status=models.Subquery(latest_submission.values_list('status')))
-                .annotate(latest_submission_date_created=models.Subquery(latest_submission.values_list('date_created')))
-                .order_by('user__account', 'problem__contest', 'date_created', 'problem__number'))
+    def update_latest_submission(self):
+        """ stores the latest submission of the student to the problem of each assignment, date_updated is kept """
+        latest_submission = get_latest_submission_subquery()
+        count = self.update(latest_submission=models.Subquery(latest_submission.values('id')),
+                            latest_submission_status=models.Subquery(latest_submission.values('status')),
+                            latest_submission_date_created=models.Subquery(latest_submission.values('date_created')))
+        if count:
+            self.notify_changes()
+        return count
+
+    def notify_changes(self):
+        """ invalidates gradebooks of courses of the assignments and pushes the assignments to open course tables """
+        changes = list(self.values_list('problem__contest__course_id', 'id'))
+        invalidate_gradebook(*{course_id for course_id, _ in changes})
+        CourseTableChange.objects.create_set(changes)
+
+    def with_actual_latest_submission(self):
+        latest_submission = get_latest_submission_subquery()
+        return self.annotate(actual_latest_submission_id=models.Subquery(latest_submission.values('id')),
+                             actual_latest_submission_status=models.Subquery(latest_submission.values('status')))
+
+    def with_stale_latest_submission(self):
+        """ assignments which stored latest submission differs from the actual one """
+        return self.with_actual_latest_submission().exclude(
+            Q(latest_submission_id=models.F('actual_latest_submission_id')) &
+            Q(latest_submission_status=models.F('actual_latest_submission_status'))
+        ).exclude(latest_submission__isnull=True, actual_latest_submission_id__isnull=True)
 
     def rollback_score(self):
-        return self.update(score=models.F('score') - 1)
+        assignment_ids = list(self.values_list('id', flat=True))
+        count = self.update(score=models.F('score') - 1)
+        assignments = Assignment.objects.filter(id__in=assignment_ids)
+        assignments.notify_changes()
+        StudentStatistics.objects.update_set(assignments.values_list('user_id', 'problem__contest__course_id'))
+        return count
 
     def to_rollback(self, submissions):
         return self.filter(id__in=submissions.values_list('assignment_id', flat=True), score__gt=3)
@@ -866,6 +1020,10 @@ class AssignmentManager(models.Manager):
                         new_assignment.deadline = deadline
                     new_assignments.append(new_assignment)
         Assignment.objects.bulk_create(new_assignments)
+        invalidate_gradebook(contest.course_id)
+        CourseTableChange.objects.create_set([(contest.course_id, None)])
+        self.filter(user_id__in=student_ids, problem_id__in=problem_ids,
+                    latest_submission__isnull=True).update_latest_submission()  # no signals on bulk_create
 
 
 class Assignment(CRUDEntry):
@@ -890,6 +1048,12 @@ class Assignment(CRUDEntry):
                                                         verbose_name="Ограничение количества посылок")
     remark = models.CharField(max_length=255, blank=True, verbose_name="Пометка", help_text="Для преподавателей")
     deadline = models.DateTimeField(null=True, blank=True, verbose_name="Принимать посылки до")
+    latest_submission = models.ForeignKey('Submission', on_delete=models.SET_NULL, null=True, blank=True,
+                                          related_name='+', verbose_name="Последняя посылка")
+    latest_submission_status = models.CharField(max_length=2, null=True, blank=True,
+                                                verbose_name="Статус последней посылки")
+    latest_submission_date_created = models.DateTimeField(null=True, blank=True,
+                                                          verbose_name="Дата последней посылки")
 
     attachment_set = GenericRelation(Attachment, content_type_field='object_type')
     comment_set = GenericRelation(Comment, content_type_field='object_type')
@@ -924,9 +1088,28 @@ class Assignment(CRUDEntry):
     def hidden_from_students(self):
         return self.deadline is not None and timezone.now() < self.deadline
 
+    @property
+    def has_new_submission(self):
+        """ the latest submission is not evaluated and was sent after the assignment had been changed """
+        return (self.latest_submission_status == 'UN' and
+                self.latest_submission_date_created > self.date_updated)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'score' in field_names:
+            instance._saved_score = instance.score
+        return instance
+
     def get_latest_submission(self):
         return self.problem.get_latest_submission_by(self.user)
 
+    def update_statistics(self, course_id, old_score, new_score, create=True):
+        """ applies a change of the score (None before creation and after deletion) to statistics of the student """
+        completed = [score is not None and score > 2 for score in (old_score, new_score)]
+        StudentStatistics.objects.add(self.user_id, course_id, create=create,
+                                      completed_assignments=completed[1] - completed[0])
+
     def update_score(self, submission):
         if not self.score_is_locked:
             score = self.problem.get_score(submission)
@@ -947,6 +1130,71 @@ def link_existing_submissions(sender, instance, created, **kwargs):
     if created:
         submissions = Submission.objects.filter(assignment__isnull=True, owner=instance.user, problem=instance.problem)
         submissions.update(assignment=instance)
+        Assignment.objects.filter(id=instance.id).update_latest_submission()
+
+
+@receiver(models.signals.post_save, sender=Assignment)
+@receiver(models.signals.post_delete, sender=Assignment)
+def notify_assignment_change(sender, instance, **kwargs):
+    course_id = Problem.all_objects.filter(id=instance.problem_id).values_list('contest__course_id', flat=True).first()
+    invalidate_gradebook(course_id)
+    # new and deleted assignments change the layout of the table, which is reloaded then
+    CourseTableChange.objects.create_set([(course_id, instance.id if kwargs.get('created') is False else None)])
+    if course_id is None:
+        return
+    if 'created' not in kwargs:
+        instance.update_statistics(course_id, getattr(instance, '_saved_score', instance.score), None, create=False)
+    elif kwargs['created']:
+        instance.update_statistics(course_id, None, instance.score)
+    elif hasattr(instance, '_saved_score'):
+        instance.update_statistics(course_id, instance._saved_score, instance.score)
+    else:  # the score the assignment was saved with before is unknown
+        StudentStatistics.objects.update_set([(instance.user_id, course_id)])
+    instance._saved_score = instance.score
+
+
+class CourseTableChangeManager(models.Manager):
+    def create_set(self, changes):
+        """ records (course id, assignment id) changes of courses with open tables, no assignment id means that tables
+            of the course are to be reloaded """
+        changes = {(course_id, assignment_id) for course_id, assignment_id in changes if course_id is not None}
+        watched_course_ids = get_watched_course_ids({course_id for course_id, _ in changes})
+        return self.bulk_create([CourseTableChange(course_id=course_id, assignment_id=assignment_id)
+                                 for course_id, assignment_id in sorted(changes, key=lambda change: change[1] or 0)
+                                 if course_id in watched_course_ids])
+
+    def get_last_id(self, course_id):
+        return self.filter(course_id=course_id).aggregate(Max('id'))['id__max'] or 0
+
+    def get_changes(self, course_id, last_id):
+        """ id of the last change after last_id and ids of changed assignments, None if tables are to be reloaded """
+        changes = list(self.filter(course_id=course_id, id__gt=last_id).order_by('id')
+                       .values_list('id', 'assignment_id'))
+        if not changes:
+            return last_id, set()
+        assignment_ids = {assignment_id for _, assignment_id in changes}
+        return changes[-1][0], None if None in assignment_ids else assignment_ids
+
+    def prune(self, course_id):
+        date_created = timezone.now() - timezone.timedelta(seconds=settings.COURSE_TABLE_CHANGES_RETENTION)
+        return self.filter(course_id=course_id, date_created__lt=date_created).delete()
+
+
+class CourseTableChange(models.Model):
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+', verbose_name="Курс")
+    assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, null=True, blank=True, related_name='+',
+                                   verbose_name="Задание")
+    date_created = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+
+    objects = CourseTableChangeManager()
+
+    class Meta:
+        ordering = ('id',)
+        verbose_name = "Изменение таблицы заданий"
+        verbose_name_plural = "Изменения таблицы заданий"
+
+    def __str__(self):
+        return f"Изменение таблицы заданий курса {self.course_id}"
 
 
 """=================================================== Submission ==================================================="""
@@ -954,7 +1202,14 @@ def link_existing_submissions(sender, instance, created, **kwargs):
 
 class SubmissionQuerySet(models.QuerySet):
     def rollback_status(self):
-        return self.update(status='TR')
+        assignment_ids = list(Assignment.objects.filter(models.Exists(
+            self.filter(owner_id=models.OuterRef('user_id'), problem_id=models.OuterRef('problem_id'))
+        )).values_list('id', flat=True))
+        pairs = set(self.values_list('owner_id', 'problem__contest__course_id'))
+        count = self.update(status='TR')
+        Assignment.objects.filter(id__in=assignment_ids).update_latest_submission()
+        StudentStatistics.objects.update_set(pairs)
+        return count
 
     def to_rollback(self, problem_id):
         return self.filter(problem_id=problem_id, status__in=['OK', 'TR']).filter(models.Exists(
@@ -963,6 +1218,24 @@ class SubmissionQuerySet(models.QuerySet):
                                   score=Credit.DEFAULT_SCORE)
         ))
 
+    def with_date_evaluated(self):
+        return self.annotate(date_evaluated=models.Max('execution__date_created'))
+
+    def to_rejudge(self, problem):
+        """ evaluated submissions of the problem which ran tests changed since, or a deleted test if not solved """
+        tests = problem.get_tests()
+        submissions = self.filter(problem=problem, main_submission=None, task_id=None).with_date_evaluated()
+        if not tests:
+            return submissions.none()
+        affected = Q(date_evaluated__lt=max(test.date_updated for test in tests))
+        existing_tests = Q()
+        for test in tests:
+            existing_tests |= Q(test_type=ContentType.objects.get_for_model(type(test)), test_id=test.id)
+        deleted_test_executions = Execution.objects.filter(submission=models.OuterRef('pk')).exclude(existing_tests)
+        affected |= Q(ran_deleted_test=True) & ~Q(status='OK')
+        return (submissions.annotate(ran_deleted_test=models.Exists(deleted_test_executions))
+                .filter(date_evaluated__isnull=False).filter(affected))
+
 
 class SubmissionManager(models.Manager):
     def backup(self, submission_list):
@@ -995,6 +1268,7 @@ class Submission(CRDEntry):
         ('NA', "Ответ отсутствует"),
         ('TL', "Превышено ограничение по времени"),
         ('ML', "Превышено ограничение по памяти"),
+        ('OL', "Превышено ограничение вывода"),
         ('CL', "Превышено ограничение по времени компиляции"),
         ('FE', "Ошибка операции с плавающей точкой"),
         ('SF', "Ошибка при работе с памятью"),
@@ -1008,6 +1282,7 @@ class Submission(CRDEntry):
     )
     DEFAULT_STATUS = 'UN'
     DEFAULT_SCORE = 0
+    MEMOIZABLE_STATUSES = ('OK', 'TF', 'WA', 'NA', 'TL', 'ML', 'OL', 'CL', 'FE', 'SF', 'RE', 'CE', 'UE')
 
     problem = models.ForeignKey(Problem, on_delete=models.CASCADE, related_query_name="submission",
                                 verbose_name="Задача")
@@ -1025,6 +1300,8 @@ class Submission(CRDEntry):
                                            validators=[validate_comma_separated_integer_list],
                                            verbose_name="С посылками MOSS")
     moss_report_url = models.URLField(null=True, verbose_name="Ссылка на отчет MOSS")
+    fingerprint = models.CharField(max_length=64, blank=True, verbose_name="Отпечаток файлов")
+    tests_fingerprint = models.CharField(max_length=64, blank=True, verbose_name="Отпечаток тестов")
 
     attachment_set = GenericRelation(Attachment, content_type_field='object_type')
     comment_set = GenericRelation(Comment, content_type_field='object_type')
@@ -1038,6 +1315,9 @@ class Submission(CRDEntry):
             ("moss_submission", "Отправлять на проверку в MOSS"),
         ]
         ordering = ('-date_created',)
+        indexes = [
+            models.Index(fields=['problem', 'fingerprint']),
+        ]
         verbose_name = "Посылка"
         verbose_name_plural = "Посылки"
 
@@ -1105,24 +1385,78 @@ class Submission(CRDEntry):
     def inspect(self, observer):
         return Status.OK
 
-    def test(self, observer, user, sandbox_type):
-        return self.problem.run_tests(self, observer, user, sandbox_type)
+    def test(self, observer, user, sandbox_type, tests=None):
+        return self.problem.run_tests(self, observer, user, sandbox_type, tests=tests)
 
     def update(self, state):
         self.task_id = None
         self.status = str(state)
         self.save()
 
-    def evaluate(self, observer, user, sandbox_type):
-        state = self.inspect(observer)
-        if state == Status.OK:
-            state = self.test(observer, user, sandbox_type)
-        self.update(state)
+    def get_fingerprint(self):
+        digest = hashlib.sha256()
+        try:
+            for path in sorted(self.files, key=os.path.basename):
+                digest.update(os.path.basename(path).encode() + b'\0')
+                with open(path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                        digest.update(chunk)
+                digest.update(b'\0')
+        except OSError:
+            return ''
+        return digest.hexdigest()
+
+    def get_evaluated_duplicate(self):
+        """ the latest submission with the same files evaluated by the same version of the problem and its tests """
+        if not self.fingerprint:
+            return None
+        return (Submission.objects.filter(problem_id=self.problem_id, fingerprint=self.fingerprint,
+                                          tests_fingerprint=self.tests_fingerprint, task_id=None,
+                                          status__in=self.MEMOIZABLE_STATUSES)
+                .exclude(id=self.id).filter(models.Exists(Execution.objects.filter(submission=models.OuterRef('pk'))))
+                .order_by('-date_created').first())
+
+    def evaluate(self, observer, user, sandbox_type, tests=None):
+        with observer.span('evaluate'):
+            with observer.span('inspect'):
+                state = self.inspect(observer)
+            if state == Status.OK:
+                SourceFingerprint.objects.create_set(self)
+                SimilaritySignature.objects.create_signature(self)
+                self.fingerprint, self.tests_fingerprint = self.get_fingerprint(), self.problem.get_tests_fingerprint()
+                duplicate = self.get_evaluated_duplicate() if tests is None else None
+                if duplicate is not None:
+                    Execution.objects.copy_set(duplicate, self)
+                    state = duplicate.status
+                else:
+                    state = self.test(observer, user, sandbox_type, tests=tests)
+            self.update(state)
+        TimingSpan.objects.create_set(self, observer.pop_spans())
 
     def update_assignment(self):
         if self.assignment is not None:
             self.assignment.update_score(self)
 
+    def update_latest_submission(self):
+        Assignment.objects.filter(user_id=self.owner_id, problem_id=self.problem_id).update_latest_submission()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'status' in field_names:
+            instance._saved_status = instance.status
+        return instance
+
+    def update_statistics(self, old_status, new_status, submissions=0, create=True):
+        """ applies a change of the status of the submission (None before creation and after deletion) to
+            statistics of the owner, a problem stays solved while any other submission to it is OK """
+        ok_submissions = (new_status == 'OK') - (old_status == 'OK')
+        deltas = {'submissions': submissions, 'ok_submissions': ok_submissions}
+        if ok_submissions and not Submission.objects.filter(owner_id=self.owner_id, problem_id=self.problem_id,
+                                                            status='OK').exclude(id=self.id).exists():
+            deltas['solved_problems'] = ok_submissions
+        StudentStatistics.objects.add(self.owner_id, self.problem.contest.course_id, create=create, **deltas)
+
     def update_main_score(self):
         max_score = sum(self.problem.sub_problems.values_list('score_max', flat=True))
         score_sum = sum(self.sub_submissions.values_list('score', flat=True))
@@ -1177,25 +1511,154 @@ class Submission(CRDEntry):
             Notification.objects.notify(course_leaders, subject=self.owner, action="отправил посылку", object=self,
                                         relation="к задаче", reference=self.problem)
         self.update_assignment()
+        self.update_latest_submission()
+        if created:
+            self.update_statistics(None, self.status, submissions=1)
+        elif hasattr(self, '_saved_status'):
+            self.update_statistics(self._saved_status, self.status)
+        else:  # the status the submission was saved with before is unknown
+            StudentStatistics.objects.update_set([(self.owner_id, self.problem.contest.course_id)])
+        self._saved_status = self.status
 
     def __str__(self):
         return f"Посылка от {self.owner.account.get_short_name()} к задаче {self.problem}"
 
 
+@receiver(models.signals.post_delete, sender=Submission)
+def update_latest_submission_on_delete(sender, instance, **kwargs):
+    """ the previous submission becomes the latest one of the assignment """
+    instance.update_latest_submission()
+    instance.update_statistics(getattr(instance, '_saved_status', instance.status), None, submissions=-1,
+                               create=False)
+
+
+"""=================================================== Statistics ==================================================="""
+
+
+class StudentStatisticsQuerySet(models.QuerySet):
+    def get_summary(self):
+        summary = self.aggregate(submissions=Sum('submissions'), ok_submissions=Sum('ok_submissions'),
+                                 solved_problems=Sum('solved_problems'),
+                                 completed_assignments=Sum('completed_assignments'))
+        summary = {name: value or 0 for name, value in summary.items()}
+        summary['accuracy'] = get_accuracy(summary['ok_submissions'], summary['submissions'])
+        return summary
+
+
+class StudentStatisticsManager(models.Manager):
+    @staticmethod
+    def count_submissions(submissions):
+        return submissions.aggregate(submissions=Count('id'), ok_submissions=Count('id', filter=Q(status='OK')),
+                                     solved_problems=Count('problem', filter=Q(status='OK'), distinct=True))
+
+    def update_set(self, pairs, create=True):
+        """ recounts statistics of (user id, course id) pairs in the current transaction, rows are locked first so
+            concurrent updates of a student do not overwrite each other with stale counts. missing rows are created
+            unless create is False, e.g. on deletions which may be cascaded from the student or the course """
+        with transaction.atomic():
+            for user_id, course_id in sorted(set(pairs)):
+                if create:
+                    statistics, _ = self.select_for_update().get_or_create(user_id=user_id, course_id=course_id)
+                else:
+                    statistics = self.select_for_update().filter(user_id=user_id, course_id=course_id).first()
+                    if statistics is None:
+                        continue
+                counts = self.count_submissions(Submission.objects.filter(owner_id=user_id,
+                                                                          problem__contest__course_id=course_id))
+                counts['completed_assignments'] = Assignment.objects.filter(
+                    user_id=user_id, problem__contest__course_id=course_id, score__gt=2
+                ).count()
+                for name, value in counts.items():
+                    setattr(statistics, name, value)
+                statistics.save()
+
+    def add(self, user_id, course_id, create=True, **deltas):
+        """ adds deltas to counts of a student in place, a missing row is created by a recount unless create is
+            False """
+        deltas = {name: delta for name, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        statistics = self.filter(user_id=user_id, course_id=course_id)
+        if not statistics.update(**{name: models.F(name) + delta for name, delta in deltas.items()}) and create:
+            self.update_set([(user_id, course_id)])
+
+    def rebuild(self, course_ids=None):
+        """ recounts statistics of all students of the courses (of all courses by default) with grouped queries """
+        submissions, assignments = Submission.objects.all(), Assignment.objects.filter(score__gt=2)
+        if course_ids is not None:
+            submissions = submissions.filter(problem__contest__course_id__in=course_ids)
+            assignments = assignments.filter(problem__contest__course_id__in=course_ids)
+        rows = dict()
+        for counts in (submissions.values('owner_id', 'problem__contest__course_id').order_by()
+                       .annotate(submissions=Count('id'), ok_submissions=Count('id', filter=Q(status='OK')),
+                                 solved_problems=Count('problem', filter=Q(status='OK'), distinct=True))):
+            key = (counts.pop('owner_id'), counts.pop('problem__contest__course_id'))
+            rows[key] = StudentStatistics(user_id=key[0], course_id=key[1], **counts)
+        for user_id, course_id, count in (assignments.values_list('user_id', 'problem__contest__course_id')
+                                          .order_by().annotate(count=Count('id'))):
+            rows.setdefault((user_id, course_id), StudentStatistics(user_id=user_id, course_id=course_id))
+            rows[(user_id, course_id)].completed_assignments = count
+        with transaction.atomic():
+            statistics = self.all() if course_ids is None else self.filter(course_id__in=course_ids)
+            statistics.delete()
+            self.bulk_create(rows.values())
+        return len(rows)
+
+
+def get_accuracy(ok_submissions, submissions):
+    return round(100 * ok_submissions / (submissions or 1))
+
+
+class StudentStatistics(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='statistics', verbose_name="Студент")
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+', verbose_name="Курс")
+    submissions = models.PositiveIntegerField(default=0, verbose_name="Посылок")
+    ok_submissions = models.PositiveIntegerField(default=0, verbose_name="Посылок с решением")
+    solved_problems = models.PositiveIntegerField(default=0, verbose_name="Решено задач")
+    completed_assignments = models.PositiveIntegerField(default=0, verbose_name="Выполнено заданий")
+
+    objects = StudentStatisticsManager.from_queryset(StudentStatisticsQuerySet)()
+
+    class Meta:
+        unique_together = ('user', 'course')
+        verbose_name = "Статистика студента"
+        verbose_name_plural = "Статистика студентов"
+
+    @property
+    def accuracy(self):
+        return get_accuracy(self.ok_submissions, self.submissions)
+
+    def __str__(self):
+        return f"Статистика {self.user} по курсу {self.course_id}"
+
+
 """=================================================== Execution ===================================================="""
 
 
 class ExecutionManager(models.Manager):
-    def create_set(self, submission, executions):
-        self.filter(submission=submission).delete()
+    def copy_set(self, source, target):
+        self.filter(submission=target).delete()
+        executions = list(self.filter(submission=source))
+        for execution in executions:
+            execution.pk, execution.submission = None, target
+        return self.bulk_create(executions)
+
+    def create_set(self, submission, executions, keep=()):
+        """ replaces executions of the submission except the ones of tests in keep """
+        old_executions = self.filter(submission=submission)
+        for test in keep:
+            old_executions = old_executions.exclude(test_type=ContentType.objects.get_for_model(type(test)),
+                                                    test_id=test.id)
+        old_executions.delete()
         new_executions = []
         for test, stats in executions:
             if 'date_created' not in stats:
                 stats['date_created'] = timezone.now()
             elif timezone.is_naive(stats['date_created']):
                 stats['date_created'] = timezone.make_aware(stats['date_created'])
+            output_refs = pack_outputs(stats)
             new_execution = Execution(submission=submission, test_type=ContentType.objects.get_for_model(type(test)),
-                                      test_id=test.id, **stats)
+                                      test_id=test.id, output_refs=output_refs, **stats)
             new_executions.append(new_execution)
         return self.bulk_create(new_executions)
 
@@ -1226,6 +1689,8 @@ class Execution(models.Model):
 
     exception = models.TextField(default="", verbose_name="Исключение")
 
+    output_refs = models.JSONField(default=dict, blank=True, verbose_name="Ссылки на полные выводы")
+
     date_created = models.DateTimeField(verbose_name="Дата создания")
 
     objects = ExecutionManager()
@@ -1237,3 +1702,297 @@ class Execution(models.Model):
 
     def __str__(self):
         return f"Запуск: {self.submission} на тесте {self.test} от {self.date_created}"
+
+    def get_output(self, field):
+        """ full output if it was moved to the store, the one kept in the row otherwise """
+        store = get_output_store()
+        if field in self.output_refs and store is not None:
+            try:
+                return store.get(self.output_refs[field])
+            except OSError:
+                pass
+        return getattr(self, field)
+
+
+"""=================================================== TimingSpan ==================================================="""
+
+
+class TimingSpanManager(models.Manager):
+    def create_set(self, submission, spans):
+        """ sums spans of an evaluation up by name """
+        totals = dict()
+        for name, duration in spans:
+            count, total = totals.get(name, (0, 0.0))
+            totals[name] = (count + 1, total + duration)
+        date_created = timezone.now()
+        return self.bulk_create([TimingSpan(submission=submission, problem_id=submission.problem_id, name=name,
+                                            count=count, duration=duration, date_created=date_created)
+                                 for name, (count, duration) in totals.items()])
+
+    def get_summary(self, since=None, **filters):
+        """ percentiles of durations of each stage per evaluation """
+        queryset = self.filter(**filters)
+        if since is not None:
+            queryset = queryset.filter(date_created__gte=since)
+        durations = dict()
+        for name, duration in queryset.values_list('name', 'duration').iterator():
+            durations.setdefault(name, []).append(duration)
+        return [dict(name=name, name_display=name_display, **summarize_durations(durations[name]))
+                for name, name_display in TimingSpan.NAME_CHOICES if name in durations]
+
+    def get_problem_summaries(self, name, since=None, limit=20):
+        """ problems with the largest 90th percentile of durations of the stage """
+        queryset = self.filter(name=name)
+        if since is not None:
+            queryset = queryset.filter(date_created__gte=since)
+        durations = dict()
+        for problem_id, duration in queryset.values_list('problem_id', 'duration').iterator():
+            durations.setdefault(problem_id, []).append(duration)
+        summaries = sorted((dict(problem_id=problem_id, **summarize_durations(values))
+                            for problem_id, values in durations.items()), key=lambda summary: -summary['p90'])[:limit]
+        problems = Problem.objects.select_related('contest__course').in_bulk([s['problem_id'] for s in summaries])
+        for summary in summaries:
+            summary['problem'] = problems.get(summary['problem_id'])
+        return summaries
+
+
+def summarize_durations(durations):
+    p50, p90, p99 = np.percentile(durations, [50, 90, 99])
+    return {'count': len(durations), 'mean': float(np.mean(durations)), 'p50': float(p50), 'p90': float(p90),
+            'p99': float(p99), 'max': float(np.max(durations))}
+
+
+class TimingSpan(models.Model):
+    NAME_CHOICES = (
+        ('queue', "Ожидание в очереди"),
+        ('evaluate', "Проверка целиком"),
+        ('inspect', "Проверка комплектации"),
+        ('sandbox', "Подготовка песочницы"),
+        ('compile', "Компиляция"),
+        ('execute', "Выполнение"),
+        ('check', "Проверка вывода"),
+        ('save', "Сохранение результатов"),
+    )
+
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, verbose_name="Посылка")
+    problem = models.ForeignKey(Problem, on_delete=models.CASCADE, verbose_name="Задача")
+    name = models.CharField(max_length=16, choices=NAME_CHOICES, verbose_name="Этап")
+    count = models.PositiveIntegerField(default=1, verbose_name="Количество")
+    duration = models.FloatField(verbose_name="Длительность")
+    date_created = models.DateTimeField(verbose_name="Дата создания")
+
+    objects = TimingSpanManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['problem', 'name', 'date_created']),
+            models.Index(fields=['name', 'date_created']),
+        ]
+        ordering = ('date_created',)
+        verbose_name = "Этап проверки"
+        verbose_name_plural = "Этапы проверки"
+
+    def __str__(self):
+        return f"{self.get_name_display()}: {self.submission} за {self.duration:.3f} с"
+
+
+"""=================================================== Similarity ==================================================="""
+
+
+class SourceFingerprintManager(models.Manager):
+    def create_set(self, submission):
+        """ indexes sources of the submission unless they are indexed already """
+        if self.filter(submission=submission).exists():
+            return []
+        fingerprints = []
+        for path in submission.files:
+            text = read_source(path) if is_indexed(path) else None
+            if text is None:
+                continue
+            fingerprints += [SourceFingerprint(submission=submission, problem_id=submission.problem_id, hash=value,
+                                               filename=os.path.basename(path), line_start=start, line_end=end)
+                             for value, start, end in get_fingerprints(text)]
+        return self.bulk_create(fingerprints)
+
+    def get_matches(self, submission, submissions, limit=None):
+        """ submissions of the queryset sharing fingerprints with the submission, most similar first. the submission
+            is indexed on the way, other submissions which are not indexed yet are left out """
+        self.create_set(submission)
+        own = dict()
+        for value, filename, start, end in self.filter(submission=submission).values_list('hash', 'filename',
+                                                                                         'line_start', 'line_end'):
+            own.setdefault(value, []).append((filename, start, end))
+        shared, hashes = dict(), list(own)
+        for i in range(0, len(hashes), 500):  # keeps the number of query parameters small
+            fingerprints = self.filter(problem_id=submission.problem_id, hash__in=hashes[i:i + 500],
+                                       submission__in=submissions).exclude(submission=submission)
+            for submission_id, value, filename, start, end in fingerprints.values_list('submission_id', 'hash',
+                                                                                        'filename', 'line_start',
+                                                                                        'line_end'):
+                shared.setdefault(submission_id, dict()).setdefault(value, []).append((filename, start, end))
+        totals = dict(self.filter(submission_id__in=list(shared)).order_by().values_list('submission_id')
+                      .annotate(count=Count('hash', distinct=True)))
+        others = submissions.select_related('owner__account').in_bulk(list(shared))
+        matches = []
+        for submission_id, other_hashes in shared.items():
+            if submission_id not in others:
+                continue
+            matches.append({
+                'submission': others[submission_id],
+                'shared': len(other_hashes),
+                'similarity': round(100 * len(other_hashes) / len(own)),
+                'other_similarity': round(100 * len(other_hashes) / max(totals.get(submission_id, 0), 1)),
+                'regions': collect_regions(own[value] for value in other_hashes),
+                'other_regions': collect_regions(other_hashes.values()),
+            })
+        matches.sort(key=lambda match: (-match['similarity'], -match['other_similarity'], match['submission'].id))
+        return matches[:limit]
+
+
+class SourceFingerprint(models.Model):
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, verbose_name="Посылка")
+    problem = models.ForeignKey(Problem, on_delete=models.CASCADE, verbose_name="Задача")
+    hash = models.BigIntegerField(verbose_name="Хеш")
+    filename = models.CharField(max_length=255, verbose_name="Файл")
+    line_start = models.PositiveIntegerField(verbose_name="Первая строка")
+    line_end = models.PositiveIntegerField(verbose_name="Последняя строка")
+
+    objects = SourceFingerprintManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['problem', 'hash']),
+        ]
+        verbose_name = "Отпечаток исходного кода"
+        verbose_name_plural = "Отпечатки исходного кода"
+
+    def __str__(self):
+        return f"{self.filename}:{self.line_start}-{self.line_end} посылки {self.submission_id}"
+
+
+_signature_indexes = dict()
+
+
+class SimilaritySignatureManager(models.Manager):
+    def create_signature(self, submission):
+        """ MinHash signature of fingerprints of the submission unless it has one already. submissions without
+            sources get an empty signature, so that they are not indexed again """
+        if self.filter(submission=submission).exists():
+            return None
+        hashes = SourceFingerprint.objects.filter(submission=submission).values_list('hash', flat=True)
+        signature = get_minhash(list(hashes))
+        return self.create(submission=submission, course_id=submission.problem.contest.course_id,
+                           signature=signature.tobytes() if signature is not None else b'')
+
+    def get_index(self, course_id):
+        """ SignatureIndex of submissions of the course, kept by the process until signatures of the course change """
+        signatures = self.filter(course_id=course_id).exclude(signature=b'')
+        version = tuple(signatures.aggregate(count=Count('id'), last=Max('id')).values())
+        cached = _signature_indexes.get(course_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        ids, rows = [], []
+        for submission_id, signature in signatures.values_list('submission_id', 'signature').iterator():
+            ids.append(submission_id)
+            rows.append(np.frombuffer(bytes(signature), dtype=np.uint32))
+        index = SignatureIndex(ids, np.array(rows, dtype=np.uint32).reshape(len(rows), -1))
+        _signature_indexes[course_id] = (version, index)
+        return index
+
+    def get_similar(self, submission, limit=None):
+        """ submissions of the course of the submission most similar to it as (submission, estimated similarity) """
+        signature = self.filter(submission=submission).values_list('signature', flat=True).first()
+        if not signature:
+            return []
+        course_id = submission.problem.contest.course_id
+        results = self.get_index(course_id).query(np.frombuffer(bytes(signature), dtype=np.uint32), limit=limit,
+                                                  exclude=[submission.id])
+        submissions = Submission.objects.select_related('owner__account', 'problem').in_bulk(
+            [submission_id for submission_id, _ in results])
+        return [(submissions[submission_id], similarity) for submission_id, similarity in results
+                if submission_id in submissions]
+
+
+class SimilaritySignature(models.Model):
+    submission = models.OneToOneField(Submission, on_delete=models.CASCADE, verbose_name="Посылка")
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, verbose_name="Курс")
+    signature = models.BinaryField(verbose_name="Сигнатура MinHash")
+
+    objects = SimilaritySignatureManager()
+
+    class Meta:
+        verbose_name = "Сигнатура исходного кода"
+        verbose_name_plural = "Сигнатуры исходного кода"
+
+    def __str__(self):
+        return f"Сигнатура посылки {self.submission_id}"
+
+
+"""==================================================== Rejudge ====================================================="""
+
+
+class Rejudge(CRUDEntry):
+    STATUS_CHOICES = (
+        ('Q', "В очереди"),
+        ('R', "Выполняется"),
+        ('D', "Завершена"),
+        ('F', "Прервана"),
+    )
+    DEFAULT_STATUS = 'Q'
+
+    problem = models.ForeignKey(Problem, on_delete=models.CASCADE, verbose_name="Задача")
+    status = models.CharField(max_length=1, choices=STATUS_CHOICES, default=DEFAULT_STATUS, verbose_name="Статус")
+    total = models.PositiveIntegerField(default=0, verbose_name="Всего посылок")
+    processed = models.PositiveIntegerField(default=0, verbose_name="Проверено посылок")
+
+    class Meta(CRUDEntry.Meta):
+        verbose_name = "Перепроверка"
+        verbose_name_plural = "Перепроверки"
+
+    @property
+    def course(self):
+        return self.problem.contest.course
+
+    @property
+    def is_done(self):
+        return self.status == 'D'
+
+    @property
+    def is_failed(self):
+        return self.status == 'F'
+
+    @property
+    def is_finished(self):
+        return self.is_done or self.is_failed
+
+    def get_progress(self):
+        return self.processed * 100 // self.total if self.total > 0 else 100
+
+    def count_processed(self, count=1):
+        """ the rejudge is done once every submission is processed, unless a batch of it has failed """
+        if count <= 0:
+            return
+        Rejudge.objects.filter(id=self.id).update(processed=models.F('processed') + count)
+        Rejudge.objects.filter(id=self.id).exclude(status='F').update(
+            status=models.Case(models.When(processed__gte=models.F('total'), then=models.Value('D')),
+                               default=models.Value('R')))
+
+    def fail(self, unprocessed=0):
+        """ called when a batch dies, submissions it has not processed are counted so that the progress completes """
+        Rejudge.objects.filter(id=self.id).update(status='F', processed=models.F('processed') + unprocessed)
+
+    def rejudge(self, submission, observer, user, sandbox_type):
+        """ solved submissions only run tests updated after their evaluation, others are evaluated from scratch """
+        try:
+            tests = None
+            if submission.is_ok:
+                date_evaluated = submission.execution_set.aggregate(date=models.Max('date_created'))['date']
+                if date_evaluated is not None:
+                    tests = self.problem.get_tests_updated_after(date_evaluated)
+            if tests != []:
+                submission.evaluate(observer, user, sandbox_type, tests=tests)
+        finally:
+            self.count_processed()
+
+    def __str__(self):
+        return f"Перепроверка задачи {self.problem}"
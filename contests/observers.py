@@ -1,23 +1,100 @@
-from decimal import Decimal
+import time
+from contextlib import contextmanager
 
+from django.conf import settings
+from django.core.cache import caches
+
+
+def get_task_progress_key(task_id):
+    return 'task-progress:{}'.format(task_id)
+
+
+def set_task_progress(task_id, state, current, total, progress):
+    if task_id is None:  # the task is called directly
+        return
+    caches['progress'].set(get_task_progress_key(task_id), {
+        'state': state,
+        'current': current,
+        'total': total,
+        'progress': progress,
+    })
+
+
+def finish_task_progress(task_id):
+    """ marks the progress of a task whose result is stored, readers of the progress go to the result backend then """
+    key = get_task_progress_key(task_id)
+    info = caches['progress'].get(key) or {'state': None, 'current': 0, 'total': 0, 'progress': 0}
+    caches['progress'].set(key, dict(info, finished=True))
 
-class TaskProgressObserver:
-    def __init__(self, task):
-        self.task = task
+
+def get_task_progress(task_id):
+    return caches['progress'].get(get_task_progress_key(task_id))
+
+
+def get_tasks_progress(task_ids):
+    """ progress of many tasks in one cache lookup, tasks without progress are left out """
+    keys = {get_task_progress_key(task_id): task_id for task_id in task_ids}
+    return {keys[key]: info for key, info in caches['progress'].get_many(keys).items()}
+
+
+class Observer:
+    """ discards progress and timings, used where nobody is listening """
 
     def print(self, *args):
         pass
 
     def set_progress(self, state, current, total):
-        percentage = 0
-        if total > 0:
-            percentage = (Decimal(current) / Decimal(total)) * Decimal(100)
-            percentage = float(round(percentage, 2))
-        self.task.update_state(
-            state=state,
-            meta={
-                'current': current,
-                'total': total,
-                'progress': percentage,
-            }
-        )
+        pass
+
+    @contextmanager
+    def span(self, name):
+        """ times a stage of an evaluation, see TimingSpan.NAME_CHOICES """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, time.perf_counter() - start)
+
+    def add_span(self, name, duration):
+        pass
+
+    def pop_spans(self):
+        return []
+
+
+class TimingObserver(Observer):
+    """ collects timings of stages until they are popped (e.g. in judge pool workers) """
+
+    def __init__(self):
+        self.spans = []
+
+    def add_span(self, name, duration):
+        self.spans.append((name, duration))
+
+    def pop_spans(self):
+        spans, self.spans = self.spans, []
+        return spans
+
+
+class TaskProgressObserver(TimingObserver):
+    """ reports progress of a task through the progress cache, the result backend only gets the final result.
+        updates are coalesced: an update is written when the state or the percentage changes, but not more often
+        than once per JUDGE_PROGRESS_INTERVAL seconds unless the state changes or the stage is complete """
+
+    def __init__(self, task):
+        super().__init__()
+        self.task = task
+        self.last_update = None
+        self.last_time = 0.0
+
+    def set_progress(self, state, current, total):
+        percentage = current * 100 // total if total > 0 else 0
+        if self.last_update is not None:
+            last_state, last_percentage = self.last_update
+            if (state, percentage) == (last_state, last_percentage):
+                return
+            if (state == last_state and percentage < 100 and
+                    time.monotonic() - self.last_time < settings.JUDGE_PROGRESS_INTERVAL):
+                return
+        self.last_update, self.last_time = (state, percentage), time.monotonic()
+        set_task_progress(self.task.request.id, state, current, total, percentage)
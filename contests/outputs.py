@@ -0,0 +1,99 @@
+import hashlib
+import os
+import tempfile
+import zlib
+
+from django.conf import settings
+
+from contest.sandbox import OutputBuffer
+from contest.utils import map_file
+
+OUTPUT_FIELDS = (
+    'compilation_stdout',
+    'compilation_stderr',
+    'execution_stdout',
+    'execution_stderr',
+    'test_input',
+    'test_output',
+    'test_output_correct',
+)
+
+
+def truncate_output(text, head, tail):
+    """ keeps head first and tail last characters of the text """
+    if len(text) <= head + tail:
+        return text
+    marker = "\n... пропущено символов: {} ...\n".format(len(text) - head - tail)
+    return text[:head] + marker + (text[-tail:] if tail > 0 else '')
+
+
+class OutputStore:
+    """ content-addressed store of compressed outputs too large to be kept in execution rows. a blob is written
+        aside and renamed into place, equal outputs of different executions share one blob """
+
+    def __init__(self, root):
+        self.root = root
+
+    def get_path(self, key):
+        return os.path.join(self.root, key[:2], key + '.z')
+
+    def put(self, text):
+        data = text.encode()
+        key = hashlib.sha256(data).hexdigest()
+        path = self.get_path(key)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix='.tmp-', dir=os.path.dirname(path))
+            with os.fdopen(fd, 'wb') as f:
+                f.write(zlib.compress(data))
+            os.rename(tmp, path)
+        return key
+
+    def get(self, key):
+        with open(self.get_path(key), 'rb') as f:
+            return zlib.decompress(f.read()).decode()
+
+
+def get_output_size(path):
+    """ size of the output file on the local file system, 0 if it is not there """
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def read_output(sandbox, path):
+    """ head and tail of the output file, the file is not read whole """
+    with map_file(path) as data:
+        if data is None:  # not on the local file system, read it through the sandbox
+            text = sandbox.read(path)
+            return truncate_output(text or '', settings.JUDGE_OUTPUT_HEAD_SIZE, settings.JUDGE_OUTPUT_TAIL_SIZE)
+        buffer = OutputBuffer(settings.JUDGE_OUTPUT_HEAD_SIZE, settings.JUDGE_OUTPUT_TAIL_SIZE)
+        buffer.write(data)
+        return buffer.decode()
+
+
+def get_output_store():
+    if not settings.JUDGE_OUTPUT_STORE_DIR:
+        return None
+    return OutputStore(settings.JUDGE_OUTPUT_STORE_DIR)
+
+
+def pack_outputs(stats):
+    """ caps outputs in stats, moves the ones longer than a preview to the store leaving previews in their place,
+        returns references to the stored outputs """
+    store, refs = get_output_store(), {}
+    preview_size = settings.JUDGE_OUTPUT_PREVIEW_SIZE
+    for field in OUTPUT_FIELDS:
+        text = stats.get(field)
+        if not text:
+            continue
+        text = truncate_output(text, settings.JUDGE_OUTPUT_HEAD_SIZE, settings.JUDGE_OUTPUT_TAIL_SIZE)
+        if store is not None and len(text) > preview_size:
+            try:
+                refs[field] = store.put(text)
+                text = truncate_output(text, preview_size // 2, preview_size - preview_size // 2)
+            except OSError:
+                pass  # keep the capped output in the row
+        stats[field] = text
+    return refs
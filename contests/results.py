@@ -1,5 +1,6 @@
 from celery.result import AsyncResult
 
+from contests.observers import get_task_progress
 from contests.templatetags.contests import colorize
 
 
@@ -7,9 +8,20 @@ class TaskProgress:
     def __init__(self, task_id):
         if not isinstance(task_id, str):
             raise ValueError("task_id must be a string")
+        self.task_id = task_id
         self.result = AsyncResult(task_id)
 
     def get_info(self):
+        """ the progress cache is read first, the result backend is queried only when the cache has nothing on the
+            task or the task is finished """
+        info = get_task_progress(self.task_id)
+        if info is not None and not info.get('finished'):
+            return {
+                'state': info['state'],
+                'progress': info['progress'],
+                'complete': False,
+                'success': None
+            }
         if self.result.ready():
             status, status_display = self.result.get()
             return {
@@ -36,4 +48,4 @@ class TaskProgress:
             'progress': progress,
             'complete': False,
             'success': None
-        }
\ No newline at end of file
+        }
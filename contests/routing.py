@@ -0,0 +1,40 @@
+"""
+judge tasks are sent to queues named judge.<kind>.<shard>:
+    interactive - submissions evaluated on behalf of their owners
+    reevaluate  - re-evaluations triggered by course staff
+    rejudge     - bulk rejudges
+courses are spread over JUDGE_QUEUE_SHARDS shards of each kind. a worker consuming several queues takes messages from
+them in turn, so a burst of submissions of one course waits in its own shard instead of delaying other courses.
+separate workers should consume each kind, interactive ones first of all, e.g.:
+    celery -A contest worker -Q judge.interactive.0,judge.interactive.1,judge.interactive.2,judge.interactive.3
+queues are created on the first use
+"""
+import time
+
+from django.conf import settings
+
+INTERACTIVE = 'interactive'
+REEVALUATE = 'reevaluate'
+REJUDGE = 'rejudge'
+KINDS = (INTERACTIVE, REEVALUATE, REJUDGE)
+
+
+def get_queue_name(kind, course_id):
+    if kind not in KINDS:
+        raise ValueError("unknown kind of judge queue: %s" % kind)
+    return 'judge.{}.{}'.format(kind, course_id % settings.JUDGE_QUEUE_SHARDS)
+
+
+def get_queue_names(*kinds):
+    return ['judge.{}.{}'.format(kind, shard)
+            for kind in kinds or KINDS for shard in range(settings.JUDGE_QUEUE_SHARDS)]
+
+
+def get_submission_kind(submission, user):
+    return INTERACTIVE if submission.owner_id == user.id else REEVALUATE
+
+
+def enqueue(task, kind, course_id, args=(), kwargs=None, **options):
+    """ judge tasks get the time they were enqueued at to report their wait in the queue """
+    kwargs = dict(kwargs or {}, enqueued_at=time.time())
+    return task.apply_async(args, kwargs, queue=get_queue_name(kind, course_id), **options)
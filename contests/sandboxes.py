@@ -0,0 +1,102 @@
+import os
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+
+try:
+    from tools.sandbox import get_sandbox_class
+except ImportError:
+    from contest.utils import get_sandbox_class
+
+_pools = dict()
+_pools_pid = None
+_pools_lock = threading.Lock()
+
+
+class SandboxPool:
+    """ keeps up to size entered sandboxes of a class for reuse within a process. sandbox classes opt in by defining
+        reset(workdir), which must clean the sandbox up and bind it to another workdir much cheaper than creating
+        a new one. only ForkServerSandbox does, sandboxes of other classes (e.g. the container based ones of
+        tools.sandbox) are created and exited on every use """
+
+    def __init__(self, Sandbox, size):
+        self.Sandbox = Sandbox
+        self.size = size
+        self.idle = []
+        self.lock = threading.Lock()
+
+    @property
+    def is_enabled(self):
+        return self.size > 0 and hasattr(self.Sandbox, 'reset')
+
+    def take(self, workdir):
+        while True:
+            with self.lock:
+                if not self.idle:
+                    break
+                manager, sandbox = self.idle.pop()
+            try:
+                sandbox.reset(workdir)
+                return manager, sandbox
+            except Exception:
+                self.discard(manager)
+        manager = self.Sandbox(workdir)
+        return manager, manager.__enter__()
+
+    def give_back(self, manager, sandbox):
+        with self.lock:
+            if len(self.idle) < self.size:
+                self.idle.append((manager, sandbox))
+                return
+        self.discard(manager)
+
+    @staticmethod
+    def discard(manager):
+        try:
+            manager.__exit__(None, None, None)
+        except Exception:
+            pass
+
+    @contextmanager
+    def acquire(self, workdir):
+        if not self.is_enabled:
+            with self.Sandbox(workdir) as sandbox:
+                yield sandbox
+            return
+        manager, sandbox = self.take(workdir)
+        try:
+            yield sandbox
+        except BaseException:
+            self.discard(manager)  # may be left in any state
+            raise
+        self.give_back(manager, sandbox)
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for manager, _ in idle:
+            self.discard(manager)
+
+
+def get_sandbox_pool(Sandbox):
+    global _pools_pid
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            _pools.clear()  # sandboxes inherited from the parent process are still used by it
+            _pools_pid = os.getpid()
+        if Sandbox not in _pools:
+            _pools[Sandbox] = SandboxPool(Sandbox, settings.JUDGE_SANDBOX_POOL_SIZE)
+        return _pools[Sandbox]
+
+
+def acquire_sandbox(sandbox_type, workdir):
+    return get_sandbox_pool(get_sandbox_class(sandbox_type)).acquire(workdir)
+
+
+def close_sandbox_pools():
+    with _pools_lock:
+        pools = list(_pools.values()) if _pools_pid == os.getpid() else []
+        _pools.clear()
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,210 @@
+"""
+local detection of similar sources: C/C++ sources are reduced to streams of normalized tokens (names, literals and
+comments do not matter), k-grams of tokens are hashed and winnowing selects fingerprints among the hashes, which
+guarantees that any match of at least window + kgram - 1 tokens shares a fingerprint. fingerprints are kept per
+problem by SourceFingerprint, see Schleimer, Wilkerson, Aiken "Winnowing: local algorithms for document
+fingerprinting". MinHash signatures of sets of fingerprints and their SignatureIndex find similar submissions among
+all submissions of a course without comparing them one by one
+"""
+import functools
+import hashlib
+import os
+import re
+from collections import deque
+
+import numpy as np
+from django.conf import settings
+
+from contests.builds import SOURCE_EXTENSIONS
+
+INDEXED_EXTENSIONS = SOURCE_EXTENSIONS | {'.h', '.hh', '.hpp'}
+
+KEYWORDS = frozenset("""
+    alignas alignof asm auto bool break case catch char char16_t char32_t class const const_cast constexpr continue
+    decltype default delete do double dynamic_cast else enum explicit extern false float for friend goto if inline int
+    long mutable namespace new noexcept nullptr operator private protected public register reinterpret_cast return
+    short signed sizeof static static_assert static_cast struct switch template this throw true try typedef typeid
+    typename union unsigned using virtual void volatile wchar_t while
+""".split())
+
+TOKEN_RE = re.compile(r"""
+    (?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<preprocessor>^[ \t]*\#(?:\\\n|[^\n])*)
+  | (?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+  | (?P<number>0[xX][0-9a-fA-F]+[uUlL]*|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?[uUlLfF]*)
+  | (?P<name>[A-Za-z_]\w*)
+  | (?P<operator>->|\+\+|--|<<=|>>=|<<|>>|<=|>=|==|!=|&&|\|\||::|[-+*/%&|^]=|[^\s\w])
+""", re.DOTALL | re.MULTILINE | re.VERBOSE)
+
+
+def tokenize(text):
+    """ normalized tokens of a C/C++ source with numbers of lines they start at: identifiers become V, numbers N,
+        string and character literals S, comments and preprocessor directives are dropped """
+    tokens, line, position = [], 1, 0
+    for match in TOKEN_RE.finditer(text):
+        line += text.count('\n', position, match.start())
+        position = match.start()
+        kind, value = match.lastgroup, match.group()
+        if kind == 'name':
+            tokens.append((value if value in KEYWORDS else 'V', line))
+        elif kind == 'number':
+            tokens.append(('N', line))
+        elif kind == 'string':
+            tokens.append(('S', line))
+        elif kind == 'operator':
+            tokens.append((value, line))
+    return tokens
+
+
+def hash_kgram(tokens):
+    digest = hashlib.blake2b('\0'.join(tokens).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)  # fits into a BigIntegerField
+
+
+def winnow(hashes, window):
+    """ positions of the minimal hash of every window of consecutive hashes, the rightmost of equal ones,
+        each position once """
+    if not hashes:
+        return []
+    if len(hashes) < window:
+        minimum = min(hashes)
+        return [len(hashes) - 1 - hashes[::-1].index(minimum)]
+    positions, queue = [], deque()
+    for i, value in enumerate(hashes):
+        while queue and hashes[queue[-1]] >= value:
+            queue.pop()
+        queue.append(i)
+        if queue[0] <= i - window:
+            queue.popleft()
+        if i >= window - 1 and (not positions or positions[-1] != queue[0]):
+            positions.append(queue[0])
+    return positions
+
+
+def get_fingerprints(text, kgram=None, window=None):
+    """ fingerprints of a source as (hash, first line, last line) """
+    kgram = kgram or settings.SIMILARITY_KGRAM_SIZE
+    window = window or settings.SIMILARITY_WINDOW_SIZE
+    tokens = tokenize(text)
+    if len(tokens) < kgram:
+        return []
+    values = [value for value, _ in tokens]
+    hashes = [hash_kgram(values[i:i + kgram]) for i in range(len(tokens) - kgram + 1)]
+    return [(hashes[i], tokens[i][1], tokens[i + kgram - 1][1]) for i in winnow(hashes, window)]
+
+
+def is_indexed(path):
+    return os.path.splitext(path)[1].lower() in INDEXED_EXTENSIONS
+
+
+def read_source(path):
+    try:
+        with open(path, errors='replace') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def merge_regions(regions):
+    """ joins overlapping and adjacent (first line, last line) regions """
+    merged = []
+    for start, end in sorted(regions):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def collect_regions(region_lists):
+    """ merged regions of lists of (filename, first line, last line) by filename """
+    regions = dict()
+    for region_list in region_lists:
+        for filename, start, end in region_list:
+            regions.setdefault(filename, []).append((start, end))
+    return {filename: merge_regions(file_regions) for filename, file_regions in regions.items()}
+
+
+def highlight_lines(text, regions):
+    """ lines of the text as (number, line, is in one of the regions) """
+    lines = text.splitlines()
+    marked = set()
+    for start, end in regions:
+        marked.update(range(start, end + 1))
+    return [(number, line, number in marked) for number, line in enumerate(lines, start=1)]
+
+
+"""===================================================== MinHash ===================================================="""
+
+
+MINHASH_SEED = 20261018
+
+
+def mix(values):
+    """ splitmix64 finalizer, a bijection of uint64 spreading every bit of the input over the output """
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xbf58476d1ce4e5b9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94d049bb133111eb)
+    return values ^ (values >> np.uint64(31))
+
+
+@functools.lru_cache()
+def get_minhash_seeds(size):
+    return np.random.default_rng(MINHASH_SEED).integers(0, 2 ** 63, size, dtype=np.uint64)
+
+
+def get_minhash(hashes, size=None):
+    """ MinHash signature of a set of fingerprint hashes: the minimum of each of size hash functions over the set.
+        the share of equal components of two signatures estimates the Jaccard similarity of the sets """
+    size = size or settings.SIMILARITY_MINHASH_SIZE
+    values = np.unique(np.asarray(hashes, dtype=np.int64)).view(np.uint64)
+    if len(values) == 0:
+        return None
+    seeds = get_minhash_seeds(size)
+    signature = np.full(size, np.iinfo(np.uint64).max, dtype=np.uint64)
+    for i in range(0, len(values), 4096):  # bounds memory taken by large sets
+        signature = np.minimum(signature, mix(values[i:i + 4096, None] ^ seeds[None, :]).min(axis=0))
+    return (signature >> np.uint64(32)).astype(np.uint32)
+
+
+class SignatureIndex:
+    """ locality-sensitive hashing of MinHash signatures: signatures are cut into bands, and the ones with an equal
+        band are candidates, so pairs of similarity s are found with probability 1 - (1 - s^rows)^bands. keys of every
+        band are kept sorted, a query costs a binary search per band and comparison with its candidates only """
+
+    def __init__(self, ids, signatures, bands=None):
+        self.bands = bands or settings.SIMILARITY_LSH_BANDS
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.signatures = np.asarray(signatures, dtype=np.uint32).reshape(len(self.ids), -1)
+        keys = self.get_band_keys(self.signatures)
+        self.order = np.argsort(keys, axis=0, kind='stable')
+        self.keys = np.take_along_axis(keys, self.order, axis=0)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def get_band_keys(self, signatures):
+        rows = signatures.shape[1] // self.bands
+        bands = signatures[:, :rows * self.bands].reshape(len(signatures), self.bands, rows).astype(np.uint64)
+        keys = np.zeros((len(signatures), self.bands), dtype=np.uint64)
+        for row in range(rows):
+            keys = mix(keys ^ bands[:, :, row])
+        return keys
+
+    def query(self, signature, limit=None, exclude=()):
+        """ ids of indexed signatures similar to the signature with estimated similarities, most similar first """
+        if len(self) == 0:
+            return []
+        keys = self.get_band_keys(np.asarray(signature, dtype=np.uint32)[None, :])[0]
+        candidates = []
+        for band in range(self.bands):
+            left = np.searchsorted(self.keys[:, band], keys[band], side='left')
+            right = np.searchsorted(self.keys[:, band], keys[band], side='right')
+            candidates.append(self.order[left:right, band])
+        candidates = np.unique(np.concatenate(candidates))
+        if len(exclude):
+            candidates = candidates[~np.isin(self.ids[candidates], list(exclude))]
+        similarities = (self.signatures[candidates] == signature).mean(axis=1)
+        ranking = np.lexsort((self.ids[candidates], -similarities))[:limit]
+        return [(int(self.ids[candidates[i]]), float(similarities[i])) for i in ranking]
@@ -0,0 +1,221 @@
+"""
+server-sent events streams served by contest/asgi.py next to the django application. Django 3.2 can not stream
+responses of async views, so streams are plain ASGI applications: a connected client waits on the event loop
+instead of holding a worker thread, and a single connection serves any number of tasks or a whole course table
+"""
+import asyncio
+import json
+import time
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import close_old_connections
+from django.http.cookie import parse_cookie
+
+from contests.gradebook import watch_course_table
+from contests.models import Assignment, Course, CourseLeader, CourseTableChange, Submission
+from contests.results import TaskProgress
+from contests.templatetags.contests import get_assignment_style
+
+SUBMISSION_PROGRESS_STREAM_PATH = '/api/submission/progress/stream'
+COURSE_TABLE_STREAM_PATH = '/api/course/table/stream'
+
+
+def get_scope_user(scope):
+    """ user of the django session the request of the scope belongs to """
+    cookies = {}
+    for name, value in scope.get('headers', []):
+        if name == b'cookie':
+            cookies.update(parse_cookie(value.decode('latin1')))
+    session = import_module(settings.SESSION_ENGINE).SessionStore(cookies.get(settings.SESSION_COOKIE_NAME))
+    return get_user(SimpleNamespace(session=session))
+
+
+def has_submissions_permission(user, submission_ids):
+    """ same as permissions of SubmissionProgressAPI: the permission, ownership or leadership of every submission """
+    close_old_connections()
+    try:
+        if not user.is_authenticated:
+            return False
+        if user.has_perm('contests.evaluate_submission'):
+            return True
+        submissions = Submission.objects.filter(id__in=submission_ids).select_related('problem__contest')
+        if len(submissions) != len(set(submission_ids)):
+            return False
+        led_courses = set(CourseLeader.objects.filter(leader=user).values_list('course_id', flat=True))
+        return all(submission.owner_id == user.id or submission.problem.contest.course_id in led_courses
+                   for submission in submissions)
+    finally:
+        close_old_connections()
+
+
+def has_course_table_permission(user, course_id):
+    """ same as permissions of AssignmentCourseTable: the permission, ownership or leadership of the course """
+    close_old_connections()
+    try:
+        if not user.is_authenticated:
+            return False
+        if user.has_perm('contests.view_assignment_table'):
+            return Course.objects.filter(id=course_id).exists()
+        return (Course.objects.filter(id=course_id, owner=user).exists() or
+                CourseLeader.objects.filter(course_id=course_id, leader=user).exists())
+    finally:
+        close_old_connections()
+
+
+def get_progress_info(task_id):
+    return TaskProgress(task_id).get_info()
+
+
+def get_course_table_changes(course_id, last_id):
+    """ id of the last change and cells of changed assignments of the course, None if the table is to be reloaded """
+    close_old_connections()
+    try:
+        watch_course_table(course_id)
+        last_id, assignment_ids = CourseTableChange.objects.get_changes(course_id, last_id)
+        if not assignment_ids:
+            return last_id, assignment_ids
+        assignments = (Assignment.objects.filter(id__in=assignment_ids)
+                       .only('id', 'score', 'date_updated', 'latest_submission_status',
+                             'latest_submission_date_created').order_by('id'))
+        return last_id, [{'assignment': assignment.id, 'score': assignment.score,
+                          'status': assignment.latest_submission_status, 'style': get_assignment_style(assignment)}
+                         for assignment in assignments]
+    finally:
+        close_old_connections()
+
+
+def start_course_table_stream(course_id):
+    close_old_connections()
+    try:
+        watch_course_table(course_id)
+        CourseTableChange.objects.prune(course_id)
+    finally:
+        close_old_connections()
+
+
+class EventStream:
+    """ base of server-sent events streams: get_params() checks the request and returns parameters of the stream or
+        an error response, stream() sends events until it returns or the client disconnects """
+
+    async def __call__(self, scope, receive, send):
+        status, params = await self.get_params(scope)
+        if status != 200:
+            return await self.respond(send, status, params)
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        disconnected = asyncio.ensure_future(self.wait_for_disconnect(receive))
+        try:
+            await self.stream(send, params, disconnected)
+        finally:
+            disconnected.cancel()
+        if not disconnected.done():
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+    async def get_params(self, scope):
+        """ (200, parameters of the stream) or (status, body) of an error response """
+        raise NotImplementedError("EventStream: get_params method must be defined!")
+
+    async def stream(self, send, params, disconnected):
+        raise NotImplementedError("EventStream: stream method must be defined!")
+
+    @staticmethod
+    async def respond(send, status, body):
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', b'text/plain; charset=utf-8')]})
+        await send({'type': 'http.response.body', 'body': body})
+
+    @staticmethod
+    async def wait_for_disconnect(receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    @staticmethod
+    def format_event(event, data, event_id=None):
+        body = 'event: {}\ndata: {}\n\n'.format(event, json.dumps(data, ensure_ascii=False))
+        if event_id is not None:
+            body = 'id: {}\n'.format(event_id) + body
+        return body.encode()
+
+    async def send_event(self, send, event, data, event_id=None):
+        await send({'type': 'http.response.body', 'body': self.format_event(event, data, event_id), 'more_body': True})
+
+
+class SubmissionProgressStream(EventStream):
+    """ pushes TaskProgress.get_info() of tasks of submissions as 'progress' events whenever it changes, e.g.
+        GET /api/submission/progress/stream?submission=1&task=<id>&submission=2&task=<id>
+        every event carries 'submission' and 'task' along with the info. the stream ends once all tasks are complete
+        or after JUDGE_PROGRESS_STREAM_TIMEOUT seconds, clients fall back to SubmissionProgressAPI then """
+
+    async def get_params(self, scope):
+        query = parse_qs(scope.get('query_string', b'').decode())
+        try:
+            tasks = dict(zip(query.get('task', []), map(int, query.get('submission', []))))
+        except ValueError:
+            tasks = {}
+        if not tasks:
+            return 400, b"submission and task parameters are required"
+        user = await sync_to_async(get_scope_user)(scope)
+        if not await sync_to_async(has_submissions_permission)(user, list(tasks.values())):
+            return 403, b""
+        return 200, tasks
+
+    async def stream(self, send, tasks, disconnected):
+        deadline = time.monotonic() + settings.JUDGE_PROGRESS_STREAM_TIMEOUT
+        last_infos = {}
+        while tasks and not disconnected.done() and time.monotonic() < deadline:
+            for task_id, submission_id in list(tasks.items()):
+                info = await sync_to_async(get_progress_info, thread_sensitive=False)(task_id)
+                if info != last_infos.get(task_id):
+                    last_infos[task_id] = info
+                    await self.send_event(send, 'progress', {'submission': submission_id, 'task': task_id, **info})
+                if info['complete']:
+                    del tasks[task_id]
+            if tasks:
+                await asyncio.wait([disconnected], timeout=settings.JUDGE_PROGRESS_STREAM_INTERVAL)
+
+
+class CourseTableStream(EventStream):
+    """ pushes changed cells of the table of assignments of a course, e.g.
+        GET /api/course/table/stream?course=1&since=<id of the last change the table was rendered after>
+        'cell' events carry 'assignment', 'score', 'status' of its latest submission and 'style' of the cell, a
+        'reload' event ends the stream when assignments are added or removed. ids of events are ids of changes, a
+        reconnecting EventSource sends the last of them in Last-Event-ID and misses nothing. the stream ends after
+        COURSE_TABLE_STREAM_TIMEOUT seconds """
+
+    async def get_params(self, scope):
+        query = parse_qs(scope.get('query_string', b'').decode())
+        headers = dict(scope.get('headers', []))
+        try:
+            course_id = int(query['course'][0])
+            last_id = int(headers.get(b'last-event-id', b'') or query.get('since', ['0'])[0])
+        except (KeyError, ValueError):
+            return 400, b"course and since parameters must be integers"
+        user = await sync_to_async(get_scope_user)(scope)
+        if not await sync_to_async(has_course_table_permission)(user, course_id):
+            return 403, b""
+        return 200, (course_id, last_id)
+
+    async def stream(self, send, params, disconnected):
+        course_id, last_id = params
+        await sync_to_async(start_course_table_stream, thread_sensitive=False)(course_id)
+        deadline = time.monotonic() + settings.COURSE_TABLE_STREAM_TIMEOUT
+        while not disconnected.done() and time.monotonic() < deadline:
+            last_id, cells = await sync_to_async(get_course_table_changes, thread_sensitive=False)(course_id, last_id)
+            if cells is None:
+                await self.send_event(send, 'reload', {}, last_id)
+                break
+            for i, cell in enumerate(cells, start=1):
+                await self.send_event(send, 'cell', cell, last_id if i == len(cells) else None)
+            await asyncio.wait([disconnected], timeout=settings.COURSE_TABLE_STREAM_INTERVAL)
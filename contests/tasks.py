@@ -1,20 +1,31 @@
+import time
+
 import mosspy
 
 from billiard.exceptions import SoftTimeLimitExceeded
+from celery.signals import task_failure, task_postrun, worker_process_shutdown
 
+from django.conf import settings
 from django.contrib.auth.models import User
 
 from contest.celery import app
-from contests.observers import TaskProgressObserver
-from contests.models import Submission
+from contests.observers import TaskProgressObserver, TimingObserver, finish_task_progress
+from contests.models import Rejudge, SimilaritySignature, SourceFingerprint, Submission
+from contests.sandboxes import close_sandbox_pools
+
+
+def add_queue_span(observer, enqueued_at):
+    if enqueued_at is not None:
+        observer.add_span('queue', max(time.time() - enqueued_at, 0.0))
 
 
 @app.task(bind=True, time_limit=2400)
-def evaluate_submission(self, submission_id, user_id, sandbox_type='subprocess'):
+def evaluate_submission(self, submission_id, user_id, sandbox_type='subprocess', enqueued_at=None):
     submission = Submission.objects.get(id=submission_id)
     user = User.objects.get(id=user_id)
 
     observer = TaskProgressObserver(self)
+    add_queue_span(observer, enqueued_at)
     try:
         submission.evaluate(observer, user, sandbox_type)
     except SoftTimeLimitExceeded:
@@ -23,6 +34,13 @@ def evaluate_submission(self, submission_id, user_id, sandbox_type='subprocess')
     return submission.status, submission.get_status_display()
 
 
+@task_postrun.connect(sender=evaluate_submission)
+@task_failure.connect(sender=evaluate_submission)
+def finish_evaluation_progress(task_id=None, **other):
+    """ both are sent after the result is stored, the failure also when the task dies with its worker """
+    finish_task_progress(task_id)
+
+
 @app.task(bind=True, time_limit=600)
 def moss_submission(self, submission_id, to_submission_ids):
     submission = Submission.objects.get(id=submission_id)
@@ -39,3 +57,49 @@ def moss_submission(self, submission_id, to_submission_ids):
 
     submission.moss_report_url = report_url
     submission.save()
+
+
+@app.task(bind=True, time_limit=2400)
+def rejudge_submissions(self, rejudge_id, submission_ids, user_id, sandbox_type='subprocess', enqueued_at=None):
+    rejudge = Rejudge.objects.get(id=rejudge_id)
+    user = User.objects.get(id=user_id)
+
+    observer = TimingObserver()
+    add_queue_span(observer, enqueued_at)  # the wait of the batch goes to its first submission
+    submissions = list(Submission.objects.filter(id__in=submission_ids).select_related('problem'))
+    rejudge.count_processed(len(set(submission_ids)) - len(submissions))  # deleted since the rejudge was created
+    for i, submission in enumerate(submissions):
+        try:
+            rejudge.rejudge(submission, observer, user, sandbox_type)
+        except SoftTimeLimitExceeded:
+            submission.update('TL')
+        except BaseException:
+            rejudge.fail(len(submissions) - i - 1)
+            raise
+
+
+@task_failure.connect(sender=rejudge_submissions)
+def fail_rejudge(args=None, kwargs=None, **other):
+    """ a batch which dies with its worker does not reach the handler in the task """
+    rejudge_id = args[0] if args else kwargs['rejudge_id']
+    Rejudge.objects.filter(id=rejudge_id).exclude(status__in=('D', 'F')).update(status='F')
+
+
+@app.task(bind=True, time_limit=2400)
+def index_submissions(self, course_id=None):
+    """ fingerprints and signatures of submissions sent before the similarity index appeared, a batch per task """
+    submissions = Submission.objects.filter(problem__type='Program', similaritysignature__isnull=True)
+    if course_id is not None:
+        submissions = submissions.filter(problem__contest__course_id=course_id)
+    batch_size = settings.SIMILARITY_INDEX_BATCH_SIZE
+    batch = list(submissions.select_related('problem__contest').prefetch_related('attachment_set')[:batch_size])
+    for submission in batch:
+        SourceFingerprint.objects.create_set(submission)
+        SimilaritySignature.objects.create_signature(submission)
+    if len(batch) == batch_size:
+        index_submissions.delay(course_id)
+
+
+@worker_process_shutdown.connect
+def close_worker_sandbox_pools(**kwargs):
+    close_sandbox_pools()
@@ -16,6 +16,7 @@ STATE_COLORS = {
     'NA': 'warning',
     'TL': 'danger',
     'ML': 'danger',
+    'OL': 'danger',
     'CL': 'danger',
     'FE': 'danger',
     'SF': 'danger',
@@ -222,7 +223,7 @@ def get_assignment_score(assignment, request):
 
 @register.filter()
 def get_assignment_style(assignment):
-    if assignment.latest_submission_status == 'UN' and assignment.latest_submission_date_created > assignment.date_updated:
+    if assignment.has_new_submission:
         return 'info'
     return colorize(assignment.score)
 
@@ -260,20 +261,12 @@ def render_assignment_user_table(context, assignments, credits):
 
 
 @register.inclusion_tag('contests/assignment/assignment_course_table.html', takes_context=True)
-def render_assignment_course_table(context, course, students, assignments):
+def render_assignment_course_table(context, course, students, gradebook):
     table = []
     contests = course.contest_set.all()
-    assignments_num, contests_num = len(assignments), len(contests)
-    i = 0
-    for student in students:
-        row = {'student': student, 'columns': [{'contest': contest, 'assignments': []} for contest in contests]}
-        j = 0
-        while i < assignments_num and assignments[i].user_id == student.user_id:
-            while j < contests_num and contests[j].id != assignments[i].problem.contest_id:
-                j += 1
-            if contests[j].id == assignments[i].problem.contest_id:
-                row['columns'][j]['assignments'].append(assignments[i])
-                i += 1
+    for student, cells in zip(students, gradebook.get_table(contests)):
+        row = {'student': student, 'columns': [{'contest': contest, 'assignments': assignments}
+                                               for contest, assignments in zip(contests, cells)]}
         table.append(row)
     context.update(dict(contests=contests, table=table))
     return context
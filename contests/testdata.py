@@ -0,0 +1,60 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+
+
+class TestDataCache:
+    """ files with the data of tests (e.g. input and output of IO-tests) shared by all worker processes of a host.
+        files of a test live in <model>/<id>/<date_updated>/, the directory of the previous version is removed once
+        a newer one is written. files are read-only, sandboxes get hard links to them """
+
+    def __init__(self, root):
+        self.root = root
+
+    def get_test_dir(self, test):
+        return os.path.join(self.root, test._meta.label_lower, str(test.id))
+
+    def get_version_dir(self, test):
+        return os.path.join(self.get_test_dir(test), str(int(test.date_updated.timestamp() * 1000000)))
+
+    def materialize(self, test, field):
+        path = os.path.join(self.get_version_dir(test), field)
+        if os.path.exists(path):
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix='.tmp-', dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(getattr(test, field).encode())
+        os.chmod(tmp, 0o444)
+        os.rename(tmp, path)
+        self.remove_old_versions(test)
+        return path
+
+    def remove_old_versions(self, test):
+        version = int(os.path.basename(self.get_version_dir(test)))
+        for entry in os.scandir(self.get_test_dir(test)):
+            if entry.is_dir() and entry.name.isdigit() and int(entry.name) < version:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def link(self, test, field, sandbox, name):
+        """ hard-links the data of the test into the sandbox, creates a copy if that fails """
+        target = sandbox.path(name)
+        try:
+            source = self.materialize(test, field)
+        except OSError:
+            return sandbox.create(name, getattr(test, field))
+        try:
+            if os.path.lexists(target):
+                os.remove(target)
+            os.link(source, target)
+            return target
+        except OSError:  # on another device, or a newer version has removed the source meanwhile
+            return sandbox.create(name, getattr(test, field))
+
+
+def get_test_data_cache():
+    if not settings.JUDGE_TEST_DATA_CACHE_DIR:
+        return None
+    return TestDataCache(settings.JUDGE_TEST_DATA_CACHE_DIR)
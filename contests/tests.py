@@ -1,11 +1,51 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import uuid
+from contextlib import closing
+from io import StringIO
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from celery.signals import task_failure
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 
 from accounts.models import Account, Faculty
-from contests.models import (Assignment, Contest, Course, Credit, FNTest, IOTest, Problem, Submission,
-                             SubmissionPattern, UTTest)
+from contest.celery import app as celery_app
+from contest.sandbox import ForkServerSandbox, OutputBuffer, capture
+from contest.utils import Status, diff, diff_stream, get_sandbox_class, map_file
+from contests.builds import BuildSet, get_includable_files
+from contests.checkers import get_checker, parse_checker_args, validate_checker, validate_checker_args
+from contests.compilation import CompileCache, cached_compile
+from contests.executors import reset_executor, run_in_parallel, submit_test
+from contests.forms import IOTestForm
+from contests.gradebook import get_gradebook
+from contests.management.commands.judge_benchmark import generate_output
+from contests.models import (Assignment, Attachment, Contest, Course, CourseTableChange, Credit, Execution, FNTest,
+                             IOTest, Problem, Rejudge, SimilaritySignature, SourceFingerprint, StudentStatistics,
+                             Submission, SubmissionPattern, TimingSpan, UTTest)
+from contests.observers import (Observer, TaskProgressObserver, TimingObserver, finish_task_progress,
+                                get_task_progress, set_task_progress)
+from contests.outputs import truncate_output
+from contests.results import TaskProgress
+from contests.routing import INTERACTIVE, REEVALUATE, REJUDGE, enqueue, get_queue_name, get_queue_names
+from contests.sandboxes import SandboxPool, close_sandbox_pools, get_sandbox_pool
+from contests.similarity import SignatureIndex, get_minhash, tokenize, winnow
+from contests.streams import (COURSE_TABLE_STREAM_PATH, SUBMISSION_PROGRESS_STREAM_PATH, CourseTableStream,
+                              SubmissionProgressStream)
+from contests.tasks import evaluate_submission, index_submissions, rejudge_submissions
+from contests.testdata import TestDataCache
 
 """===================================================== Course ====================================================="""
 
@@ -1176,3 +1216,1651 @@ class SubmissionViewsTest(TestCase):
         self.client.login(username=self.admin, password=self.admin)
         resp = self.client.get(reverse('contests:submission-list'))
         self.assertEqual(resp.status_code, 200)
+
+
+"""===================================================== Judge ======================================================"""
+
+
+class FakeSandbox:
+    compilations = []
+    executions = []
+
+    def __init__(self, workdir):
+        self.workdir = workdir
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def path(self, name):
+        return name
+
+    def fetch(self, files):
+        return list(files)
+
+    def create(self, name, content):
+        return name
+
+    def compile(self, sources, executable, language, args, timeout, stats):
+        self.compilations.append((tuple(sources), language, tuple(args)))
+        stats['compilation_time'] = 0.5
+        return Status.OK
+
+    def execute(self, executable, args, timeout, stats):
+        self.executions.append(executable)
+        stats['execution_returncode'] = 0
+        return Status.OK
+
+    def read(self, path):
+        return "42\n"
+
+
+@mock.patch('contests.sandboxes.get_sandbox_class', lambda based_on='': FakeSandbox)
+class JudgeTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        faculty = Faculty.objects.create(name="Test Fac")
+        admin = User.objects.create_superuser('admin', 'admin@localhost', 'admin')
+        Account.objects.create(user=admin, faculty=faculty)
+        course = Course.objects.create(owner=admin, faculty=faculty, title_official="Test Course", level=1)
+        contest = Contest.objects.create(owner=admin, course=course, title="Test Contest")
+        cls.problem = Problem.objects.create(owner=admin, contest=contest, title="Test Problem", type='Program')
+        for i in range(3):
+            IOTest.objects.create(owner=admin, problem=cls.problem, title="Test %s" % i, input=str(i), output="42")
+        IOTest.objects.create(owner=admin, problem=cls.problem, title="Test -O2", compile_args="-O2", output="42")
+        cls.submission = Submission.objects.create(owner=admin, problem=cls.problem)
+        Attachment.objects.create(owner=admin, object=cls.submission, file='main.cpp')
+
+    def setUp(self):
+        FakeSandbox.compilations = []
+        FakeSandbox.executions = []
+
+    def test_run_tests_compiles_once_per_distinct_build(self):
+        state = self.problem.run_tests(self.submission, Observer(), None, 'subprocess')
+        self.assertEqual(state, Status.OK)
+        self.assertEqual(len(FakeSandbox.compilations), 2)
+        self.assertEqual(self.submission.execution_set.count(), 4)
+        self.assertTrue(all(execution.compilation_time == 0.5 for execution in self.submission.execution_set.all()))
+
+    def test_run_tests_with_checker_of_test(self):
+        self.problem.checker, self.problem.checker_args = 'exact', ''
+        self.problem.save()
+        self.assertEqual(self.problem.run_tests(self.submission, Observer(), None, 'subprocess'), Status.WA)
+        self.problem.iotest_set.update(checker='tokens')
+        self.assertEqual(self.problem.run_tests(self.submission, Observer(), None, 'subprocess'), Status.OK)
+
+    @override_settings(JUDGE_WORKERS=2)
+    def test_run_tests_in_parallel(self):
+        state = self.problem.run_tests(self.submission, Observer(), None, 'subprocess')
+        self.assertEqual(state, Status.OK)
+        self.assertEqual(len(FakeSandbox.compilations), 2)
+        self.assertEqual(self.submission.execution_set.count(), 4)
+
+    @override_settings(JUDGE_WORKERS=2)
+    def test_run_tests_in_parallel_stops_at_first_failure(self):
+        failed_test = self.problem.iotest_set.all()[1]
+        failed_test.output = "0"
+        failed_test.save()
+        state = self.problem.run_tests(self.submission, Observer(), None, 'subprocess')
+        self.assertEqual(state, Status.WA)
+        self.assertEqual(list(self.submission.execution_set.order_by('id').values_list('test_id', flat=True)),
+                         list(self.problem.iotest_set.values_list('id', flat=True)[:2]))
+
+    @override_settings(JUDGE_WORKERS=1)
+    def test_run_in_parallel_submits_tests_in_a_window(self):
+        tests = self.problem.get_tests()
+        with BuildSet(self.submission, Observer(), 'subprocess') as builds, \
+                mock.patch('contests.executors.submit_test', wraps=submit_test) as submit:
+            with closing(run_in_parallel(tests, self.submission, Observer(), self.problem, builds)) as runs:
+                self.assertEqual(next(runs)[0], Status.OK)
+        self.assertEqual(submit.call_count, 2)
+
+
+class DirectorySandbox:
+    compilations = 0
+
+    def __init__(self, workdir):
+        self.workdir = workdir
+
+    def path(self, name):
+        return os.path.join(self.workdir, name)
+
+    def fetch(self, files):
+        return [shutil.copy(file, self.workdir) for file in files]
+
+    def compile(self, sources, executable, language, args, timeout, stats):
+        DirectorySandbox.compilations += 1
+        content = ''.join(open(source).read() for source in sources)
+        if 'error' in content:
+            stats['compilation_stderr'] = 'error'
+            return Status.CE
+        with open(executable, 'w') as f:
+            f.write(content)
+        return Status.OK
+
+
+class CompileCacheTest(TestCase):
+    def setUp(self):
+        DirectorySandbox.compilations = 0
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.cache_dir = os.path.join(self.tmp, 'cache')
+        self.override = override_settings(JUDGE_COMPILE_CACHE_DIR=self.cache_dir, JUDGE_COMPILE_CACHE_SIZE=1024)
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+
+    def make_sandbox(self, *contents):
+        workdir = tempfile.mkdtemp(dir=self.tmp)
+        sources = []
+        for i, content in enumerate(contents):
+            sources.append(os.path.join(workdir, 'main%s.cpp' % i))
+            with open(sources[-1], 'w') as f:
+                f.write(content)
+        return DirectorySandbox(workdir), sources
+
+    def test_identical_sources_are_compiled_once(self):
+        for _ in range(2):
+            sandbox, sources = self.make_sandbox("int main() {}")
+            state, exe, _ = cached_compile(sandbox, sources, 'exe', 'C++', ['-O2'], 1)
+            self.assertEqual(state, Status.OK)
+            self.assertTrue(exe.startswith(sandbox.workdir))
+            self.assertEqual(open(exe).read(), "int main() {}")
+        self.assertEqual(DirectorySandbox.compilations, 1)
+
+    def test_compile_args_are_part_of_key(self):
+        for args in (['-O2'], ['-O0']):
+            sandbox, sources = self.make_sandbox("int main() {}")
+            cached_compile(sandbox, sources, 'exe', 'C++', args, 1)
+        self.assertEqual(DirectorySandbox.compilations, 2)
+
+    def test_compilation_errors_are_cached(self):
+        for _ in range(2):
+            sandbox, sources = self.make_sandbox("error")
+            state, _, stats = cached_compile(sandbox, sources, 'exe', 'C++', [], 1)
+            self.assertEqual(state, Status.CE)
+            self.assertEqual(stats['compilation_stderr'], 'error')
+        self.assertEqual(DirectorySandbox.compilations, 1)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        for content in ("a" * 400, "b" * 400, "c" * 400):
+            sandbox, sources = self.make_sandbox(content)
+            cached_compile(sandbox, sources, 'exe', 'C++', [], 1)
+        sandbox, sources = self.make_sandbox("a" * 400)
+        cached_compile(sandbox, sources, 'exe', 'C++', [], 1)
+        self.assertEqual(DirectorySandbox.compilations, 4)
+        sandbox, sources = self.make_sandbox("c" * 400)
+        cached_compile(sandbox, sources, 'exe', 'C++', [], 1)
+        self.assertEqual(DirectorySandbox.compilations, 4)
+
+    def test_entries_are_scanned_only_when_the_cache_outgrows_its_size(self):
+        with mock.patch.object(CompileCache, 'evict', autospec=True, side_effect=CompileCache.evict) as evict:
+            for content in ("a" * 400, "b" * 400, "c" * 400):
+                sandbox, sources = self.make_sandbox(content)
+                cached_compile(sandbox, sources, 'exe', 'C++', [], 1)
+        self.assertEqual(evict.call_count, 2)  # the first store starts tracking the size, the third outgrows it
+
+    def test_test_files_are_compiled_to_cached_objects(self):
+        for _ in range(2):
+            sandbox, (source,) = self.make_sandbox("TEST(a) {}")
+            obj = BuildSet.compile_object(sandbox, source, [source], 'C++', [], 1)
+            self.assertEqual(obj, os.path.join(sandbox.workdir, 'main0.cpp.o'))
+            self.assertEqual(BuildSet.compile_object(sandbox, sandbox.path('test.h'), [source], 'C++', [], 1),
+                             sandbox.path('test.h'))
+        self.assertEqual(DirectorySandbox.compilations, 1)
+
+    def test_objects_of_test_files_depend_on_includable_files(self):
+        for header, solution in (("int f();", "int f() { return 1; }"), ("int f();", "int f() { return 2; }"),
+                                 ("long f();", "int f() { return 1; }")):
+            sandbox, (source, solution) = self.make_sandbox('#include "solution.h"\nTEST(a) {}', solution)
+            with open(sandbox.path('solution.h'), 'w') as f:
+                f.write(header)
+            BuildSet.compile_object(sandbox, source, [source, solution, sandbox.path('solution.h')], 'C++', [], 1)
+        self.assertEqual(DirectorySandbox.compilations, 2)  # other translation units are not included
+
+    def test_included_translation_units(self):
+        sandbox, (source, solution, other) = self.make_sandbox('#include "main1.cpp"', "int f();", "int g();")
+        self.assertEqual(get_includable_files(source, [source, solution, other]), [solution])
+
+
+class DiffStreamTest(TestCase):
+    cases = [
+        ("1 2 3", "1 2 3"), ("1 2 3", "1 2 4"), ("1 2", "1 2 3"), ("01 2", "1 2"), ("1.000001", "1.0"),
+        ("1.1", "1.0"), ("nan", "nan"), ("abc", "abd"), ("1\n2\n", "1 2"), ("1\r\n2", "1\n2\n"),
+        ("привет мир", "привет мир"), ("1\x1c2", "1 2"), ("1.50", "1.5"), ("", ""), ("\n\n", ""),
+    ]
+
+    def test_diff_stream_agrees_with_diff(self):
+        for output, correct in self.cases:
+            for precision, check_format in ((None, False), (None, True), (1e-2, False), (1e-2, True)):
+                expected = diff(output, correct, precision, check_format)
+                self.assertEqual(diff_stream(output, correct, precision, check_format), expected)
+                self.assertEqual(diff_stream(output.encode(), correct.encode(), precision, check_format), expected)
+
+    def test_diff_stream_of_mapped_file(self):
+        with tempfile.NamedTemporaryFile('wb') as f:
+            f.write(b"1 2\n3\n")
+            f.flush()
+            with map_file(f.name) as output:
+                self.assertFalse(diff_stream(output, b"1\n2\n3", check_format=False))
+                self.assertTrue(diff_stream(output, b"1\n2\n3", check_format=True))
+        with map_file(f.name) as output:
+            self.assertIsNone(output)
+
+    def test_diff_stream_of_invalid_utf8(self):
+        with self.assertRaises(UnicodeDecodeError):
+            diff_stream(b"\xff", b"1")
+
+
+class CheckerTest(TestCase):
+    def test_exact(self):
+        self.assertFalse(get_checker('exact')(b"1 2\n", b"1 2\n"))
+        self.assertTrue(get_checker('exact')(b"1 2", b"1 2\n"))
+
+    def test_tokens(self):
+        self.assertFalse(get_checker('tokens')(b"1  2\n", b"1 2"))
+        self.assertTrue(get_checker('tokens')(b"01 2", b"1 2"))
+
+    def test_float(self):
+        check = get_checker('float')
+        self.assertFalse(check(b"1.000001 2\n3", b"1 2 3"))
+        self.assertTrue(check(b"1.1 2 3", b"1 2 3"))
+        self.assertFalse(check(b"1.1 2 3", b"1 2 3", **parse_checker_args("atol=0.2")))
+        self.assertFalse(check(b"1001", b"1000", **parse_checker_args("atol=0 rtol=1e-3")))
+        self.assertTrue(check(b"1 2", b"1 2 3"))
+        self.assertTrue(check(b"1 x", b"1 2"))
+        self.assertFalse(check(b"nan inf", b"nan inf"))
+        self.assertFalse(check(b" \n", b""))
+        self.assertTrue(check(b"1-2", b"1 -2"))
+        self.assertFalse(check(b"1_000\t2", b"1000 2"))
+
+    def test_checker_args(self):
+        self.assertEqual(parse_checker_args(" atol=1e-6  rtol=0 "), {'atol': '1e-6', 'rtol': '0'})
+        with self.assertRaises(ValidationError):
+            validate_checker_args("atol")
+        validate_checker('default', "precision=1e-6 check_format=1")
+        validate_checker('float', "atol=1 rtol=0")
+        for name, checker_args in (('default', "atol=1"), ('default', "precision=abc"), ('default', "check_format=yes"),
+                                   ('exact', "atol=1"), ('float', "atol=")):
+            with self.subTest(checker=name, checker_args=checker_args), self.assertRaises(ValidationError):
+                validate_checker(name, checker_args)
+
+    def test_checker_args_of_iotest_form(self):
+        problem = Problem(checker='float')
+        form = IOTestForm({'title': "Test", 'checker': '', 'checker_args': "precision=1e-6"}, problem=problem)
+        self.assertIn('checker_args', form.errors)
+        form = IOTestForm({'title': "Test", 'checker': 'default', 'checker_args': "precision=1e-6"}, problem=problem)
+        self.assertNotIn('checker_args', form.errors)
+
+
+class RejudgeTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        faculty = Faculty.objects.create(name="Test Fac")
+        cls.admin = User.objects.create_superuser('admin', 'admin@localhost', 'admin')
+        Account.objects.create(user=cls.admin, faculty=faculty)
+        course = Course.objects.create(owner=cls.admin, faculty=faculty, title_official="Test Course", level=1)
+        contest = Contest.objects.create(owner=cls.admin, course=course, title="Test Contest")
+        cls.problem = Problem.objects.create(owner=cls.admin, contest=contest, title="Test Problem", type='Program')
+        for i in range(2):
+            IOTest.objects.create(owner=cls.admin, problem=cls.problem, title="Test %s" % i, output="42")
+        cls.submission = Submission.objects.create(owner=cls.admin, problem=cls.problem)
+        Attachment.objects.create(owner=cls.admin, object=cls.submission, file='main.cpp')
+
+    def setUp(self):
+        patcher = mock.patch('contests.sandboxes.get_sandbox_class', lambda based_on='': FakeSandbox)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.submission.evaluate(Observer(), self.admin, 'subprocess')
+        FakeSandbox.executions = []
+        self.rejudge = Rejudge.objects.create(owner=self.admin, problem=self.problem, total=1)
+
+    def test_unchanged_tests_do_not_affect_submissions(self):
+        self.assertFalse(Submission.objects.to_rejudge(self.problem).exists())
+
+    def test_solved_submission_runs_only_new_tests(self):
+        IOTest.objects.create(owner=self.admin, problem=self.problem, title="Test new", output="42")
+        self.assertQuerysetEqual(Submission.objects.to_rejudge(self.problem), [self.submission])
+        self.rejudge.rejudge(self.submission, Observer(), self.admin, 'subprocess')
+        self.assertEqual(len(FakeSandbox.executions), 1)
+        self.assertEqual(self.submission.execution_set.count(), 3)
+        self.assertEqual(self.submission.status, 'OK')
+        self.rejudge.refresh_from_db()
+        self.assertEqual((self.rejudge.processed, self.rejudge.status), (1, 'D'))
+
+    def test_solved_submission_fails_changed_test(self):
+        self.problem.iotest_set.filter(title="Test 1").update(output="0", date_updated=timezone.now())
+        self.rejudge.rejudge(self.submission, Observer(), self.admin, 'subprocess')
+        self.assertEqual(len(FakeSandbox.executions), 1)
+        self.assertEqual(self.submission.status, 'WA')
+        self.assertEqual(self.submission.execution_set.count(), 2)
+
+    def test_unsolved_submission_is_evaluated_from_scratch(self):
+        self.submission.update('WA')
+        IOTest.objects.create(owner=self.admin, problem=self.problem, title="Test new", output="42")
+        self.rejudge.rejudge(self.submission, Observer(), self.admin, 'subprocess')
+        self.assertEqual(len(FakeSandbox.executions), 3)
+        self.assertEqual(self.submission.status, 'OK')
+
+    def test_unsolved_submission_is_affected_by_deleted_test(self):
+        self.submission.update('WA')
+        self.problem.iotest_set.filter(title="Test 1").delete()
+        self.assertQuerysetEqual(Submission.objects.to_rejudge(self.problem), [self.submission])
+
+    def test_batch_counts_deleted_submissions(self):
+        self.rejudge.total = 2
+        self.rejudge.save()
+        rejudge_submissions(self.rejudge.id, [self.submission.id, 0], self.admin.id)
+        self.rejudge.refresh_from_db()
+        self.assertEqual((self.rejudge.processed, self.rejudge.status), (2, 'D'))
+
+    def test_failed_batch_fails_rejudge(self):
+        other = Submission.objects.create(owner=self.admin, problem=self.problem, status='WA')
+        self.submission.update('WA')
+        self.rejudge.total = 3
+        self.rejudge.save()
+        with mock.patch.object(Submission, 'evaluate', side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            rejudge_submissions(self.rejudge.id, [self.submission.id, other.id, 0], self.admin.id)
+        self.rejudge.refresh_from_db()
+        self.assertEqual((self.rejudge.processed, self.rejudge.status), (3, 'F'))
+        self.rejudge.count_processed()
+        self.rejudge.refresh_from_db()
+        self.assertEqual(self.rejudge.status, 'F')
+
+    def test_lost_batch_fails_rejudge(self):
+        task_failure.send(sender=rejudge_submissions, args=[self.rejudge.id, [self.submission.id], self.admin.id],
+                          kwargs={})
+        self.rejudge.refresh_from_db()
+        self.assertTrue(self.rejudge.is_failed)
+        self.client.login(username='admin', password='admin')
+        response = self.client.get(reverse('contests:api-rejudge-get-progress', kwargs={'pk': self.rejudge.id}))
+        self.assertEqual((response.json()['complete'], response.json()['failed']), (True, True))
+
+    @mock.patch('contests.views.rejudge_submissions.apply_async')
+    def test_rejudge_create_and_progress(self, apply_async):
+        IOTest.objects.create(owner=self.admin, problem=self.problem, title="Test new", output="42")
+        self.client.login(username='admin', password='admin')
+        response = self.client.post(reverse('contests:rejudge-create', kwargs={'problem_id': self.problem.id}))
+        rejudge = Rejudge.objects.latest('date_created')
+        self.assertRedirects(response, reverse('contests:rejudge-detail', kwargs={'pk': rejudge.id}))
+        self.assertEqual(rejudge.total, 1)
+        apply_async.assert_called_once()
+        self.assertEqual(apply_async.call_args[0][0], (rejudge.id, [self.submission.id], self.admin.id))
+        self.assertEqual(apply_async.call_args[1]['queue'], get_queue_name(REJUDGE, self.problem.course.id))
+        response = self.client.get(reverse('contests:api-rejudge-get-progress', kwargs={'pk': rejudge.id}))
+        self.assertEqual(response.json()['progress'], 0)
+
+
+class RoutingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        faculty = Faculty.objects.create(name="Test Fac")
+        cls.admin = User.objects.create_superuser('admin', 'admin@localhost', 'admin')
+        Account.objects.create(user=cls.admin, faculty=faculty)
+        cls.student = User.objects.create_user('student', 'student@localhost', 'student')
+        Account.objects.create(user=cls.student, faculty=faculty)
+        cls.courses = [Course.objects.create(owner=cls.admin, faculty=faculty, title_official="Test Course %s" % i,
+                                             level=1) for i in range(2)]
+        cls.submissions = []
+        for course in cls.courses:
+            contest = Contest.objects.create(owner=cls.admin, course=course, title="Test Contest")
+            problem = Problem.objects.create(owner=cls.admin, contest=contest, title="Test Problem", type='Program')
+            cls.submissions.append(Submission.objects.create(owner=cls.student, problem=problem))
+
+    def get_queued_tasks(self, queue_name):
+        tasks = []
+        with celery_app.connection_for_read() as connection:
+            with connection.SimpleQueue(queue_name, no_ack=True) as queue:
+                while True:
+                    try:
+                        message = queue.get(block=False)
+                    except queue.Empty:
+                        return tasks
+                    tasks.append((message.headers['task'], message.decode()[0]))
+
+    @override_settings(JUDGE_QUEUE_SHARDS=2)
+    def test_queue_names(self):
+        self.assertEqual(get_queue_name(INTERACTIVE, 3), 'judge.interactive.1')
+        self.assertEqual(get_queue_names(REJUDGE), ['judge.rejudge.0', 'judge.rejudge.1'])
+        self.assertEqual(len(get_queue_names()), 6)
+        with self.assertRaises(ValueError):
+            get_queue_name('unknown', 1)
+
+    @override_settings(JUDGE_QUEUE_SHARDS=2)
+    def test_evaluations_are_routed_by_kind_and_course(self):
+        first, second = self.submissions
+        self.client.login(username='student', password='student')
+        self.client.get(reverse('contests:api-submission-evaluate', kwargs={'pk': first.id}))
+        self.client.login(username='admin', password='admin')
+        self.client.get(reverse('contests:api-submission-evaluate', kwargs={'pk': second.id}))
+        interactive_queue = get_queue_name(INTERACTIVE, first.course.id)
+        reevaluate_queue = get_queue_name(REEVALUATE, second.course.id)
+        self.assertNotEqual(interactive_queue.rsplit('.', 1)[1], reevaluate_queue.rsplit('.', 1)[1])
+        self.assertEqual(self.get_queued_tasks(interactive_queue),
+                         [('contests.tasks.evaluate_submission', [first.id, self.student.id])])
+        self.assertEqual(self.get_queued_tasks(reevaluate_queue),
+                         [('contests.tasks.evaluate_submission', [second.id, self.admin.id])])
+
+
+class ResettableSandbox(FakeSandbox):
+    created, resets, exits = 0, 0, 0
+
+    def __init__(self, workdir):
+        super().__init__(workdir)
+        ResettableSandbox.created += 1
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        ResettableSandbox.exits += 1
+
+    def reset(self, workdir):
+        ResettableSandbox.resets += 1
+        self.workdir = workdir
+
+
+class SandboxPoolTest(TestCase):
+    def setUp(self):
+        ResettableSandbox.created, ResettableSandbox.resets, ResettableSandbox.exits = 0, 0, 0
+
+    def test_sandboxes_are_reused(self):
+        pool = SandboxPool(ResettableSandbox, 1)
+        for workdir in ('a', 'b', 'c'):
+            with pool.acquire(workdir) as sandbox:
+                self.assertEqual(sandbox.workdir, workdir)
+        self.assertEqual((ResettableSandbox.created, ResettableSandbox.resets, ResettableSandbox.exits), (1, 2, 0))
+        pool.close()
+        self.assertEqual(ResettableSandbox.exits, 1)
+
+    def test_pool_is_bounded(self):
+        pool = SandboxPool(ResettableSandbox, 1)
+        with pool.acquire('a'), pool.acquire('b'):
+            pass
+        self.assertEqual((ResettableSandbox.created, ResettableSandbox.exits), (2, 1))
+        self.assertEqual(len(pool.idle), 1)
+
+    def test_failed_sandboxes_are_discarded(self):
+        pool = SandboxPool(ResettableSandbox, 1)
+        with self.assertRaises(RuntimeError):
+            with pool.acquire('a'):
+                raise RuntimeError
+        self.assertEqual((len(pool.idle), ResettableSandbox.exits), (0, 1))
+
+    def test_sandboxes_without_reset_are_not_pooled(self):
+        pool = SandboxPool(FakeSandbox, 1)
+        with pool.acquire('a'):
+            pass
+        self.assertFalse(pool.idle)
+
+    @override_settings(JUDGE_SANDBOX_POOL_SIZE=2)
+    def test_pools_are_process_local(self):
+        pool = get_sandbox_pool(ResettableSandbox)
+        self.assertIs(get_sandbox_pool(ResettableSandbox), pool)
+        with mock.patch('os.getpid', return_value=-1):
+            self.assertIsNot(get_sandbox_pool(ResettableSandbox), pool)
+        close_sandbox_pools()
+
+
+class TestDataCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        faculty = Faculty.objects.create(name="Test Fac")
+        admin = User.objects.create_superuser('admin', 'admin@localhost', 'admin')
+        course = Course.objects.create(owner=admin, faculty=faculty, title_official="Test Course", level=1)
+        contest = Contest.objects.create(owner=admin, course=course, title="Test Contest")
+        cls.problem = Problem.objects.create(owner=admin, contest=contest, title="Test Problem", type='Program')
+        IOTest.objects.create(owner=admin, problem=cls.problem, title="Test", input="1 2", output="3")
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.cache = TestDataCache(os.path.join(self.tmp, 'cache'))
+
+    def test_get_tests_defers_test_data(self):
+        test, = self.problem.get_tests()
+        self.assertEqual(test.get_deferred_fields(), {'input', 'output'})
+
+    def test_materialize_by_version(self):
+        test, = self.problem.get_tests()
+        path = self.cache.materialize(test, 'input')
+        with open(path) as f:
+            self.assertEqual(f.read(), "1 2")
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o444)
+        test.input = "2 3"
+        test.save()
+        new_path = self.cache.materialize(test, 'input')
+        self.assertNotEqual(path, new_path)
+        self.assertFalse(os.path.exists(path))
+        with open(new_path) as f:
+            self.assertEqual(f.read(), "2 3")
+
+    def test_link_into_sandbox(self):
+        test, = self.problem.get_tests()
+        sandbox = DirectorySandbox(tempfile.mkdtemp(dir=self.tmp))
+        path = self.cache.link(test, 'input', sandbox, 'input.txt')
+        self.assertEqual(path, sandbox.path('input.txt'))
+        self.assertTrue(os.path.samefile(path, self.cache.materialize(test, 'input')))
+
+    def test_link_creates_copy_when_version_is_removed(self):
+        test, = self.problem.get_tests()
+        sandbox = DirectorySandbox(tempfile.mkdtemp(dir=self.tmp))
+        materialize = self.cache.materialize
+
+        def materialize_removed(test, field):
+            path = materialize(test, field)
+            shutil.rmtree(os.path.dirname(path))  # by a worker which has written a newer version
+            return path
+
+        sandbox.create = mock.Mock()
+        with mock.patch.object(self.cache, 'materialize', materialize_removed):
+            self.cache.link(test, 'input', sandbox, 'input.txt')
+        sandbox.create.assert_called_once_with('input.txt', "1 2")
+
+    def test_prepare_without_cache_loads_test_data(self):
+        test, = self.problem.get_tests()
+        test.prepare()
+        self.assertFalse(test.get_deferred_fields())
+
+
+class MemoizationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        faculty = Faculty.objects.create(name="Test Fac")
+        cls.admin = User.objects.create_superuser('admin', 'admin@localhost', 'admin')
+        Account.objects.create(user=cls.admin, faculty=faculty)
+        course = Course.objects.create(owner=cls.admin, faculty=faculty, title_official="Test Course", level=1)
+        contest = Contest.objects.create(owner=cls.admin, course=course, title="Test Contest")
+        cls.problem = Problem.objects.create(owner=cls.admin, contest=contest, title="Test Problem", type='Program')
+        for i in range(2):
+            IOTest.objects.create(owner=cls.admin, problem=cls.problem, title="Test %s" % i, output="42")
+
+    def setUp(self):
+        patcher = mock.patch('contests.sandboxes.get_sandbox_class', lambda based_on='': FakeSandbox)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        settings_override = override_settings(MEDIA_ROOT=self.tmp)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        FakeSandbox.compilations = []
+        FakeSandbox.executions = []
+
+    def submit(self, content):
+        submission = Submission.objects.create(owner=self.admin, problem=self.problem)
+        os.makedirs(os.path.join(self.tmp, str(submission.id)))
+        with open(os.path.join(self.tmp, str(submission.id), 'main.cpp'), 'w') as f:
+            f.write(content)
+        Attachment.objects.create(owner=self.admin, object=submission,
+                                  file=os.path.join(str(submission.id), 'main.cpp'))
+        submission.evaluate(Observer(), self.admin, 'subprocess')
+        return submission
+
+    def test_identical_submission_reuses_results(self):
+        first = self.submit("int main() {}")
+        second = self.submit("int main() {}")
+        self.assertEqual(first.fingerprint, second.fingerprint)
+        self.assertEqual(len(FakeSandbox.compilations), 1)
+        self.assertEqual(second.status, first.status)
+        self.assertEqual(list(second.execution_set.values_list('test_id', 'test_is_passed')),
+                         list(first.execution_set.values_list('test_id', 'test_is_passed')))
+
+    def test_different_submission_is_evaluated(self):
+        self.submit("int main() {}")
+        self.submit("int main() { return 0; }")
+        self.assertEqual(len(FakeSandbox.compilations), 2)
+
+    def test_changed_tests_invalidate_results(self):
+        first = self.submit("int main() {}")
+        self.problem.iotest_set.filter(title="Test 1").update(output="0", date_updated=timezone.now())
+        second = self.submit("int main() {}")
+        self.assertNotEqual(first.tests_fingerprint, second.tests_fingerprint)
+        self.assertEqual(len(FakeSandbox.compilations), 2)
+        self.assertEqual(second.status, 'WA')
+
+
+@override_settings(JUDGE_OUTPUT_HEAD_SIZE=100, JUDGE_OUTPUT_TAIL_SIZE=100, JUDGE_OUTPUT_PREVIEW_SIZE=20)
+class OutputStoreTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        faculty = Faculty.objects.create(name="Test Fac")
+        admin = User.objects.create_superuser('admin', 'admin@localhost', 'admin')
+        Account.objects.create(user=admin, faculty=faculty)
+        student = User.objects.create_user('student', 'student@localhost', 'student')
+        Account.students.create(user=student, faculty=faculty)
+        course = Course.objects.create(owner=admin, faculty=faculty, title_official="Test Course", level=1)
+        contest = Contest.objects.create(owner=admin, course=course, title="Test Contest")
+        problem = Problem.objects.create(owner=admin, contest=contest, title="Test Problem", type='Program')
+        cls.test = IOTest.objects.create(owner=admin, problem=problem, title="Test", output="42")
+        cls.submission = Submission.objects.create(owner=student, problem=problem)
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        settings_override = override_settings(JUDGE_OUTPUT_STORE_DIR=self.tmp)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def create_execution(self, **stats):
+        Execution.objects.create_set(self.submission, [(self.test, stats)])
+        return self.submission.execution_set.get()
+
+    def get_output_url(self, execution, field):
+        return reverse('contests:submission-execution-output', kwargs={'pk': self.submission.id,
+                                                                       'execution_id': execution.id, 'field': field})
+
+    def test_truncate_output(self):
+        self.assertEqual(truncate_output("abc", 2, 1), "abc")
+        self.assertEqual(truncate_output("abcdef", 2, 1), "ab\n... пропущено символов: 3 ...\nf")
+
+    def test_short_output_stays_in_row(self):
+        execution = self.create_execution(test_output="42")
+        self.assertEqual(execution.test_output, "42")
+        self.assertEqual(execution.output_refs, {})
+
+    def test_long_output_is_capped_and_stored(self):
+        output = "x" * 150 + "y" * 150
+        execution = self.create_execution(test_output=output)
+        self.assertIn('test_output', execution.output_refs)
+        self.assertLess(len(execution.test_output), 100)
+        full_output = execution.get_output('test_output')
+        self.assertEqual(full_output, truncate_output(output, 100, 100))
+        self.assertTrue(full_output.startswith("x" * 100) and full_output.endswith("y" * 100))
+
+    @override_settings(JUDGE_OUTPUT_STORE_DIR='')
+    def test_long_output_without_store_is_capped(self):
+        execution = self.create_execution(test_output="x" * 300)
+        self.assertEqual(execution.output_refs, {})
+        self.assertEqual(execution.test_output, truncate_output("x" * 300, 100, 100))
+
+    def test_full_output_view(self):
+        execution = self.create_execution(test_output="x" * 300, execution_stdout="y" * 300)
+        self.client.login(username='student', password='student')
+        response = self.client.get(self.get_output_url(execution, 'test_output'))
+        self.assertEqual(response.content.decode(), execution.get_output('test_output'))
+        self.assertEqual(self.client.get(self.get_output_url(execution, 'execution_stdout')).status_code, 404)
+        self.assertEqual(self.client.get(self.get_output_url(execution, 'exception')).status_code, 404)
+        self.client.login(username='admin', password='admin')
+        response = self.client.get(self.get_output_url(execution, 'execution_stdout'))
+        self.assertEqual(response.content.decode(), execution.get_output('execution_stdout'))
+
+    def test_full_stderr_of_passed_test_is_staff_only(self):
+        execution = self.create_execution(execution_stderr="x" * 300)
+        self.client.login(username='student', password='student')
+        response = self.client.get(self.get_output_url(execution, 'execution_stderr'))
+        self.assertEqual(response.content.decode(), execution.get_output('execution_stderr'))
+        Execution.objects.filter(id=execution.id).update(test_is_passed=True)
+        self.assertEqual(self.client.get(self.get_output_url(execution, 'execution_stderr')).status_code, 404)
+        self.client.login(username='admin', password='admin')
+        self.assertEqual(self.client.get(self.get_output_url(execution, 'execution_stderr')).status_code, 200)
+
+    def test_full_output_links(self):
+        execution = self.create_execution(test_output="x" * 300, execution_stdout="y" * 300)
+        url = reverse('contests:submission-detail', kwargs={'pk': self.submission.id})
+        self.client.login(username='student', password='student')
+        response = self.client.get(url)
+        self.assertContains(response, self.get_output_url(execution, 'test_output'))
+        self.assertNotContains(response, self.get_output_url(execution, 'execution_stdout'))
+        self.client.login(username='admin', password='admin')
+        self.assertContains(self.client.get(url), self.get_output_url(execution, 'execution_stdout'))
+
+
+class FloodingSandbox(DirectorySandbox):
+    def create(self, name, content):
+        with open(self.path(name), 'w') as f:
+            f.write(content)
+        return self.path(name)
+
+    def execute(self, executable, args, timeout, stats):
+        with open(args[1], 'w') as f:
+            f.write("x" * 1000)
+        return Status.OK
+
+
+class OutputCaptureTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def run_python(self, code, **kwargs):
+        process = subprocess.Popen([sys.executable, '-c', code], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return capture(process, 4, 4, **kwargs)
+
+    def test_output_buffer(self):
+        buffer = OutputBuffer(3, 4)
+        for chunk in (b"ab", b"cde", b"f", b"ghijk", b"lm"):
+            buffer.write(chunk)
+        self.assertEqual(buffer.size, 13)
+        self.assertEqual(buffer.skipped, 6)
+        self.assertEqual(buffer.get_tail(), b"jklm")
+        self.assertEqual(buffer.getvalue(), b"abc" + "\n... пропущено байт: 6 ...\n".encode() + b"jklm")
+        buffer = OutputBuffer(3, 4)
+        buffer.write(b"abcde")
+        self.assertEqual(buffer.getvalue(), b"abcde")
+
+    def test_capture(self):
+        state, stdout, stderr = self.run_python("import sys; print('0123456789'); print('error', file=sys.stderr)")
+        self.assertEqual(state, Status.OK)
+        self.assertEqual((stdout.size, stdout.skipped), (11, 3))
+        self.assertEqual(stdout.getvalue(), b"0123" + "\n... пропущено байт: 3 ...\n".encode() + b"789\n")
+        self.assertEqual(stderr.getvalue(), b"error\n")
+
+    def test_capture_output_limit(self):
+        state, stdout, _ = self.run_python("while True: print('x' * 1000)", limit=1024 * 1024)
+        self.assertEqual(state, Status.OL)
+        self.assertLessEqual(len(stdout.getvalue()), 64)
+
+    def test_capture_timeout(self):
+        state, _, _ = self.run_python("import time; time.sleep(10)", timeout=0.1)
+        self.assertEqual(state, Status.TL)
+
+    @override_settings(JUDGE_OUTPUT_HEAD_SIZE=10, JUDGE_OUTPUT_TAIL_SIZE=10)
+    def test_io_test_output_limit(self):
+        test = IOTest(problem=Problem(time_limit=1), input="", output="42")
+        sandbox = FloodingSandbox(self.tmp)
+        with override_settings(JUDGE_OUTPUT_LIMIT=100):
+            self.assertEqual(test.execute(sandbox, 'exe', {}, Observer()), Status.OL)
+        stats = {}
+        self.assertEqual(test.execute(sandbox, 'exe', stats, Observer()), Status.WA)
+        self.assertEqual(stats['test_output'], "x" * 10 + "\n... пропущено байт: 980 ...\n" + "x" * 10)
+
+
+class TaskProgressTest(TestCase):
+    def setUp(self):
+        caches['progress'].clear()
+        self.observer = TaskProgressObserver(mock.Mock(request=mock.Mock(id='task')))
+
+    @override_settings(JUDGE_PROGRESS_INTERVAL=10)
+    def test_updates_are_throttled(self):
+        with mock.patch('contests.observers.caches') as observer_caches:
+            for i in range(1, 51):
+                self.observer.set_progress('Проверяем', i, 50)
+            self.observer.set_progress('Проверяем', 50, 50)
+        cache = observer_caches.__getitem__.return_value
+        self.assertEqual([call.args[1]['progress'] for call in cache.set.call_args_list], [2, 100])
+
+    @override_settings(JUDGE_PROGRESS_INTERVAL=0)
+    def test_updates_are_coalesced(self):
+        for i in range(1, 301):
+            self.observer.set_progress('Проверяем', i, 300)
+            self.assertEqual(get_task_progress('task')['progress'], i // 3)
+
+    def test_task_progress_reads_progress_cache(self):
+        self.assertEqual(TaskProgress('task').get_info()['progress'], 0)
+        self.observer.set_progress('Проверяем', 1, 3)
+        self.assertEqual(TaskProgress('task').get_info(),
+                         {'state': 'Проверяем', 'progress': 33, 'complete': False, 'success': None})
+
+    def test_task_progress_reads_result_backend_when_finished(self):
+        self.observer.set_progress('Проверяем', 1, 3)
+        with mock.patch('contests.results.AsyncResult') as async_result:
+            async_result.return_value.ready.return_value = True
+            async_result.return_value.get.return_value = ('OK', "Решение зачтено")
+            self.assertFalse(TaskProgress('task').get_info()['complete'])
+            async_result.return_value.ready.assert_not_called()
+            finish_task_progress('task')
+            self.assertTrue(TaskProgress('task').get_info()['complete'])
+
+
+@override_settings(JUDGE_PROGRESS_STREAM_INTERVAL=0.01)
+class SubmissionProgressStreamTest(TransactionTestCase):
+    def setUp(self):
+        caches['progress'].clear()
+        faculty = Faculty.objects.create(name="Test Fac")
+        admin = User.objects.create_superuser('admin', 'admin@localhost', 'admin')
+        student = User.objects.create_user('student', 'student@localhost', 'student')
+        Account.students.create(user=student, faculty=faculty)
+        User.objects.create_user('other_student', 'other_student@localhost', 'other_student')
+        course = Course.objects.create(owner=admin, faculty=faculty, title_official="Test Course", level=1)
+        contest = Contest.objects.create(owner=admin, course=course, title="Test Contest")
+        problem = Problem.objects.create(owner=admin, contest=contest, title="Test Problem", type='Program')
+        self.submission = Submission.objects.create(owner=student, problem=problem)
+
+    def get_scope(self, username=None, query=None):
+        headers = []
+        if username is not None:
+            self.client.login(username=username, password=username)
+            session_key = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+            cookie = '{}={}'.format(settings.SESSION_COOKIE_NAME, session_key)
+            headers.append((b'cookie', cookie.encode()))
+        if query is None:
+            query = 'submission={}&task=task'.format(self.submission.id)
+        return {'type': 'http', 'path': SUBMISSION_PROGRESS_STREAM_PATH, 'query_string': query.encode(),
+                'headers': headers}
+
+    async def get_response_status(self, scope):
+        communicator = ApplicationCommunicator(SubmissionProgressStream(), scope)
+        await communicator.send_input({'type': 'http.request'})
+        start = await communicator.receive_output(1)
+        await communicator.send_input({'type': 'http.disconnect'})
+        await communicator.wait(1)
+        return start['status']
+
+    def test_stream_requires_permission(self):
+        get_response_status = async_to_sync(self.get_response_status)
+        self.assertEqual(get_response_status(self.get_scope()), 403)
+        self.assertEqual(get_response_status(self.get_scope('other_student')), 403)
+        self.assertEqual(get_response_status(self.get_scope('student', query='task=task')), 400)
+        self.assertEqual(get_response_status(self.get_scope('admin')), 200)
+
+    def test_stream_pushes_progress_until_complete(self):
+        set_task_progress('task', 'Проверяем', 1, 2, 50)
+        async_to_sync(self.check_stream)(self.get_scope('student'))
+
+    async def check_stream(self, scope):
+        communicator = ApplicationCommunicator(SubmissionProgressStream(), scope)
+        await communicator.send_input({'type': 'http.request'})
+        start = await communicator.receive_output(1)
+        self.assertEqual((start['status'], dict(start['headers'])[b'content-type']), (200, b'text/event-stream'))
+        event = await communicator.receive_output(1)
+        self.assertTrue(event['body'].startswith(b'event: progress\ndata: '))
+        data = json.loads(event['body'].decode().split('data: ', 1)[1])
+        self.assertEqual((data['submission'], data['task'], data['progress']), (self.submission.id, 'task', 50))
+        celery_app.backend.store_result('task', ('OK', "Задача решена"), 'SUCCESS')
+        finish_task_progress('task')  # as the task does once its result is stored
+        event = await communicator.receive_output(1)
+        data = json.loads(event['body'].decode().split('data: ', 1)[1])
+        self.assertEqual((data['complete'], data['result']), (True, "Задача решена"))
+        self.assertEqual(await communicator.receive_output(1), {'type': 'http.response.body', 'body': b'',
+                                                                 'more_body': False})
+
+
+class SubmissionStatusAPITest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        faculty = Faculty.objects.create(name="Test Fac")
+        admin = User.objects.create_superuser('admin', 'admin@localhost', 'admin')
+        Account.objects.create(user=admin, faculty=faculty)
+        student = User.objects.create_user('student', 'student@localhost', 'student')
+        Account.students.create(user=student, faculty=faculty)
+        other_student = User.objects.create_user('other_student', 'other_student@localhost', 'other_student')
+        Account.students.create(user=other_student, faculty=faculty)
+        course = Course.objects.create(owner=admin, faculty=faculty, title_official="Test Course", level=1)
+        contest = Contest.objects.create(owner=admin, course=course, title="Test Contest")
+        problem = Problem.objects.create(owner=admin, contest=contest, title="Test Problem", type='Program')
+        cls.submissions = [Submission.objects.create(owner=student, problem=problem, status=status, score=5)
+                           for status in ('OK', 'WA', 'EV')]
+        cls.submissions[2].task_id = uuid.uuid4()
+        cls.submissions[2].save()
+        cls.other_submission = Submission.objects.create(owner=other_student, problem=problem)
+
+    def setUp(self):
+        caches['progress'].clear()
+
+    def get_statuses(self, *ids, tasks=()):
+        response = self.client.get(reverse('contests:api-submission-get-statuses'), {'id': ids, 'task': tasks})
+        return {status['id']: status for status in response.json()['submissions']}
+
+    def test_statuses_of_own_submissions(self):
+        set_task_progress(str(self.submissions[2].task_id), 'Проверяем', 1, 4, 25)
+        self.client.login(username='student', password='student')
+        statuses = self.get_statuses(self.submissions[0].id, self.submissions[1].id, self.other_submission.id,
+                                     tasks=[str(self.submissions[2].task_id)])
+        self.assertEqual(set(statuses), {submission.id for submission in self.submissions})
+        self.assertEqual(statuses[self.submissions[0].id]['class'], 'success')
+        self.assertEqual(statuses[self.submissions[1].id]['status_display'], "Неверный ответ")
+        self.assertEqual((statuses[self.submissions[1].id]['progress'], statuses[self.submissions[1].id]['complete']),
+                         (100, True))
+        self.assertEqual((statuses[self.submissions[2].id]['progress'], statuses[self.submissions[2].id]['complete']),
+                         (25, False))
+
+    def test_statuses_are_styled_as_in_templates(self):
+        self.client.login(username='admin', password='admin')
+        statuses = self.get_statuses(self.submissions[0].id, self.other_submission.id)
+        self.assertEqual(statuses[self.submissions[0].id]['class'], 'success')
+        self.assertEqual(statuses[self.other_submission.id]['class'], 'default')  # not evaluated yet
+
+    def test_statuses_take_few_queries(self):
+        self.client.login(username='admin', password='admin')
+        ids = [submission.id for submission in self.submissions] + [self.other_submission.id]
+        with self.assertNumQueries(4):  # session, user, submissions, account
+            self.assertEqual(len(self.get_statuses(*ids)), 4)
+
+    def test_invalid_parameters(self):
+        self.client.login(username='student', password='student')
+        response = self.client.get(reverse('contests:api-submission-get-statuses'), {'task': 'task'})
+        self.assertEqual(response.status_code, 400)
+
+
+class TimingSpanTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        faculty = Faculty.objects.create(name="Test Fac")
+        cls.admin = User.objects.create_superuser('admin', 'admin@localhost', 'admin')
+        Account.objects.create(user=cls.admin, faculty=faculty)
+        student = User.objects.create_user('student', 'student@localhost', 'student')
+        Account.students.create(user=student, faculty=faculty)
+        course = Course.objects.create(owner=cls.admin, faculty=faculty, title_official="Test Course", level=1)
+        contest = Contest.objects.create(owner=cls.admin, course=course, title="Test Contest")
+        cls.problem = Problem.objects.create(owner=cls.admin, contest=contest, title="Test Problem", type='Program')
+        for i in range(3):
+            IOTest.objects.create(owner=cls.admin, problem=cls.problem, title="Test %s" % i, output="42")
+        cls.submission = Submission.objects.create(owner=student, problem=cls.problem)
+        Attachment.objects.create(owner=cls.admin, object=cls.submission, file='main.cpp')
+
+    def setUp(self):
+        patcher = mock.patch('contests.sandboxes.get_sandbox_class', lambda based_on='': FakeSandbox)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_spans(self):
+        return {span.name: span.count for span in TimingSpan.objects.filter(submission=self.submission)}
+
+    def test_evaluation_spans_are_saved(self):
+        observer = TimingObserver()
+        observer.add_span('queue', 1.0)
+        self.submission.evaluate(observer, self.admin, 'subprocess')
+        self.assertEqual(self.get_spans(), {'queue': 1, 'evaluate': 1, 'inspect': 1, 'sandbox': 4, 'compile': 1,
+                                            'execute': 3, 'check': 3, 'save': 1})
+        self.assertEqual(observer.pop_spans(), [])
+
+    @override_settings(JUDGE_WORKERS=2)
+    def test_spans_of_pool_workers_are_collected(self):
+        self.submission.evaluate(TimingObserver(), self.admin, 'subprocess')
+        self.assertEqual((self.get_spans()['execute'], self.get_spans()['check']), (3, 3))
+
+    def test_observer_without_timings_saves_nothing(self):
+        self.submission.evaluate(Observer(), self.admin, 'subprocess')
+        self.assertFalse(TimingSpan.objects.exists())
+
+    def test_summary(self):
+        TimingSpan.objects.create_set(self.submission, [('execute', duration / 10) for duration in range(1, 11)])
+        for duration in range(1, 101):
+            TimingSpan.objects.create_set(self.submission, [('queue', float(duration))])
+        summary = {row['name']: row for row in TimingSpan.objects.get_summary(problem=self.problem)}
+        self.assertEqual(summary['execute']['count'], 1)
+        self.assertAlmostEqual(summary['execute']['p50'], 5.5)
+        self.assertEqual(summary['queue']['count'], 100)
+        self.assertAlmostEqual(summary['queue']['p90'], 90.1)
+        self.assertEqual(summary['queue']['max'], 100.0)
+        problem_summary, = TimingSpan.objects.get_problem_summaries('queue')
+        self.assertEqual((problem_summary['problem'], problem_summary['count']), (self.problem, 100))
+
+    def test_timing_views(self):
+        TimingSpan.objects.create_set(self.submission, [('queue', 1.0)])
+        self.client.login(username='student', password='student')
+        self.assertEqual(self.client.get(reverse('contests:problem-timings', kwargs={'pk': self.problem.id})).status_code,
+                         403)
+        self.client.login(username='admin', password='admin')
+        response = self.client.get(reverse('contests:problem-timings', kwargs={'pk': self.problem.id}))
+        self.assertContains(response, "Ожидание в очереди")
+        response = self.client.get(reverse('contests:timing-summary'), {'name': 'queue', 'days': 7})
+        self.assertContains(response, self.problem.title)
+
+    @mock.patch('contests.tasks.evaluate_submission.apply_async')
+    def test_enqueue_passes_enqueued_at(self, apply_async):
+        enqueue(evaluate_submission, INTERACTIVE, 1, args=(1, 1))
+        self.assertIn('enqueued_at', apply_async.call_args[0][1])
+
+
+class JudgeBenchmarkTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        for target in ('contests.sandboxes.get_sandbox_class',
+                       'contests.management.commands.judge_benchmark.get_sandbox_class'):
+            patcher = mock.patch(target, lambda based_on='': FakeSandbox)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_generated_output(self):
+        self.assertEqual(generate_output(998, 11), '998 999 0 1 ')
+
+    def test_benchmark(self):
+        report_path = os.path.join(self.tmp, 'report.json')
+        with override_settings(MEDIA_ROOT=self.tmp):
+            call_command('judge_benchmark', problems=1, tests=2, submissions=2, kinds='ok,ce', json=report_path,
+                         stdout=StringIO())
+        with open(report_path) as f:
+            report = json.load(f)
+        self.assertEqual(report['submissions'], 4)
+        self.assertEqual(set(report['latencies']), {'ok', 'ce'})
+        self.assertIn('evaluate', [stage['name'] for stage in report['stages']])
+        self.assertFalse(Submission.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.tmp, 'judge_benchmark')), [])
+
+    def test_unknown_kind(self):
+        with self.assertRaises(CommandError):
+            call_command('judge_benchmark', kinds='ok,slow', stdout=StringIO())
+
+
+@skipUnless(shutil.which('gcc'), "gcc is not installed")
+class ForkServerSandboxTest(TestCase):
+    PROGRAM = """
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+int main(int argc, char *argv[]) {
+    if (argc > 1 && strcmp(argv[1], "loop") == 0)
+        for (;;);
+    if (argc > 1 && strcmp(argv[1], "alloc") == 0) {
+        char *memory = malloc(64 << 20);
+        memset(memory, 1, 64 << 20);
+        return memory[argc] - 1;
+    }
+    if (argc > 1 && strcmp(argv[1], "crash") == 0)
+        return *(volatile int *) 0;
+    if (argc > 1 && strcmp(argv[1], "flood") == 0)
+        for (;;)
+            puts("xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx");
+    printf("%d\\n", argc);
+    fprintf(stderr, "done\\n");
+    return 3;
+}
+"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.sandbox = ForkServerSandbox(self.tmp).__enter__()
+        self.addCleanup(self.sandbox.__exit__, None, None, None)
+        source = self.sandbox.create('main.c', self.PROGRAM)
+        self.assertEqual(self.sandbox.compile([source], self.sandbox.path('exe'), language='C', args=[], timeout=30,
+                                              stats={}), Status.OK)
+
+    def execute(self, *args, timeout=5, memory_limit=None):
+        stats = {}
+        return self.sandbox.execute(self.sandbox.path('exe'), args=list(args), timeout=timeout, stats=stats,
+                                    memory_limit=memory_limit), stats
+
+    def test_sandbox_class(self):
+        self.assertIs(get_sandbox_class('subprocess'), ForkServerSandbox)
+        self.assertIs(get_sandbox_class('unknown'), object)
+
+    def test_execute(self):
+        state, stats = self.execute('a', 'b')
+        self.assertEqual(state, Status.OK)
+        self.assertEqual(stats['execution_returncode'], 3)
+        self.assertEqual((stats['execution_stdout'], stats['execution_stderr']), ("3\n", "done\n"))
+        self.assertGreater(stats['execution_memory'], 0)
+        self.assertIn('exe', stats['execution_command'])
+
+    def test_compilation_error(self):
+        stats = {}
+        source = self.sandbox.create('error.c', "int main(void) { return undeclared; }")
+        state = self.sandbox.compile([source], self.sandbox.path('error'), language='C', args=[], timeout=30,
+                                     stats=stats)
+        self.assertEqual(state, Status.CE)
+        self.assertIn('undeclared', stats['compilation_stderr'])
+
+    def test_limits(self):
+        self.assertEqual(self.execute('loop', timeout=0.2)[0], Status.TL)
+        self.assertEqual(self.execute('crash')[0], Status.SF)
+        with override_settings(JUDGE_OUTPUT_LIMIT=1024 * 1024, JUDGE_OUTPUT_HEAD_SIZE=16, JUDGE_OUTPUT_TAIL_SIZE=16):
+            state, stats = self.execute('flood')
+        self.assertEqual(state, Status.OL)
+        self.assertLess(len(stats['execution_stdout']), 100)
+
+    def test_memory_limit_is_passed_to_sandboxes_enforcing_it(self):
+        test = IOTest(problem=Problem(memory_limit=1024))
+        self.assertEqual(test.get_limits(self.sandbox), {'memory_limit': 1024 * 1024})
+        self.assertEqual(test.get_limits(FakeSandbox('.')), {})
+
+    def test_memory_limit(self):
+        state, stats = self.execute('alloc', memory_limit=32 * 1024 * 1024)
+        self.assertEqual(state, Status.ML)
+        self.assertGreaterEqual(stats['execution_memory'], 32 * 1024 * 1024)
+        self.assertEqual(self.execute('alloc', memory_limit=128 * 1024 * 1024)[0], Status.OK)
+
+    def test_reset(self):
+        build, workdir = tempfile.mkdtemp(), tempfile.mkdtemp()
+        for directory in (build, workdir):
+            self.addCleanup(shutil.rmtree, directory)
+        executable = shutil.copy(self.sandbox.path('exe'), build)
+        with open(os.path.join(workdir, 'data.txt'), 'w') as f:
+            f.write("1")
+        self.sandbox.create('input.txt', "1")
+        os.makedirs(self.sandbox.path('scratch/nested'))
+        self.sandbox.reset(workdir)
+        self.assertEqual(os.listdir(self.tmp), [])
+        self.assertEqual(self.sandbox.path('input.txt'), os.path.join(workdir, 'input.txt'))
+        executable, = self.sandbox.fetch([executable])
+        self.assertEqual(os.path.dirname(executable), workdir)
+        self.assertEqual(self.execute()[0], Status.OK)
+        self.sandbox.reset(self.tmp)
+        self.assertEqual(os.listdir(workdir), ['data.txt'])
+
+
+@skipUnless(shutil.which('gcc'), "gcc is not installed")
+class ForkServerJudgeTest(TestCase):
+    PROGRAM = """
+#include <stdio.h>
+#include <unistd.h>
+#ifndef FACTOR
+#define FACTOR 1
+#endif
+int main(int argc, char *argv[]) {
+    int n;
+    FILE *input = fopen(argv[1], "r"), *output;
+    if (input == NULL || fscanf(input, "%d", &n) != 1)
+        return 1;
+    usleep(100000);
+    output = fopen(argv[2], "w");
+    fprintf(output, "%d\\n", n * FACTOR);
+    return 0;
+}
+"""
+
+    @classmethod
+    def setUpTestData(cls):
+        faculty = Faculty.objects.create(name="Test Fac")
+        cls.admin = User.objects.create_superuser('admin', 'admin@localhost', 'admin')
+        Account.objects.create(user=cls.admin, faculty=faculty)
+        course = Course.objects.create(owner=cls.admin, faculty=faculty, title_official="Test Course", level=1)
+        contest = Contest.objects.create(owner=cls.admin, course=course, title="Test Contest")
+        cls.problem = Problem.objects.create(owner=cls.admin, contest=contest, title="Test Problem", type='Program',
+                                             language='C')
+        for i in range(4):
+            IOTest.objects.create(owner=cls.admin, problem=cls.problem, title="Test %s" % i, input=str(i),
+                                  output=str(i))
+        IOTest.objects.create(owner=cls.admin, problem=cls.problem, title="Test x2", input="5", output="10",
+                              compile_args="-DFACTOR=2")
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        settings_override = override_settings(MEDIA_ROOT=self.tmp)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        reset_executor()  # workers forked by other tests may run with their sandbox classes patched
+        self.addCleanup(reset_executor)
+
+    @override_settings(JUDGE_WORKERS=2)
+    def test_parallel_tests_run_in_workdirs_of_their_own(self):
+        submission = Submission.objects.create(owner=self.admin, problem=self.problem)
+        os.makedirs(os.path.join(self.tmp, str(submission.id)))
+        with open(os.path.join(self.tmp, str(submission.id), 'main.c'), 'w') as f:
+            f.write(self.PROGRAM)
+        Attachment.objects.create(owner=self.admin, object=submission, file=os.path.join(str(submission.id), 'main.c'))
+        self.assertEqual(self.problem.run_tests(submission, Observer(), None, 'subprocess'), Status.OK)
+        self.assertEqual(submission.execution_set.filter(test_is_passed=True).count(), 5)
+        self.assertEqual(os.listdir(os.path.join(self.tmp, str(submission.id))), ['main.c'])
+
+class SimilarityTest(TestCase):
+    SOURCE = """
+#include <stdio.h>
+
+int gcd(int a, int b) {
+    while (b != 0) {
+        int t = a % b;
+        a = b;
+        b = t;
+    }
+    return a;
+}
+
+int main(void) {
+    int n, m;
+    scanf("%d %d", &n, &m);
+    for (int i = 0; i < n; i++) {
+        printf("%d\\n", gcd(i, m));
+    }
+    return 0;
+}
+"""
+    COPY = """
+#include <stdio.h>
+/* my own solution */
+int divisor(int x, int y) {
+    while (y != 0) {
+        int r = x % y;  // remainder
+        x = y;
+        y = r;
+    }
+    return x;
+}
+
+int main(void) {
+    int count, k;
+    scanf("%d%d", &count, &k);
+    for (int j = 0; j < count; j++) {
+        printf("%d ", divisor(j, k));
+    }
+    return 0;
+}
+"""
+    OTHER = """
+#include <iostream>
+#include <vector>
+
+int main() {
+    std::vector<long long> v;
+    long long x;
+    while (std::cin >> x)
+        v.push_back(x * x);
+    for (auto it = v.rbegin(); it != v.rend(); ++it)
+        std::cout << *it << std::endl;
+}
+"""
+
+    @classmethod
+    def setUpTestData(cls):
+        faculty = Faculty.objects.create(name="Test Fac")
+        cls.admin = User.objects.create_superuser('admin', 'admin@localhost', 'admin')
+        Account.objects.create(user=cls.admin, faculty=faculty)
+        cls.students = []
+        for i in range(3):
+            student = User.objects.create_user('student%s' % i, 'student@localhost', 'student')
+            Account.objects.create(user=student, faculty=faculty, enrolled=True)
+            cls.students.append(student)
+        course = Course.objects.create(owner=cls.admin, faculty=faculty, title_official="Test Course", level=1)
+        contest = Contest.objects.create(owner=cls.admin, course=course, title="Test Contest")
+        cls.problem = Problem.objects.create(owner=cls.admin, contest=contest, title="Test Problem", type='Program')
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        settings_override = override_settings(MEDIA_ROOT=self.tmp)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        patcher = mock.patch.dict('contests.models._signature_indexes', clear=True)  # ids are reused after rollbacks
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        caches['default'].clear()  # drops similarity-index-<course id> of earlier tests
+
+    def submit(self, owner, content):
+        submission = Submission.objects.create(owner=owner, problem=self.problem)
+        os.makedirs(os.path.join(self.tmp, str(submission.id)))
+        with open(os.path.join(self.tmp, str(submission.id), 'main.c'), 'w') as f:
+            f.write(content)
+        Attachment.objects.create(owner=owner, object=submission, file=os.path.join(str(submission.id), 'main.c'))
+        return submission
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize('int a = 0x1F; // comment\n#include <x>\nreturn "s";'),
+                         [('int', 1), ('V', 1), ('=', 1), ('N', 1), (';', 1), ('return', 3), ('S', 3), (';', 3)])
+
+    def test_winnow(self):
+        hashes = [77, 74, 42, 17, 98, 50, 17, 98, 8, 88, 67, 39, 77, 74, 42, 17, 98]
+        positions = winnow(hashes, 4)
+        self.assertEqual([hashes[i] for i in positions], [17, 17, 8, 39, 17])
+        for i in range(len(hashes) - 3):
+            self.assertTrue(any(i <= position < i + 4 for position in positions))
+
+    def test_renamed_copy_is_found(self):
+        original = self.submit(self.students[0], self.SOURCE)
+        copy = self.submit(self.students[1], self.COPY)
+        other = self.submit(self.students[2], self.OTHER)
+        self.assertEqual(SourceFingerprint.objects.get_matches(original, Submission.objects.exclude(id=original.id)),
+                         [])  # other submissions are not indexed on the way
+        SourceFingerprint.objects.create_set(copy)
+        SourceFingerprint.objects.create_set(other)
+        matches = SourceFingerprint.objects.get_matches(original, Submission.objects.exclude(id=original.id))
+        self.assertEqual([match['submission'] for match in matches], [copy])
+        self.assertGreater(matches[0]['similarity'], 80)
+        self.assertEqual(list(matches[0]['regions']), ['main.c'])
+
+    @mock.patch('contests.sandboxes.get_sandbox_class', lambda based_on='': FakeSandbox)
+    def test_evaluation_indexes_submission(self):
+        submission = self.submit(self.students[0], self.SOURCE)
+        submission.evaluate(Observer(), self.admin, 'subprocess')
+        count = SourceFingerprint.objects.filter(submission=submission, problem=self.problem).count()
+        self.assertGreater(count, 0)
+        self.assertEqual(SourceFingerprint.objects.create_set(submission), [])
+        self.assertEqual(SourceFingerprint.objects.filter(submission=submission).count(), count)
+
+    def test_similarity_views(self):
+        original = self.submit(self.students[0], self.SOURCE)
+        copy = self.submit(self.students[1], self.COPY)
+        self.client.login(username='admin', password='admin')
+        with mock.patch('contests.views.index_submissions.delay') as delay:
+            response = self.client.get(reverse('contests:submission-moss', kwargs={'pk': original.id}))
+        delay.assert_called_once_with(self.problem.contest.course_id)
+        self.assertFalse(SourceFingerprint.objects.filter(submission=copy).exists())
+        self.assertContains(response, "Проиндексировано посылок: 0 из 1")
+        SourceFingerprint.objects.create_set(copy)
+        response = self.client.get(reverse('contests:submission-moss', kwargs={'pk': original.id}))
+        self.assertContains(response, reverse('contests:submission-similarity', args=(original.id, copy.id)))
+        response = self.client.get(reverse('contests:submission-similarity', args=(original.id, copy.id)))
+        self.assertContains(response, 'table-warning')
+        self.assertContains(response, 'divisor')
+
+    def test_minhash(self):
+        first, second = list(range(0, 2000)), list(range(1000, 3000))
+        self.assertTrue((get_minhash(first) == get_minhash(list(reversed(first)))).all())
+        self.assertAlmostEqual((get_minhash(first, 512) == get_minhash(second, 512)).mean(), 1 / 3, delta=0.08)
+        self.assertIsNone(get_minhash([]))
+
+    def test_signature_index(self):
+        signatures = [get_minhash(range(i * 1000, i * 1000 + 1000)) for i in range(100)]
+        signatures.append(get_minhash(range(0, 900)))
+        index = SignatureIndex(range(101), signatures)
+        self.assertEqual([submission_id for submission_id, _ in index.query(signatures[0])], [0, 100])
+        (submission_id, similarity), = index.query(signatures[0], exclude=[0])
+        self.assertEqual(submission_id, 100)
+        self.assertAlmostEqual(similarity, 0.9, delta=0.1)
+
+    def test_similar_submissions_of_course(self):
+        original = self.submit(self.students[0], self.SOURCE)
+        copy = self.submit(self.students[1], self.COPY)
+        self.submit(self.students[2], self.OTHER)
+        course_id = self.problem.contest.course_id
+        with override_settings(SIMILARITY_INDEX_BATCH_SIZE=2), \
+                mock.patch('contests.tasks.index_submissions.delay') as delay:
+            index_submissions.apply(args=(course_id,))
+            self.assertEqual(SimilaritySignature.objects.filter(course_id=course_id).count(), 2)
+            delay.assert_called_once_with(course_id)
+            index_submissions.apply(args=(course_id,))
+        self.assertEqual(SimilaritySignature.objects.filter(course_id=course_id).count(), 3)
+        similar = SimilaritySignature.objects.get_similar(original)
+        self.assertEqual(similar[0][0], copy)
+        self.client.login(username='admin', password='admin')
+        response = self.client.get(reverse('contests:submission-similar', kwargs={'pk': original.id}))
+        self.assertContains(response, reverse('contests:submission-similarity', args=(original.id, copy.id)))
+
+
+class AssignmentLatestSubmissionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        faculty = Faculty.objects.create(name="Test Fac")
+        cls.admin = User.objects.create_superuser('admin', 'admin@localhost', 'admin')
+        Account.objects.create(user=cls.admin, faculty=faculty)
+        cls.student = User.objects.create_user('student', 'student@localhost', 'student')
+        Account.students.create(user=cls.student, faculty=faculty)
+        cls.course = Course.objects.create(owner=cls.admin, faculty=faculty, title_official="Test Course", level=1)
+        contest = Contest.objects.create(owner=cls.admin, course=cls.course, title="Test Contest")
+        cls.problem = Problem.objects.create(owner=cls.admin, contest=contest, title="Test Problem")
+
+    def get_assignment(self):
+        return Assignment.objects.get(user=self.student, problem=self.problem)
+
+    def test_existing_submissions_are_stored_on_creation(self):
+        submission = Submission.objects.create(owner=self.student, problem=self.problem, status='WA')
+        Assignment.objects.create(owner=self.admin, user=self.student, problem=self.problem)
+        assignment = self.get_assignment()
+        self.assertEqual((assignment.latest_submission, assignment.latest_submission_status), (submission, 'WA'))
+        self.assertEqual(assignment.latest_submission_date_created, submission.date_created)
+
+    def test_saved_submission_becomes_latest(self):
+        Assignment.objects.create(owner=self.admin, user=self.student, problem=self.problem)
+        Submission.objects.create(owner=self.student, problem=self.problem, status='WA')
+        submission = Submission.objects.create(owner=self.student, problem=self.problem)
+        self.assertEqual(self.get_assignment().latest_submission_status, 'UN')
+        submission.status = 'OK'
+        submission.save()
+        self.assertEqual((self.get_assignment().latest_submission, self.get_assignment().latest_submission_status),
+                         (submission, 'OK'))
+
+    def test_date_updated_is_kept(self):
+        assignment = Assignment.objects.create(owner=self.admin, user=self.student, problem=self.problem)
+        Submission.objects.create(owner=self.student, problem=self.problem)
+        self.assertEqual(self.get_assignment().date_updated, assignment.date_updated)
+
+    def test_deleted_submission_is_replaced_with_previous(self):
+        Assignment.objects.create(owner=self.admin, user=self.student, problem=self.problem)
+        previous = Submission.objects.create(owner=self.student, problem=self.problem, status='WA')
+        Submission.objects.create(owner=self.student, problem=self.problem, status='OK').delete()
+        self.assertEqual(self.get_assignment().latest_submission, previous)
+        previous.delete()
+        assignment = self.get_assignment()
+        self.assertEqual((assignment.latest_submission, assignment.latest_submission_status), (None, None))
+
+    def test_rollback_status(self):
+        Assignment.objects.create(owner=self.admin, user=self.student, problem=self.problem)
+        Submission.objects.create(owner=self.student, problem=self.problem, status='OK')
+        Submission.objects.filter(problem=self.problem).rollback_status()
+        self.assertEqual(self.get_assignment().latest_submission_status, 'TR')
+
+    def test_random_set_stores_existing_submissions(self):
+        submission = Submission.objects.create(owner=self.student, problem=self.problem, status='WA')
+        Credit.objects.create(owner=self.admin, user=self.student, course=self.course)
+        params = {'faculty_id': 0, 'group': 0, 'subgroup': 0, 'debts': False, 'course': self.course}
+        Assignment.objects.create_random_set(self.admin, self.problem.contest, self.problem.type, 1, 5, None, params)
+        self.assertEqual(self.get_assignment().latest_submission, submission)
+
+    def test_command(self):
+        Assignment.objects.create(owner=self.admin, user=self.student, problem=self.problem)
+        submission = Submission.objects.create(owner=self.student, problem=self.problem, status='WA')
+        Assignment.objects.update(latest_submission=None, latest_submission_status=None)
+        with self.assertRaises(CommandError):
+            call_command('assignment_latest_submissions', verify=True, stdout=StringIO())
+        out = StringIO()
+        call_command('assignment_latest_submissions', course=self.course.id, stdout=out)
+        self.assertIn("1 assignments updated", out.getvalue())
+        self.assertEqual(self.get_assignment().latest_submission, submission)
+        call_command('assignment_latest_submissions', verify=True, stdout=StringIO())
+
+
+class GradebookTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        faculty = Faculty.objects.create(name="Test Fac")
+        cls.admin = User.objects.create_superuser('admin', 'admin@localhost', 'admin')
+        Account.objects.create(user=cls.admin, faculty=faculty)
+        cls.students = []
+        for name in ('student1', 'student2'):
+            student = User.objects.create_user(name, name + '@localhost', name)
+            Account.students.create(user=student, faculty=faculty)
+            cls.students.append(student)
+        cls.course = Course.objects.create(owner=cls.admin, faculty=faculty, title_official="Test Course", level=1)
+        cls.contests = [Contest.objects.create(owner=cls.admin, course=cls.course, title="Test Contest %s" % i,
+                                               number=i) for i in (1, 2)]
+        cls.problems = [Problem.objects.create(owner=cls.admin, contest=contest, title="Test Problem", number=7)
+                        for contest in cls.contests]
+        cls.credit = Credit.objects.create(owner=cls.admin, user=cls.students[0], course=cls.course)
+        cls.assignments = [
+            Assignment.objects.create(owner=cls.admin, user=cls.students[0], problem=cls.problems[1], score=5),
+            Assignment.objects.create(owner=cls.admin, user=cls.students[0], problem=cls.problems[0], score=3),
+            Assignment.objects.create(owner=cls.admin, user=cls.students[1], problem=cls.problems[0], score=4),
+        ]
+
+    def setUp(self):
+        caches['gradebook'].clear()
+
+    def get_gradebook(self, students=None):
+        return get_gradebook(self.course, [student.id for student in students or self.students])
+
+    def test_table(self):
+        gradebook = self.get_gradebook(self.students[::-1])
+        table = gradebook.get_table(self.contests)
+        self.assertEqual([[[entry.id for entry in cell] for cell in row] for row in table],
+                         [[[self.assignments[2].id], []], [[self.assignments[1].id], [self.assignments[0].id]]])
+        self.assertEqual((table[1][0][0].number, table[1][0][0].score), (7, 3))
+        self.assertEqual(gradebook.get_averages(self.contests), [3.5, 5])
+        self.assertEqual(gradebook.progress(), 66)
+
+    def test_cached(self):
+        self.get_gradebook()
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.get_gradebook()), 3)
+
+    def test_invalidated_on_changes_of_assignments(self):
+        self.get_gradebook()
+        self.assignments[1].score = 5
+        self.assignments[1].save()
+        self.assertEqual(sorted(self.get_gradebook().scores), [4, 5, 5])
+        self.assignments[1].delete()
+        self.assertEqual(len(self.get_gradebook()), 2)
+
+    def test_invalidated_on_changes_of_credits(self):
+        self.get_gradebook()
+        self.credit.save()
+        with self.assertNumQueries(1):
+            self.get_gradebook()
+
+    def test_invalidated_on_new_submissions(self):
+        self.assertFalse(self.get_gradebook().get_table(self.contests)[1][0][0].has_new_submission)
+        Submission.objects.create(owner=self.students[1], problem=self.problems[0])
+        self.assertTrue(self.get_gradebook().get_table(self.contests)[1][0][0].has_new_submission)
+
+    def test_kept_on_submissions_without_assignments(self):
+        self.get_gradebook()
+        Submission.objects.create(owner=self.students[1], problem=self.problems[1])
+        with self.assertNumQueries(0):
+            self.get_gradebook()
+
+    def test_views(self):
+        self.client.login(username='admin', password='admin')
+        response = self.client.get(reverse('contests:assignment-table', kwargs={'course_id': self.course.id}))
+        self.assertContains(response, reverse('contests:assignment-detail', kwargs={'pk': self.assignments[0].id}))
+        response = self.client.get(reverse('contests:credit-update', kwargs={'pk': self.credit.id}))
+        self.assertEqual(response.context['summary'], [3, 5])
+        self.assertContains(response, reverse('contests:assignment-detail', kwargs={'pk': self.assignments[1].id}))
+
+
+@override_settings(COURSE_TABLE_STREAM_INTERVAL=0.05)
+class CourseTableStreamTest(TransactionTestCase):
+    def setUp(self):
+        caches['gradebook'].clear()
+        faculty = Faculty.objects.create(name="Test Fac")
+        self.admin = User.objects.create_superuser('admin', 'admin@localhost', 'admin')
+        Account.objects.create(user=self.admin, faculty=faculty)
+        self.student = User.objects.create_user('student', 'student@localhost', 'student')
+        Account.students.create(user=self.student, faculty=faculty)
+        self.course = Course.objects.create(owner=self.admin, faculty=faculty, title_official="Test Course", level=1)
+        contest = Contest.objects.create(owner=self.admin, course=self.course, title="Test Contest")
+        self.problems = [Problem.objects.create(owner=self.admin, contest=contest, title="Test Problem %s" % i,
+                                                number=i) for i in (1, 2)]
+        self.assignment = Assignment.objects.create(owner=self.admin, user=self.student, problem=self.problems[0])
+
+    def get_scope(self, username=None, query=None):
+        headers = []
+        if username is not None:
+            self.client.login(username=username, password=username)
+            session_key = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+            headers.append((b'cookie', '{}={}'.format(settings.SESSION_COOKIE_NAME, session_key).encode()))
+        if query is None:
+            query = 'course={}&since=0'.format(self.course.id)
+        return {'type': 'http', 'path': COURSE_TABLE_STREAM_PATH, 'query_string': query.encode(), 'headers': headers}
+
+    async def get_response_status(self, scope):
+        communicator = ApplicationCommunicator(CourseTableStream(), scope)
+        await communicator.send_input({'type': 'http.request'})
+        start = await communicator.receive_output(1)
+        await communicator.send_input({'type': 'http.disconnect'})
+        await communicator.wait(1)
+        return start['status']
+
+    @staticmethod
+    def parse_event(message):
+        fields = dict(line.split(': ', 1) for line in message['body'].decode().strip().split('\n'))
+        return fields['event'], json.loads(fields['data']), fields.get('id')
+
+    def test_changes_are_recorded_while_table_is_open(self):
+        Submission.objects.create(owner=self.student, problem=self.problems[0])
+        self.assertFalse(CourseTableChange.objects.exists())
+        self.client.login(username='admin', password='admin')
+        response = self.client.get(reverse('contests:assignment-table', kwargs={'course_id': self.course.id}))
+        self.assertEqual(response.context['last_change_id'], 0)
+        Submission.objects.create(owner=self.student, problem=self.problems[0])
+        Submission.objects.create(owner=self.student, problem=self.problems[1])  # not assigned
+        last_id, assignment_ids = CourseTableChange.objects.get_changes(self.course.id, 0)
+        self.assertEqual(assignment_ids, {self.assignment.id})
+        self.assertEqual(CourseTableChange.objects.get_changes(self.course.id, last_id), (last_id, set()))
+        Assignment.objects.create(owner=self.admin, user=self.student, problem=self.problems[1])
+        self.assertIsNone(CourseTableChange.objects.get_changes(self.course.id, last_id)[1])
+
+    def test_stream_requires_permission(self):
+        get_response_status = async_to_sync(self.get_response_status)
+        self.assertEqual(get_response_status(self.get_scope()), 403)
+        self.assertEqual(get_response_status(self.get_scope('student')), 403)
+        self.assertEqual(get_response_status(self.get_scope('admin', query='course=x')), 400)
+        self.assertEqual(get_response_status(self.get_scope('admin')), 200)
+
+    def test_stream_pushes_changed_cells(self):
+        async_to_sync(self.check_stream)(self.get_scope('admin'))
+
+    async def check_stream(self, scope):
+        communicator = ApplicationCommunicator(CourseTableStream(), scope)
+        await communicator.send_input({'type': 'http.request'})
+        start = await communicator.receive_output(1)
+        self.assertEqual((start['status'], dict(start['headers'])[b'content-type']), (200, b'text/event-stream'))
+        await sync_to_async(Submission.objects.create)(owner=self.student, problem=self.problems[0])
+        event, data, event_id = self.parse_event(await communicator.receive_output(1))
+        self.assertEqual((event, data), ('cell', {'assignment': self.assignment.id, 'score': 0, 'status': 'UN',
+                                                  'style': 'info'}))
+        self.assertIsNotNone(event_id)
+        await sync_to_async(Assignment.objects.create)(owner=self.admin, user=self.student, problem=self.problems[1])
+        self.assertEqual(self.parse_event(await communicator.receive_output(1))[0], 'reload')
+        self.assertEqual(await communicator.receive_output(1), {'type': 'http.response.body', 'body': b'',
+                                                                 'more_body': False})
+
+
+class StudentStatisticsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        faculty = Faculty.objects.create(name="Test Fac")
+        cls.admin = User.objects.create_superuser('admin', 'admin@localhost', 'admin')
+        Account.objects.create(user=cls.admin, faculty=faculty)
+        cls.student = User.objects.create_user('student', 'student@localhost', 'student')
+        Account.students.create(user=cls.student, faculty=faculty)
+        cls.courses, cls.problems = [], []
+        for i in (1, 2):
+            course = Course.objects.create(owner=cls.admin, faculty=faculty, title_official="Test Course %s" % i,
+                                           level=1)
+            contest = Contest.objects.create(owner=cls.admin, course=course, title="Test Contest %s" % i)
+            cls.courses.append(course)
+            cls.problems.append(Problem.objects.create(owner=cls.admin, contest=contest, title="Test Problem %s" % i))
+
+    def get_statistics(self, course):
+        statistics = StudentStatistics.objects.get(user=self.student, course=course)
+        return (statistics.submissions, statistics.ok_submissions, statistics.solved_problems,
+                statistics.completed_assignments, statistics.accuracy)
+
+    def create_submissions(self):
+        assignment = Assignment.objects.create(owner=self.admin, user=self.student, problem=self.problems[0])
+        for status in ('WA', 'OK', 'OK'):
+            Submission.objects.create(owner=self.student, problem=self.problems[0], status=status,
+                                      assignment=assignment)
+        assignment.score = 5
+        assignment.save()
+        Submission.objects.create(owner=self.student, problem=self.problems[1], status='WA')
+        return assignment
+
+    def test_updated_on_changes(self):
+        assignment = self.create_submissions()
+        self.assertEqual(self.get_statistics(self.courses[0]), (3, 2, 1, 1, 67))
+        self.assertEqual(self.get_statistics(self.courses[1]), (1, 0, 0, 0, 0))
+        submission = Submission.objects.filter(problem=self.problems[0], status='OK').first()
+        submission.status = 'WA'
+        submission.save()
+        self.assertEqual(self.get_statistics(self.courses[0]), (3, 1, 1, 1, 33))
+        Submission.objects.filter(problem=self.problems[0], status='OK').rollback_status()
+        self.assertEqual(self.get_statistics(self.courses[0]), (3, 0, 0, 1, 0))
+        for _ in range(3):
+            Assignment.objects.filter(id=assignment.id).rollback_score()
+        self.assertEqual(self.get_statistics(self.courses[0]), (3, 0, 0, 0, 0))
+        Submission.objects.filter(problem=self.problems[0]).first().delete()
+        self.assertEqual(self.get_statistics(self.courses[0])[0], 2)
+
+    def test_changes_of_submissions_are_applied_as_deltas(self):
+        self.create_submissions()
+        submission = Submission.objects.create(owner=self.student, problem=self.problems[1])
+        with mock.patch.object(StudentStatistics.objects, 'update_set') as update_set:
+            for status in ('WA', 'OK'):
+                submission.update(status)
+            self.assertEqual(self.get_statistics(self.courses[1]), (2, 1, 1, 0, 50))
+            Submission.objects.create(owner=self.student, problem=self.problems[1], status='OK')
+            Submission.objects.get(id=submission.id).update('WA')
+            self.assertEqual(self.get_statistics(self.courses[1]), (3, 1, 1, 0, 33))
+            Submission.objects.filter(problem=self.problems[1], status='OK').get().delete()
+            self.assertEqual(self.get_statistics(self.courses[1]), (2, 0, 0, 0, 0))
+        update_set.assert_not_called()
+
+    def test_account(self):
+        self.create_submissions()
+        account = Account.objects.get(user=self.student)
+        with self.assertNumQueries(1):
+            self.assertEqual((account.count_submissions(), account.count_solved_problems(),
+                              account.count_completed_assignments(), account.get_accuracy()), (4, 1, 1, 50))
+        self.assertEqual(account.get_accuracy(self.courses[1]), 0)
+        self.assertEqual(Account.objects.get(user=self.admin).count_submissions(), 0)
+
+    def test_command(self):
+        self.create_submissions()
+        expected = [self.get_statistics(course) for course in self.courses]
+        StudentStatistics.objects.all().delete()
+        out = StringIO()
+        call_command('student_statistics', stdout=out)
+        self.assertIn("2 statistics rebuilt", out.getvalue())
+        self.assertEqual([self.get_statistics(course) for course in self.courses], expected)
+        StudentStatistics.objects.update(submissions=0)
+        call_command('student_statistics', course_ids=[self.courses[0].id], stdout=StringIO())
+        self.assertEqual(self.get_statistics(self.courses[0]), expected[0])
+        self.assertEqual(self.get_statistics(self.courses[1])[0], 0)
+        with self.assertRaises(CommandError):
+            call_command('student_statistics', course_ids=[0], stdout=StringIO())
+
+    def test_deleted_student(self):
+        self.create_submissions()
+        self.student.delete()
+        self.assertFalse(StudentStatistics.objects.exists())
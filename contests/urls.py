@@ -98,6 +98,10 @@ urlpatterns = [
             path('delete', views.FNTestDelete.as_view(), name='fntest-delete')
         ]))
     ])),
+    path('problem/<int:problem_id>/rejudge/create', views.RejudgeCreate.as_view(), name='rejudge-create'),
+    path('rejudge/<int:pk>/', views.RejudgeDetail.as_view(), name='rejudge-detail'),
+    path('problem/<int:pk>/timings', views.ProblemTimings.as_view(), name='problem-timings'),
+    path('timings/', views.TimingSummary.as_view(), name='timing-summary'),
     path('course/<int:course_id>/assignment/', include([
             path('create', views.AssignmentCreate.as_view(), name='assignment-create'),
             path('randomize', views.AssignmentCreateRandomSet.as_view(), name='assignment-randomize'),
@@ -124,9 +128,13 @@ urlpatterns = [
             path('delete', views.SubmissionDelete.as_view(), name='submission-delete'),
             path('clear/task', views.SubmissionClearTask.as_view(), name='submission-clear-task'),
             path('moss', views.SubmissionMoss.as_view(), name='submission-moss'),
+            path('similar', views.SubmissionSimilar.as_view(), name='submission-similar'),
+            path('similarity/<int:other_id>', views.SubmissionSimilarity.as_view(), name='submission-similarity'),
             path('download', views.SubmissionDownload.as_view(), name='submission-download'),
             path('attachment/<int:attachment_id>', views.SubmissionAttachment.as_view(), name='submission-attachment'),
             path('get/executions', views.ExecutionList.as_view(), name='submission-get-executions'),
+            path('execution/<int:execution_id>/output/<str:field>', views.ExecutionOutput.as_view(),
+                 name='submission-execution-output'),
         ])),
         path('list', views.SubmissionList.as_view(), name='submission-list'),
     ])),
@@ -136,6 +144,8 @@ urlpatterns = [
             path('update', api.SubmissionUpdateAPI.as_view(), name='api-submission-update'),
             path('evaluate', api.SubmissionEvaluateAPI.as_view(), name='api-submission-evaluate'),
             path('progress/<str:task_id>', api.SubmissionProgressAPI.as_view(), name='api-submission-get-progress'),
-        ]))
+        ])),
+        path('submission/status', api.SubmissionStatusAPI.as_view(), name='api-submission-get-statuses'),
+        path('rejudge/<int:pk>/progress', api.RejudgeProgressAPI.as_view(), name='api-rejudge-get-progress'),
     ]))
 ]
@@ -1,7 +1,10 @@
+import os
 import re
 
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.forms.models import inlineformset_factory, modelformset_factory
 from django.http import Http404, HttpResponse, HttpResponseRedirect
 from django.shortcuts import get_object_or_404
@@ -22,19 +25,30 @@ from contest.soft_deletion import SoftDeletionDeleteView, SoftDeletionUpdateView
 from contests.forms import (AssignmentEvaluateForm, AssignmentForm, AssignmentSetForm, AssignmentUpdateAttachmentForm,
                             AssignmentUpdateForm, AttendanceDateForm, AttendanceForm, AttendanceFormSet,
                             ContestAttachmentForm, ContestForm, ContestMoveForm, CourseFinishForm, CourseForm,
-                            CourseLeaderForm, CreditReportForm, CreditSetForm, CreditUpdateForm, FNTestForm,
+                            CourseLeaderForm, CreditReportForm, CreditSetForm, CreditUpdateForm, FNTestForm, IOTestForm,
                             OptionBaseFormSet, OptionForm, ProblemAttachmentForm, ProblemCommonForm, ProblemMoveForm,
                             ProblemProgramForm, ProblemRollbackResultsForm, ProblemTestForm, SubmissionFilesForm,
                             SubmissionMossForm, SubmissionOptionsForm, SubmissionPatternForm, SubmissionProgramForm,
                             SubmissionTextForm, SubmissionUpdateForm, SubmissionVerbalForm, SubProblemForm, UTTestForm,
                             ContestCreateTasksLeafletForm)
-from contests.models import (Assignment, Attachment, Attendance, Contest, Course, CourseLeader, Credit, Execution,
-                             Filter, FNTest, IOTest, Option, Problem, Submission, SubmissionPattern, SubProblem, UTTest)
-from contests.tasks import evaluate_submission, moss_submission
+from contests.gradebook import get_gradebook, watch_course_table
+from contests.models import (Assignment, Attachment, Attendance, Contest, Course, CourseLeader, CourseTableChange,
+                             Credit, Execution, Filter, FNTest, IOTest, Option, Problem, Rejudge, SimilaritySignature,
+                             SourceFingerprint, Submission, SubmissionPattern, SubProblem, TimingSpan, UTTest)
+from contests.outputs import OUTPUT_FIELDS
+from contests.similarity import highlight_lines, is_indexed, read_source
+from contests.routing import INTERACTIVE, REJUDGE, enqueue
+from contests.tasks import evaluate_submission, index_submissions, moss_submission, rejudge_submissions
 from contests.templatetags.views import get_query_string, has_leader_permission
 from schedule.models import Schedule
 
 
+def queue_similarity_index(course_id):
+    """ indexes submissions of the course in the background, at most once an hour """
+    if cache.add('similarity-index-{}'.format(course_id), True, timeout=60 * 60):
+        index_submissions.delay(course_id)
+
+
 def get_students_filter_dict(course, request):
     filter_dict = dict(course=course)
     if request.user.is_authenticated:
@@ -466,27 +480,13 @@ class CreditUpdate(LoginRedirectMixin, LeadershipOrMixin, OwnershipOrMixin, Perm
         context = super().get_context_data(**kwargs)
         students = (Account.students.filter(user_id=self.object.user_id)
                     .with_attendance(self.object.course, timezone.now()))
-        assignments = Assignment.objects.for_course_table(self.object.course, students)
+        student = students.get()
+        gradebook = get_gradebook(self.object.course, [student.user_id])
         contests = self.object.course.contest_set.all()
-        assignments_num, contests_num = len(assignments), len(contests)
-        columns = [{'assignments': []} for _ in contests]
-        i, j = 0, 0
-        while i < assignments_num:
-            while j < contests_num and contests[j].id != assignments[i].problem.contest_id:
-                j += 1
-            if contests[j].id == assignments[i].problem.contest_id:
-                columns[j]['assignments'].append(assignments[i])
-                i += 1
-        summary = []
-        for column in columns:
-            score_sum = 0
-            for assignment in column['assignments']:
-                score_sum += assignment.score
-            summary.append(score_sum / (len(column['assignments']) or 1))
         context['contests'] = contests
-        context['student'] = students.get()
-        context['columns'] = columns
-        context['summary'] = summary
+        context['student'] = student
+        context['columns'] = [{'assignments': assignments} for assignments in gradebook.get_table(contests)[0]]
+        context['summary'] = gradebook.get_averages(contests)
         return context
 
     def get_success_url(self):
@@ -1353,8 +1353,7 @@ class IOTestDetail(LoginRedirectMixin, LeadershipOrMixin, OwnershipOrMixin, Perm
 class IOTestCreate(LoginRedirectMixin, LeadershipOrMixin, OwnershipOrMixin, PermissionRequiredMixin, LogAdditionMixin,
                    CreateView):
     model = IOTest
-    fields = ['title', 'compile_args', 'compile_args_override', 'launch_args', 'launch_args_override', 'input',
-              'output']
+    form_class = IOTestForm
     template_name = 'contests/iotest/iotest_form.html'
     permission_required = 'contests.add_iotest'
 
@@ -1372,6 +1371,11 @@ class IOTestCreate(LoginRedirectMixin, LeadershipOrMixin, OwnershipOrMixin, Perm
     def has_leadership(self):
         return self.storage['problem'].course.leaders.filter(id=self.request.user.id).exists()
 
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['problem'] = self.storage['problem']
+        return kwargs
+
     def form_valid(self, form):
         form.instance.owner = self.request.user
         form.instance.problem = self.storage['problem']
@@ -1392,8 +1396,7 @@ class IOTestCreate(LoginRedirectMixin, LeadershipOrMixin, OwnershipOrMixin, Perm
 class IOTestUpdate(LoginRedirectMixin, LeadershipOrMixin, OwnershipOrMixin, PermissionRequiredMixin, LogChangeMixin,
                    UpdateView):
     model = IOTest
-    fields = ['title', 'compile_args', 'compile_args_override', 'launch_args', 'launch_args_override', 'input',
-              'output']
+    form_class = IOTestForm
     template_name = 'contests/iotest/iotest_form.html'
     permission_required = 'contests.change_iotest'
 
@@ -1407,6 +1410,11 @@ class IOTestUpdate(LoginRedirectMixin, LeadershipOrMixin, OwnershipOrMixin, Perm
             self.object = self.get_object()
         return self.object.problem.course.leaders.filter(id=self.request.user.id).exists()
 
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['problem'] = self.object.problem
+        return kwargs
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['problem'] = self.object.problem
@@ -1922,7 +1930,7 @@ class AssignmentUserTable(LoginRedirectMixin, ListView):
 class AssignmentCourseTable(LoginRedirectMixin, LeadershipOrMixin, OwnershipOrMixin, PermissionRequiredMixin, ListView):
     model = Assignment
     template_name = 'contests/assignment/assignment_course_base.html'
-    context_object_name = 'assignments'
+    context_object_name = 'gradebook'
     permission_required = 'contests.view_assignment_table'
 
     def __init__(self, **kwargs):
@@ -1945,7 +1953,9 @@ class AssignmentCourseTable(LoginRedirectMixin, LeadershipOrMixin, OwnershipOrMi
                                     .with_attendance(self.storage['course'], timezone.now())
                                     .order_by('user__last_name', 'user__first_name', 'user_id'))
         bool(self.storage['students'])  # evaluate now
-        return Assignment.objects.for_course_table(self.storage['course'], self.storage['students'])
+        watch_course_table(self.storage['course'].id)  # changes from now on are pushed to the table by its stream
+        self.storage['last_change_id'] = CourseTableChange.objects.get_last_id(self.storage['course'].id)
+        return get_gradebook(self.storage['course'], [student.user_id for student in self.storage['students']])
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -2182,7 +2192,8 @@ class SubmissionCreate(LoginRedirectMixin, PermissionRequiredMixin, CreateView):
         form.instance.main_submission = self.storage.get('main_submission')
         self.object = form.save()
         if self.object.problem.type == 'Program' and self.object.problem.is_testable:
-            task = evaluate_submission.delay(self.object.pk, self.request.user.id)
+            task = enqueue(evaluate_submission, INTERACTIVE, self.object.course.id,
+                           args=(self.object.pk, self.request.user.id))
             self.object.task_id = task.id
             self.object.save()
         return HttpResponseRedirect(self.get_success_url())
@@ -2287,19 +2298,104 @@ class SubmissionMoss(LoginRedirectMixin, LeadershipOrMixin, OwnershipOrMixin, Pe
         moss_submission.delay(self.object.id, to_submission_ids)
         return HttpResponseRedirect(self.get_success_url())
 
-    def get_form_kwargs(self):
-        kwargs = super().get_form_kwargs()
+    def get_to_submissions_queryset(self):
         queryset = Submission.objects.filter(problem_id=self.object.problem_id, owner__account__enrolled=True)
         if not self.request.user.account.faculty.is_interfaculty:
             queryset = queryset.filter(owner__account__faculty=self.request.user.account.faculty)
-        queryset = queryset.exclude(owner_id=self.object.owner_id)
-        kwargs['to_submissions_queryset'] = queryset
+        return queryset.exclude(owner_id=self.object.owner_id)
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['to_submissions_queryset'] = self.get_to_submissions_queryset()
         return kwargs
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        submissions = self.get_to_submissions_queryset()
+        indexed = SourceFingerprint.objects.filter(problem_id=self.object.problem_id).values('submission_id')
+        context['total'] = submissions.count()
+        context['indexed'] = context['total'] - submissions.exclude(id__in=indexed).count()
+        if context['indexed'] < context['total']:
+            queue_similarity_index(self.object.problem.contest.course_id)
+        context['matches'] = SourceFingerprint.objects.get_matches(self.object, submissions,
+                                                                   limit=settings.SIMILARITY_MATCHES_LIMIT)
+        return context
+
     def get_success_url(self):
         return reverse('contests:submission-detail', kwargs={'pk': self.kwargs['pk']})
 
 
+class SubmissionSimilar(LoginRedirectMixin, LeadershipOrMixin, OwnershipOrMixin, PermissionRequiredMixin, DetailView):
+    model = Submission
+    template_name = 'contests/submission/submission_similar.html'
+    permission_required = 'contests.moss_submission'
+
+    def has_ownership(self):
+        if not hasattr(self, 'object'):
+            self.object = self.get_object()
+        return self.object.course.owner_id == self.request.user.id
+
+    def has_leadership(self):
+        if not hasattr(self, 'object'):
+            self.object = self.get_object()
+        return self.object.course.leaders.filter(id=self.request.user.id).exists()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        course_id = self.object.problem.contest.course_id
+        SourceFingerprint.objects.create_set(self.object)
+        SimilaritySignature.objects.create_signature(self.object)
+        total = Submission.objects.filter(problem__contest__course_id=course_id, problem__type='Program').count()
+        indexed = SimilaritySignature.objects.filter(course_id=course_id).count()
+        if indexed < total:
+            queue_similarity_index(course_id)
+        context['total'] = total
+        context['indexed'] = indexed
+        context['similar'] = SimilaritySignature.objects.get_similar(self.object,
+                                                                     limit=settings.SIMILARITY_MATCHES_LIMIT)
+        return context
+
+
+class SubmissionSimilarity(LoginRedirectMixin, LeadershipOrMixin, OwnershipOrMixin, PermissionRequiredMixin,
+                           DetailView):
+    model = Submission
+    template_name = 'contests/submission/submission_similarity.html'
+    permission_required = 'contests.moss_submission'
+
+    def has_ownership(self):
+        if not hasattr(self, 'object'):
+            self.object = self.get_object()
+        return self.object.course.owner_id == self.request.user.id
+
+    def has_leadership(self):
+        if not hasattr(self, 'object'):
+            self.object = self.get_object()
+        return self.object.course.leaders.filter(id=self.request.user.id).exists()
+
+    @staticmethod
+    def get_files(submission, regions):
+        files = []
+        for path in submission.files:
+            text = read_source(path) if is_indexed(path) else None
+            if text is not None:
+                filename = os.path.basename(path)
+                files.append((filename, highlight_lines(text, regions.get(filename, []))))
+        return files
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        other = get_object_or_404(Submission, id=self.kwargs['other_id'], problem_id=self.object.problem_id)
+        SourceFingerprint.objects.create_set(other)
+        matches = SourceFingerprint.objects.get_matches(self.object, Submission.objects.filter(id=other.id))
+        match = matches[0] if matches else {'similarity': 0, 'other_similarity': 0, 'regions': {},
+                                            'other_regions': {}}
+        context['other'] = other
+        context['match'] = match
+        context['sides'] = [(self.object, self.get_files(self.object, match['regions'])),
+                            (other, self.get_files(other, match['other_regions']))]
+        return context
+
+
 class SubmissionClearTask(LoginRequiredMixin, LeadershipOrMixin, OwnershipOrMixin, PermissionRequiredMixin,
                           SingleObjectMixin, RedirectView):
     model = Submission
@@ -2455,6 +2551,156 @@ class ExecutionList(LoginRequiredMixin, LeadershipOrMixin, OwnershipOrMixin, Per
         return context
 
 
+class ExecutionOutput(LoginRequiredMixin, LeadershipOrMixin, OwnershipOrMixin, PermissionRequiredMixin, BaseDetailView):
+    permission_required = 'contests.evaluate_submission'
+    staff_only_fields = {'execution_stdout'}
+    staff_only_fields_of_passed_tests = {'execution_stderr'}
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.storage = dict()
+
+    def dispatch(self, request, *args, **kwargs):
+        self.storage['submission'] = get_object_or_404(Submission, id=kwargs.get('pk'))
+        return super().dispatch(request, *args, **kwargs)
+
+    def has_ownership(self):
+        return self.storage['submission'].owner_id == self.request.user.id
+
+    def has_leadership(self):
+        return self.storage['submission'].course.leaders.filter(id=self.request.user.id).exists()
+
+    def get_object(self, queryset=None):
+        field = self.kwargs.get('field')
+        if field not in OUTPUT_FIELDS:
+            raise Http404("Вывод не найден")
+        execution = get_object_or_404(Execution, id=self.kwargs.get('execution_id'),
+                                      submission_id=self.storage['submission'].id)
+        staff_only = (field in self.staff_only_fields or
+                      field in self.staff_only_fields_of_passed_tests and execution.test_is_passed)
+        if staff_only and not (self.request.user.has_perm('contests.view_submission') or self.has_leadership()):
+            raise Http404("Вывод не найден")
+        return execution
+
+    def render_to_response(self, context):
+        return HttpResponse(self.object.get_output(self.kwargs.get('field')), content_type='text/plain; charset=utf-8')
+
+
+"""==================================================== Rejudge ====================================================="""
+
+
+class RejudgeCreate(LoginRedirectMixin, LeadershipOrMixin, OwnershipOrMixin, PermissionRequiredMixin, CreateView):
+    model = Rejudge
+    fields = []
+    template_name = 'contests/rejudge/rejudge_form.html'
+    permission_required = 'contests.add_rejudge'
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.storage = dict()
+
+    def dispatch(self, request, *args, **kwargs):
+        self.storage['problem'] = get_object_or_404(Problem, id=kwargs.pop('problem_id'))
+        return super().dispatch(request, *args, **kwargs)
+
+    def has_ownership(self):
+        return self.storage['problem'].course.owner_id == self.request.user.id
+
+    def has_leadership(self):
+        return self.storage['problem'].course.leaders.filter(id=self.request.user.id).exists()
+
+    def get_submissions(self):
+        if 'submissions' not in self.storage:
+            self.storage['submissions'] = (Submission.objects.to_rejudge(self.storage['problem'])
+                                           .select_related('owner__account'))
+        return self.storage['submissions']
+
+    def form_valid(self, form):
+        submission_ids = list(self.get_submissions().values_list('id', flat=True))
+        form.instance.owner = self.request.user
+        form.instance.problem = self.storage['problem']
+        form.instance.total = len(submission_ids)
+        if not submission_ids:
+            form.instance.status = 'D'
+        response = super().form_valid(form)
+        batch_size = settings.JUDGE_REJUDGE_BATCH_SIZE
+        for i in range(0, len(submission_ids), batch_size):
+            enqueue(rejudge_submissions, REJUDGE, self.object.course.id,
+                    args=(self.object.id, submission_ids[i:i + batch_size], self.request.user.id))
+        return response
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['problem'] = self.storage['problem']
+        context['submissions'] = self.get_submissions()
+        return context
+
+
+class RejudgeDetail(LoginRedirectMixin, LeadershipOrMixin, OwnershipOrMixin, PermissionRequiredMixin, DetailView):
+    model = Rejudge
+    template_name = 'contests/rejudge/rejudge_detail.html'
+    permission_required = 'contests.view_rejudge'
+
+    def has_ownership(self):
+        return self.get_object().course.owner_id == self.request.user.id
+
+    def has_leadership(self):
+        return self.get_object().course.leaders.filter(id=self.request.user.id).exists()
+
+
+"""=================================================== TimingSpan ==================================================="""
+
+
+class TimingSpanPeriodMixin:
+    default_days = 30
+
+    def get_days(self):
+        try:
+            return max(int(self.request.GET.get('days', self.default_days)), 1)
+        except ValueError:
+            return self.default_days
+
+    def get_since(self):
+        return timezone.now() - timezone.timedelta(days=self.get_days())
+
+
+class ProblemTimings(LoginRedirectMixin, LeadershipOrMixin, OwnershipOrMixin, PermissionRequiredMixin,
+                     TimingSpanPeriodMixin, DetailView):
+    model = Problem
+    template_name = 'contests/timing/problem_timings.html'
+    permission_required = 'contests.view_timingspan'
+
+    def has_ownership(self):
+        return self.get_object().course.owner_id == self.request.user.id
+
+    def has_leadership(self):
+        return self.get_object().course.leaders.filter(id=self.request.user.id).exists()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['days'] = self.get_days()
+        context['summary'] = TimingSpan.objects.get_summary(since=self.get_since(), problem=self.object)
+        return context
+
+
+class TimingSummary(LoginRedirectMixin, PermissionRequiredMixin, TimingSpanPeriodMixin, TemplateView):
+    template_name = 'contests/timing/timing_summary.html'
+    permission_required = 'contests.view_timingspan'
+
+    def get_name(self):
+        name = self.request.GET.get('name', 'queue')
+        return name if name in dict(TimingSpan.NAME_CHOICES) else 'queue'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['days'] = self.get_days()
+        context['name'] = self.get_name()
+        context['names'] = TimingSpan.NAME_CHOICES
+        context['summary'] = TimingSpan.objects.get_summary(since=self.get_since())
+        context['problem_summaries'] = TimingSpan.objects.get_problem_summaries(self.get_name(), since=self.get_since())
+        return context
+
+
 """==================================================== Specific ===================================================="""
 
 